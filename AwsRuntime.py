@@ -0,0 +1,172 @@
+import os
+import threading
+
+import Telemetry
+
+# 所有处理函数共用的AWS运行时：boto3在首次使用时才导入并创建（而不是在模块导入时），
+# 同一热容器内复用同一个session、连接池和客户端。
+
+REGION = os.environ.get('AWS_REGION', 'ap-northeast-2')
+# 本地调试可指向DynamoDB Local等兼容服务
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+# 连接池大小需覆盖批量写入/并行扫描的线程数，否则线程会排队等待连接
+MAX_POOL_CONNECTIONS = int(os.environ.get('BOTO_MAX_POOL_CONNECTIONS', '64'))
+# adaptive重试模式：在标准重试之上做客户端限速，放榜高峰被限流时自动降速
+RETRY_MODE = os.environ.get('BOTO_RETRY_MODE', 'adaptive')
+MAX_ATTEMPTS = int(os.environ.get('BOTO_MAX_ATTEMPTS', '5'))
+CONNECT_TIMEOUT = float(os.environ.get('BOTO_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT = float(os.environ.get('BOTO_READ_TIMEOUT', '10'))
+
+_lock = threading.RLock()
+_session = None
+_dynamodb = None
+_clients = {}
+_proxies = []
+_conditions = None
+_types = None
+
+
+def boto_config():
+    from botocore.config import Config
+    return Config(
+        region_name=REGION,
+        retries={'mode': RETRY_MODE, 'max_attempts': MAX_ATTEMPTS},
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        tcp_keepalive=True
+    )
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import boto3
+        _session = boto3.session.Session(region_name=REGION)
+    return _session
+
+
+def get_dynamodb():
+    """DynamoDB resource（整个容器共享一个）"""
+    global _dynamodb
+    if _dynamodb is None:
+        with _lock:
+            if _dynamodb is None:
+                resource = _get_session().resource('dynamodb', config=boto_config(),
+                                                   endpoint_url=DYNAMODB_ENDPOINT_URL)
+                # 表调用耗时与消耗的容量单位（ReturnConsumedCapacity）由Telemetry统计
+                Telemetry.instrument_client(resource.meta.client)
+                _dynamodb = resource
+    return _dynamodb
+
+
+def get_client(service):
+    """低层客户端（线程安全）；dynamodb直接复用resource内的客户端，共享同一个连接池"""
+    if service == 'dynamodb':
+        return get_dynamodb().meta.client
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                client = _clients[service] = _get_session().client(service, config=boto_config())
+    return client
+
+
+class _LazyProxy:
+    """延迟创建的对象代理：首次访问属性时才调用factory，之后直接转发"""
+
+    __slots__ = ('_factory', '_target', '__weakref__')
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with _lock:
+                if self._target is None:
+                    self._target = self._factory()
+                target = self._target
+        return target
+
+    def _reset(self):
+        self._target = None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy(factory):
+    """模块级延迟对象（如序列化器），首次使用时才创建"""
+    return _LazyProxy(factory)
+
+
+def get_table(name):
+    """按表名返回延迟创建的Table对象，可在模块级使用而不会在导入时连接AWS"""
+    proxy = _LazyProxy(lambda: get_dynamodb().Table(name))
+    _proxies.append(proxy)
+    return proxy
+
+
+# 模块级可直接使用的DynamoDB resource代理（batch_get_item等服务级接口）
+dynamodb = _LazyProxy(get_dynamodb)
+_proxies.append(dynamodb)
+
+
+def Key(name):
+    """等同boto3.dynamodb.conditions.Key，首次调用时才导入boto3"""
+    return _get_conditions().Key(name)
+
+
+def Attr(name):
+    """等同boto3.dynamodb.conditions.Attr，首次调用时才导入boto3"""
+    return _get_conditions().Attr(name)
+
+
+def _get_conditions():
+    global _conditions
+    if _conditions is None:
+        from boto3.dynamodb import conditions
+        _conditions = conditions
+    return _conditions
+
+
+def _get_types():
+    global _types
+    if _types is None:
+        from boto3.dynamodb import types
+        _types = types
+    return _types
+
+
+def type_serializer():
+    return _get_types().TypeSerializer()
+
+
+def type_deserializer():
+    return _get_types().TypeDeserializer()
+
+
+def install_dynamodb(resource, conditions=None, types=None):
+    """替换DynamoDB resource（本地替身、基准测试用），已创建的Table代理会重新解析
+
+    conditions为提供Key/Attr的模块或对象，types为提供TypeSerializer/TypeDeserializer的模块，
+    未安装boto3的环境下由替身一并提供。
+    """
+    global _dynamodb, _conditions, _types
+    with _lock:
+        _dynamodb = resource
+        if conditions is not None:
+            _conditions = conditions
+        if types is not None:
+            _types = types
+        for proxy in _proxies:
+            proxy._reset()
+
+
+def warm_up():
+    """提前完成boto3导入与客户端创建（可在初始化阶段调用，把开销计入init而不是首个请求）"""
+    get_dynamodb().meta.client
@@ -0,0 +1,151 @@
+import base64
+import binascii
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from AwsRuntime import lazy, type_deserializer, type_serializer
+from DynamoBatch import batch_write
+
+logger = logging.getLogger()
+
+# 增量同步（"自上次以来的变化"）：
+# - 每条写入的成绩/时段带version（微秒时间戳，本容器内单调递增）和updatedAt；
+# - 删除成绩时在GradeTombstones表写入墓碑（主键与成绩相同，带version和course/term），
+#   expiresAt配合DynamoDB TTL在保留期后自动清理；
+# - Grades与GradeTombstones都建两个GSI：studentId-version-index（学生端）、course-version-index（教师端），
+#   按"version > since"查询，客户端轮询时只读取变化的条目。
+GRADE_TOMBSTONES_TABLE_NAME = 'GradeTombstones'
+GRADES_KEY = ('studentId', 'gradeId')
+STUDENT_VERSION_INDEX = 'studentId-version-index'
+COURSE_VERSION_INDEX = 'course-version-index'
+
+# 同步令牌比"现在"回退的秒数：覆盖写入请求的耗时（批量导入的条目在请求开始时打版本号，
+# 写完可能已过去数十秒）和容器间的时钟偏差。窗口内的变化会被重复下发，客户端按主键合并即可
+SYNC_LAG_SECONDS = float(os.environ.get('CHANGE_SYNC_LAG_SECONDS', '60'))
+# 墓碑保留天数；更早的同步令牌无法确定期间的删除，需重新全量加载
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', '30'))
+
+_serializer = lazy(type_serializer)
+_deserializer = lazy(type_deserializer)
+_version_lock = threading.Lock()
+_last_version = 0
+
+
+class InvalidSyncTokenError(ValueError):
+    """since令牌格式错误或与筛选条件不一致（返回400）"""
+
+
+class SyncExpiredError(ValueError):
+    """since令牌早于墓碑保留期，需重新全量加载（返回410）"""
+
+
+def next_version():
+    """生成变更版本号：微秒级UTC时间戳，同一容器内严格递增"""
+    global _last_version
+    with _version_lock:
+        _last_version = max(_last_version + 1, time.time_ns() // 1000)
+        return _last_version
+
+
+def stamp(items, version=None):
+    """给一次请求写入的全部条目打上同一个版本号和updatedAt，返回版本号"""
+    version = version or next_version()
+    updated_at = datetime.fromtimestamp(version / 1_000_000, timezone.utc).isoformat()
+    for item in items:
+        item['version'] = version
+        item['updatedAt'] = updated_at
+    return version
+
+
+def record_tombstones(items, client, version=None):
+    """为已删除的成绩写入墓碑（失败只记日志：客户端最迟在下次全量加载时修正）"""
+    if not items:
+        return None
+    version = version or next_version()
+    expires_at = int(time.time()) + TOMBSTONE_RETENTION_DAYS * 86400
+    tombstones = []
+    for i, item in enumerate(items):
+        tombstone = {name: item[name] for name in GRADES_KEY}
+        for name in ('course', 'term'):
+            if item.get(name) is not None:
+                tombstone[name] = item[name]
+        tombstones.append((i, 'put', tombstone))
+    stamp([tombstone for _, _, tombstone in tombstones], version)
+    for _, _, tombstone in tombstones:
+        tombstone['expiresAt'] = expires_at
+    try:
+        report = batch_write(client, GRADE_TOMBSTONES_TABLE_NAME, tombstones, key_names=GRADES_KEY)
+    except Exception as e:
+        logger.warning(f"墓碑写入失败：{str(e)}")
+        return None
+    if report.count('failed'):
+        logger.warning(f"{report.count('failed')}条墓碑写入失败，相关客户端的增量同步将漏掉这些删除")
+    return report
+
+
+def encode_sync_token(**extra):
+    """生成同步令牌（URL安全的base64）：v为"现在"回退SYNC_LAG_SECONDS的版本号，extra为调用方的附加状态"""
+    payload = dict(extra, v=next_version() - int(SYNC_LAG_SECONDS * 1_000_000))
+    data = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_sync_token(token):
+    """还原同步令牌；格式错误时抛InvalidSyncTokenError，超过墓碑保留期时抛SyncExpiredError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidSyncTokenError('since令牌无效')
+    if not isinstance(payload, dict) or not isinstance(payload.get('v'), int):
+        raise InvalidSyncTokenError('since令牌无效')
+    oldest = time.time_ns() // 1000 - TOMBSTONE_RETENTION_DAYS * 86400 * 1_000_000
+    if payload['v'] < oldest:
+        raise SyncExpiredError(f'上次同步早于{TOMBSTONE_RETENTION_DAYS}天，请重新加载全部数据')
+    return payload
+
+
+def query_changes(client, table_name, index_name, hash_name, hash_value, since, term=None, projection=None):
+    """按"version > since"查询一个分区内变化的条目（跟随续页键），返回已反序列化的条目列表
+
+    projection为属性名列表时只读取这些属性（合并去重需要的主键与version由调用方包含在内）。
+    """
+    values = {':h': hash_value, ':v': since}
+    kwargs = {
+        'TableName': table_name,
+        'IndexName': index_name,
+        'KeyConditionExpression': '#h = :h AND #v > :v',
+        'ExpressionAttributeNames': {'#h': hash_name, '#v': 'version'},
+    }
+    if projection:
+        kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+        kwargs['ExpressionAttributeNames'].update({f'#p{i}': name for i, name in enumerate(projection)})
+    if term:
+        kwargs['FilterExpression'] = '#t = :t'
+        kwargs['ExpressionAttributeNames']['#t'] = 'term'
+        values[':t'] = term
+    kwargs['ExpressionAttributeValues'] = {k: _serializer.serialize(v) for k, v in values.items()}
+    items = []
+    while True:
+        response = client.query(**kwargs)
+        items.extend({k: _deserializer.deserialize(v) for k, v in item.items()} for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def merge_changes(changed, deleted):
+    """同一主键同时出现在变化和墓碑中时（删除后又重新录入，或相反）保留版本号较新的一方"""
+    latest = {}
+    for kind, items in (('changed', changed), ('deleted', deleted)):
+        for item in items:
+            key = tuple(item[name] for name in GRADES_KEY)
+            current = latest.get(key)
+            if current is None or item.get('version', 0) > current[1].get('version', 0):
+                latest[key] = (kind, item)
+    return ([item for kind, item in latest.values() if kind == 'changed'],
+            [item for kind, item in latest.values() if kind == 'deleted'])
@@ -0,0 +1,394 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from AwsRuntime import lazy, type_deserializer, type_serializer
+
+logger = logging.getLogger()
+
+# BatchGetItem单次最多100个键
+BATCH_GET_LIMIT = 100
+MAX_RETRIES = 8
+BASE_DELAY = 0.05
+MAX_DELAY = 2.0
+
+_serializer = lazy(type_serializer)
+_deserializer = lazy(type_deserializer)
+
+
+def backoff_delay(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    """指数退避 + 全抖动（full jitter），避免大量请求同时重试"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def chunked(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _dedupe_keys(keys):
+    seen = set()
+    unique = []
+    for key in keys:
+        marker = tuple(sorted(key.items()))
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(key)
+    return unique
+
+
+def batch_get_items(dynamodb, table_name, keys, projection=None, consistent_read=False,
+                    max_retries=MAX_RETRIES, sleep=time.sleep):
+    """用BatchGetItem批量读取（resource级接口，自动处理类型转换）
+
+    自动去重、按100个键分块，并对UnprocessedKeys做指数退避重试。
+    返回(items, unprocessed_keys)：重试耗尽后仍未处理的键原样返回，由调用方决定如何处理。
+    """
+    items = []
+    unprocessed = []
+    for chunk in chunked(_dedupe_keys(keys), BATCH_GET_LIMIT):
+        request = {'Keys': chunk, 'ConsistentRead': consistent_read}
+        if projection:
+            request['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+            request['ExpressionAttributeNames'] = {f'#p{i}': name for i, name in enumerate(projection)}
+        pending = {table_name: request}
+
+        attempt = 0
+        while pending:
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            pending = response.get('UnprocessedKeys') or {}
+            if not pending:
+                break
+            if attempt >= max_retries:
+                left = pending.get(table_name, {}).get('Keys', [])
+                logger.warning(f"BatchGetItem重试{max_retries}次后仍有{len(left)}个键未处理：{table_name}")
+                unprocessed.extend(left)
+                break
+            sleep(backoff_delay(attempt))
+            attempt += 1
+    return items, unprocessed
+
+
+DEFAULT_READ_WORKERS = 8
+
+
+def parallel_batch_get(client, table_name, keys, projection=None, workers=DEFAULT_READ_WORKERS,
+                       max_retries=MAX_RETRIES, sleep=time.sleep):
+    """并发BatchGetItem（低层client线程安全）：按100个键分块后分发到线程池
+
+    用于一次需要取回数百上千个键的场景（如成绩名单补全学生信息），各分块独立退避重试。
+    返回值与batch_get_items相同：(已反序列化的items, 重试耗尽后仍未处理的键)。
+    """
+    request = {}
+    if projection:
+        request['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+        request['ExpressionAttributeNames'] = {f'#p{i}': name for i, name in enumerate(projection)}
+
+    def get_chunk(chunk):
+        found = []
+        pending = {table_name: dict(request, Keys=[
+            {k: _serializer.serialize(v) for k, v in key.items()} for key in chunk])}
+        attempt = 0
+        while pending:
+            response = client.batch_get_item(RequestItems=pending)
+            found.extend({k: _deserializer.deserialize(v) for k, v in item.items()}
+                         for item in response.get('Responses', {}).get(table_name, []))
+            pending = response.get('UnprocessedKeys') or {}
+            if not pending:
+                break
+            if attempt >= max_retries:
+                left = pending.get(table_name, {}).get('Keys', [])
+                logger.warning(f"BatchGetItem重试{max_retries}次后仍有{len(left)}个键未处理：{table_name}")
+                return found, [{k: _deserializer.deserialize(v) for k, v in key.items()} for key in left]
+            sleep(backoff_delay(attempt))
+            attempt += 1
+        return found, []
+
+    chunks = list(chunked(_dedupe_keys(keys), BATCH_GET_LIMIT))
+    if len(chunks) <= 1:
+        # 只有一块时直接在当前线程读取，省去线程池的开销
+        results = [get_chunk(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+            results = list(executor.map(get_chunk, chunks))
+    items = []
+    unprocessed = []
+    for found, left in results:
+        items.extend(found)
+        unprocessed.extend(left)
+    return items, unprocessed
+
+
+# BatchWriteItem单次最多25个请求
+BATCH_WRITE_LIMIT = 25
+DEFAULT_WRITE_WORKERS = 8
+THROTTLE_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+}
+
+
+def is_throttle_error(error):
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in THROTTLE_ERROR_CODES
+
+
+class AdaptiveThrottle:
+    """所有写线程共享的自适应延迟：遇到限流/未处理项时增大，成功时减半，很快回到无延迟"""
+
+    def __init__(self, base=BASE_DELAY, cap=MAX_DELAY, sleep=time.sleep):
+        self.base = base
+        self.cap = cap
+        self.delay = 0.0
+        self.sleep = sleep
+        self.throttles = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            self.sleep(random.uniform(delay / 2, delay))
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self.delay = min(self.cap, max(self.base, self.delay * 1.5))
+
+    def on_success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base else 0.0
+
+
+class WriteReport:
+    """批量写入结果：每个请求最终为written（一次成功）、retried（重试后成功）、conflict（条件不满足）或failed"""
+
+    def __init__(self):
+        self.status = {}
+        self.errors = {}
+        self.calls = 0
+        self.throttles = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def mark(self, refs, status, error=None):
+        with self._lock:
+            for ref in refs:
+                self.status[ref] = status
+                if error:
+                    self.errors[ref] = error
+
+    def add_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def count(self, status):
+        return sum(1 for s in self.status.values() if s == status)
+
+    def summary(self):
+        total = len(self.status)
+        return {
+            'written': self.count('written'),
+            'retried': self.count('retried'),
+            'failed': self.count('failed'),
+            'conflict': self.count('conflict'),
+            'calls': self.calls,
+            'throttles': self.throttles,
+            'seconds': round(self.seconds, 3),
+            'itemsPerSecond': round(total / self.seconds, 1) if self.seconds > 0 else None
+        }
+
+
+def _key_marker(serialized_item, key_names):
+    return tuple((name, json.dumps(serialized_item[name], sort_keys=True)) for name in key_names)
+
+
+def batch_write(client, table_name, requests, key_names, workers=DEFAULT_WRITE_WORKERS,
+                max_retries=MAX_RETRIES, sleep=time.sleep):
+    """并发批量写入（BatchWriteItem，低层client线程安全）
+
+    requests为[(ref, 'put'|'delete', item或key), ...]，ref为调用方的行号等标识。
+    按25个一组分发到线程池；限流异常与UnprocessedItems都会按共享的自适应退避重试，
+    超过max_retries后标记为failed。返回WriteReport。
+    同一批次内不能有重复主键（DynamoDB会拒绝整个批次），调用方需先去重。
+    """
+    report = WriteReport()
+    throttle = AdaptiveThrottle(sleep=sleep)
+    started = time.monotonic()
+
+    prepared = []
+    for ref, op, value in requests:
+        serialized = {k: _serializer.serialize(v) for k, v in value.items()}
+        if op == 'put':
+            request = {'PutRequest': {'Item': serialized}}
+        elif op == 'delete':
+            request = {'DeleteRequest': {'Key': serialized}}
+        else:
+            raise ValueError(f'不支持的写操作：{op}')
+        prepared.append((ref, _key_marker(serialized, key_names), request))
+
+    def write_chunk(chunk):
+        pending = {marker: (ref, request) for ref, marker, request in chunk}
+        retried = set()
+        attempt = 0
+        while pending:
+            throttle.wait()
+            try:
+                report.add_call()
+                response = client.batch_write_item(
+                    RequestItems={table_name: [request for _, request in pending.values()]})
+            except Exception as e:
+                if not is_throttle_error(e) or attempt >= max_retries:
+                    report.mark([ref for ref, _ in pending.values()], 'failed', str(e))
+                    return
+                throttle.on_throttle()
+                retried.update(pending)
+                sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            unprocessed = (response.get('UnprocessedItems') or {}).get(table_name, [])
+            left = set()
+            for request in unprocessed:
+                body = request.get('PutRequest', {}).get('Item') or request.get('DeleteRequest', {}).get('Key')
+                left.add(_key_marker(body, key_names))
+            for marker in list(pending):
+                if marker not in left:
+                    ref, _ = pending.pop(marker)
+                    report.mark([ref], 'retried' if marker in retried else 'written')
+            if not pending:
+                throttle.on_success()
+                break
+            if attempt >= max_retries:
+                report.mark([ref for ref, _ in pending.values()], 'failed', '重试次数耗尽，仍有未处理的写入')
+                break
+            throttle.on_throttle()
+            retried.update(pending)
+            sleep(backoff_delay(attempt))
+            attempt += 1
+
+    chunks = list(chunked(prepared, BATCH_WRITE_LIMIT))
+    if chunks:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+            list(executor.map(write_chunk, chunks))
+
+    report.throttles = throttle.throttles
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def conditional_put(client, table_name, requests, workers=DEFAULT_WRITE_WORKERS,
+                    max_retries=MAX_RETRIES, sleep=time.sleep):
+    """并发条件写入（逐条PutItem，BatchWriteItem不支持条件表达式）
+
+    requests为[(ref, item, condition_expression, expression_values), ...]，
+    条件不满足的记为conflict，其余状态与batch_write相同。返回WriteReport。
+    """
+    report = WriteReport()
+    throttle = AdaptiveThrottle(sleep=sleep)
+    started = time.monotonic()
+
+    def put_one(request):
+        ref, item, condition, values = request
+        kwargs = {
+            'TableName': table_name,
+            'Item': {k: _serializer.serialize(v) for k, v in item.items()}
+        }
+        if condition:
+            kwargs['ConditionExpression'] = condition
+        if values:
+            kwargs['ExpressionAttributeValues'] = {k: _serializer.serialize(v) for k, v in values.items()}
+        for attempt in range(max_retries + 1):
+            throttle.wait()
+            report.add_call()
+            try:
+                client.put_item(**kwargs)
+            except Exception as e:
+                code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+                if code == 'ConditionalCheckFailedException':
+                    report.mark([ref], 'conflict', '条件写入失败：数据已被其他请求修改')
+                    return
+                if not is_throttle_error(e) or attempt >= max_retries:
+                    report.mark([ref], 'failed', str(e))
+                    return
+                throttle.on_throttle()
+                sleep(backoff_delay(attempt))
+                continue
+            throttle.on_success()
+            report.mark([ref], 'retried' if attempt else 'written')
+            return
+
+    if requests:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(requests)))) as executor:
+            list(executor.map(put_one, requests))
+
+    report.throttles = throttle.throttles
+    report.seconds = time.monotonic() - started
+    return report
+
+
+# TransactWriteItems单次最多100个操作
+TRANSACT_WRITE_LIMIT = 100
+# 事务因并发事务冲突被取消时可以整体重试（与限流一样退避）
+RETRYABLE_CANCELLATION_CODES = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded'}
+
+
+def transact_put(client, table_name, requests, max_retries=MAX_RETRIES, sleep=time.sleep):
+    """事务条件写入（TransactWriteItems，全部成功或全部不写）
+
+    requests与conditional_put相同：[(ref, item, condition_expression, expression_values), ...]，
+    最多TRANSACT_WRITE_LIMIT条。事务被取消时，条件不满足的请求记为conflict，
+    其余请求记为failed（未写入）。返回WriteReport。
+    """
+    if len(requests) > TRANSACT_WRITE_LIMIT:
+        raise ValueError(f'事务写入单次最多{TRANSACT_WRITE_LIMIT}条')
+    report = WriteReport()
+    started = time.monotonic()
+
+    items = []
+    for ref, item, condition, values in requests:
+        put = {
+            'TableName': table_name,
+            'Item': {k: _serializer.serialize(v) for k, v in item.items()}
+        }
+        if condition:
+            put['ConditionExpression'] = condition
+        if values:
+            put['ExpressionAttributeValues'] = {k: _serializer.serialize(v) for k, v in values.items()}
+        items.append({'Put': put})
+    refs = [ref for ref, _, _, _ in requests]
+
+    for attempt in range(max_retries + 1):
+        if not items:
+            break
+        report.add_call()
+        try:
+            client.transact_write_items(TransactItems=items)
+        except Exception as e:
+            response = getattr(e, 'response', {}) or {}
+            code = response.get('Error', {}).get('Code')
+            reasons = [reason.get('Code') for reason in response.get('CancellationReasons') or []]
+            retryable = is_throttle_error(e) or (
+                code == 'TransactionCanceledException' and set(reasons) & RETRYABLE_CANCELLATION_CODES)
+            if retryable and attempt < max_retries:
+                report.throttles += 1
+                sleep(backoff_delay(attempt))
+                continue
+            if code == 'TransactionCanceledException' and len(reasons) == len(refs):
+                for ref, reason in zip(refs, reasons):
+                    if reason == 'ConditionalCheckFailed':
+                        report.mark([ref], 'conflict', '条件写入失败：数据已存在或已被其他请求修改')
+                    else:
+                        report.mark([ref], 'failed', '事务已取消，未写入')
+            else:
+                report.mark(refs, 'failed', str(e))
+            break
+        report.mark(refs, 'retried' if attempt else 'written')
+        break
+
+    report.seconds = time.monotonic() - started
+    return report
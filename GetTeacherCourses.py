@@ -1,42 +1,69 @@
 import json
-import boto3
 
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-# 假设课程表为`TeacherCourses`，结构包含`teacherId`、`courseId`、`courseName`
-courses_table = dynamodb.Table('TeacherCourses')
+from AwsRuntime import Key, get_table
+from JsonResponse import cors_headers
+from RefCache import MISS, get_cache
+from Telemetry import instrumented
 
+# 课程表`TeacherCourses`：分区键teacherId，排序键courseId，属性courseName
+courses_table = get_table('TeacherCourses')
+
+# 教师的课程极少变化：热容器内缓存，TTL可用CACHE_TTL_TEACHERCOURSES调整
+courses_cache = get_cache('TeacherCourses')
+
+CORS_HEADERS = cors_headers()
+
+
+def teacher_id_from(event):
+    """从授权信息中获取教师ID（Cognito用户名，或自定义授权器提供的teacherId）"""
+    authorizer = (event.get('requestContext') or {}).get('authorizer') or {}
+    claims = authorizer.get('claims') or {}
+    return claims.get('cognito:username') or authorizer.get('teacherId')
+
+
+def get_teacher_courses(teacher_id):
+    """查询教师任教的课程列表[{courseId, courseName}]（带缓存）"""
+    cached = courses_cache.get(teacher_id)
+    if cached is not MISS:
+        return cached
+
+    kwargs = {
+        'KeyConditionExpression': Key('teacherId').eq(teacher_id),
+        'ProjectionExpression': 'courseId, courseName'
+    }
+    courses = []
+    while True:
+        response = courses_table.query(**kwargs)
+        courses.extend({'courseId': item.get('courseId'), 'courseName': item.get('courseName')}
+                       for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    courses_cache.put(teacher_id, courses)
+    return courses
+
+
+@instrumented
 def lambda_handler(event, context):
     try:
-        # 测试阶段：返回固定课程列表（生产环境需从表中查询真实数据）
-        courses = [
-            {"courseId": "MATH101", "courseName": "高等数学"},
-            {"courseId": "CS101", "courseName": "计算机基础"},
-            {"courseId": "PHY101", "courseName": "大学物理"}
-        ]
-        
-        # 生产环境：从DynamoDB查询教师的课程（需结合身份验证获取teacherId）
-        # 示例：
-        # teacher_id = event['requestContext']['authorizer']['teacherId']
-        # response = courses_table.query(
-        #     KeyConditionExpression='teacherId = :tid',
-        #     ExpressionAttributeValues={':tid': teacher_id}
-        # )
-        # courses = response.get('Items', [])
+        teacher_id = teacher_id_from(event)
+        if not teacher_id:
+            return {
+                'statusCode': 401,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({'message': '未获取到教师身份，请重新登录'})
+            }
+
+        courses = get_teacher_courses(teacher_id)
 
         return {
             'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Access-Control-Allow-Headers': 'Authorization, Content-Type'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps(courses)  # 必须返回数组，确保前端可遍历
         }
     except Exception as e:
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Access-Control-Allow-Headers': 'Authorization, Content-Type'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'message': str(e)})
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,224 @@
+import argparse
+import gzip
+import json
+import mmap
+import os
+import sys
+from collections import Counter
+from itertools import compress
+
+from GradeSnapshot import MANIFEST_FILE, SNAPSHOT_COLUMNS, SNAPSHOT_VERSION, STUDENTS_FILE, column_file
+
+# 成绩快照（GradeSnapshot生成）的本地查询：
+# - 分区裁剪：按学期/课程筛选时只打开命中的分区；分数范围与manifest中的最小/最大值不相交的分区直接跳过；
+# - 列裁剪：只映射查询需要的列（不按学生筛选时不读学号列），列文件用mmap按需分页读入，不整体加载；
+# - 聚合在分数直方图上完成：Counter在C中一次遍历整列计数（0-1000共1001个桶），
+#   平均分、及格率、分位数都由直方图算出；只要条数/平均/最高/最低时直接用manifest的统计，不读任何列。
+DEFAULT_METRICS = ('count', 'mean', 'min', 'max', 'passRate')
+ALL_METRICS = ('count', 'mean', 'min', 'max', 'passRate', 'stddev', 'p25', 'p50', 'p75', 'p90')
+GROUP_KEYS = ('term', 'course')
+# 这些指标可以只用manifest中的分区统计得出
+MANIFEST_METRICS = {'count', 'mean', 'min', 'max'}
+
+
+class SnapshotError(ValueError):
+    """快照不存在、版本不兼容或查询参数错误"""
+
+
+class Snapshot:
+    """打开的快照：manifest常驻内存，列文件按需内存映射（用with语句或close()释放）"""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            raise SnapshotError(f'快照不存在或未写完：{path}')
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotError(f"不支持的快照版本：{self.manifest.get('version')}")
+        self.scale = self.manifest.get('scoreScale', 10)
+        self.partitions = self.manifest['partitions']
+        self._students = None
+        self._student_index = None
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for view, mapped, handle in self._maps.values():
+            view.release()
+            mapped.close()
+            handle.close()
+        self._maps.clear()
+
+    @property
+    def students(self):
+        if self._students is None:
+            with gzip.open(os.path.join(self.path, STUDENTS_FILE), 'rt', encoding='utf-8') as f:
+                self._students = f.read().split('\n')[:-1]
+        return self._students
+
+    def student_indexes(self, student_ids=None, prefix=None):
+        """按学号列表或学号前缀（如入学年份）得到学号字典编号集合"""
+        if self._student_index is None:
+            self._student_index = {student_id: i for i, student_id in enumerate(self.students)}
+        selected = set()
+        if student_ids:
+            selected.update(self._student_index[s] for s in student_ids if s in self._student_index)
+        if prefix:
+            selected.update(i for s, i in self._student_index.items() if s.startswith(prefix))
+        return selected
+
+    def column(self, partition, name):
+        """分区的一列（内存映射的只读memoryview，元素为整数）"""
+        key = (partition['path'], name)
+        cached = self._maps.get(key)
+        if cached is None:
+            handle = open(os.path.join(self.path, column_file(partition['path'], name)), 'rb')
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped).cast(SNAPSHOT_COLUMNS[name][0])
+            if sys.byteorder != 'little':
+                raise SnapshotError('大端机器上请先转换快照字节序')
+            cached = self._maps[key] = (view, mapped, handle)
+        return cached[0]
+
+    def select(self, terms=None, courses=None, min_score=None, max_score=None):
+        """分区裁剪：返回学期/课程命中、且分数范围可能有交集的分区"""
+        low = None if min_score is None else round(min_score * self.scale)
+        high = None if max_score is None else round(max_score * self.scale)
+        selected = []
+        for part in self.partitions:
+            if terms and part['term'] not in terms:
+                continue
+            if courses and part['course'] not in courses:
+                continue
+            if low is not None and part['scoreMax'] < low:
+                continue
+            if high is not None and part['scoreMin'] > high:
+                continue
+            selected.append(part)
+        return selected
+
+
+def _percentile(histogram, total, q):
+    # 最近秩法：第ceil(q*n/100)个值
+    rank = max(1, -(-q * total // 100))
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= rank:
+            return value
+    return None
+
+
+def summarize(histogram, scale, metrics, pass_mark):
+    """由分数直方图{十分之一分: 人数}计算各指标"""
+    total = sum(histogram.values())
+    result = {'count': total}
+    if not total:
+        return {name: (0 if name == 'count' else None) for name in metrics}
+    score_sum = sum(value * n for value, n in histogram.items())
+    mean = score_sum / total
+    for name in metrics:
+        if name == 'mean':
+            result[name] = round(mean / scale, 2)
+        elif name == 'min':
+            result[name] = min(histogram) / scale
+        elif name == 'max':
+            result[name] = max(histogram) / scale
+        elif name == 'passRate':
+            threshold = round(pass_mark * scale)
+            result[name] = round(sum(n for value, n in histogram.items() if value >= threshold) / total, 4)
+        elif name == 'stddev':
+            variance = sum(n * (value - mean) ** 2 for value, n in histogram.items()) / total
+            result[name] = round(variance ** 0.5 / scale, 2)
+        elif name.startswith('p'):
+            result[name] = _percentile(histogram, total, int(name[1:])) / scale
+    return {name: result[name] for name in metrics}
+
+
+def query(snapshot, group_by=GROUP_KEYS, metrics=DEFAULT_METRICS, terms=None, courses=None,
+          student_ids=None, student_prefix=None, min_score=None, max_score=None, pass_mark=60):
+    """分组聚合：group_by为('term', 'course')的子集（空表示整体），返回按分组键排序的结果行
+
+    terms/courses为分区筛选；student_ids/student_prefix筛选学生（如一届学生的成绩趋势）；
+    min_score/max_score为分数范围（闭区间）。
+    """
+    group_by = tuple(group_by)
+    unknown = [key for key in group_by if key not in GROUP_KEYS] + [m for m in metrics if m not in ALL_METRICS]
+    if unknown:
+        raise SnapshotError(f'不支持的分组或指标：{unknown}')
+    terms = set(terms) if terms else None
+    courses = set(courses) if courses else None
+    partitions = snapshot.select(terms, courses, min_score, max_score)
+    students = snapshot.student_indexes(student_ids, student_prefix) if (student_ids or student_prefix) else None
+    low = None if min_score is None else round(min_score * snapshot.scale)
+    high = None if max_score is None else round(max_score * snapshot.scale)
+
+    # 不筛选学生和分数、且只要manifest可提供的指标时，完全不读列文件
+    manifest_only = students is None and low is None and high is None and set(metrics) <= MANIFEST_METRICS
+    groups = {}
+    for part in partitions:
+        key = tuple(part[name] for name in group_by)
+        if manifest_only:
+            stats = groups.setdefault(key, {'count': 0, 'sum': 0, 'min': None, 'max': None})
+            stats['count'] += part['rows']
+            stats['sum'] += part['scoreSum']
+            stats['min'] = part['scoreMin'] if stats['min'] is None else min(stats['min'], part['scoreMin'])
+            stats['max'] = part['scoreMax'] if stats['max'] is None else max(stats['max'], part['scoreMax'])
+            continue
+        scores = snapshot.column(part, 'score')
+        if students is not None:
+            scores = compress(scores, map(students.__contains__, snapshot.column(part, 'student')))
+        histogram = groups.setdefault(key, Counter())
+        histogram.update(scores)
+
+    rows = []
+    for key in sorted(groups):
+        row = dict(zip(group_by, key))
+        if manifest_only:
+            stats = groups[key]
+            values = {
+                'count': stats['count'],
+                'mean': round(stats['sum'] / stats['count'] / snapshot.scale, 2) if stats['count'] else None,
+                'min': stats['min'] / snapshot.scale if stats['min'] is not None else None,
+                'max': stats['max'] / snapshot.scale if stats['max'] is not None else None
+            }
+            row.update((name, values[name]) for name in metrics)
+        else:
+            histogram = groups[key]
+            if low is not None or high is not None:
+                histogram = Counter({value: n for value, n in histogram.items()
+                                     if (low is None or value >= low) and (high is None or value <= high)})
+            row.update(summarize(histogram, snapshot.scale, metrics, pass_mark))
+        rows.append(row)
+    return rows
+
+
+def _split(value):
+    return [part for part in (value or '').split(',') if part]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查询成绩列式快照（如各课程历年及格率、某一届学生的成绩趋势）')
+    parser.add_argument('snapshot', help='GradeSnapshot生成的快照目录')
+    parser.add_argument('--group-by', default='course,term', help='分组键（term、course，逗号分隔；空为整体）')
+    parser.add_argument('--metrics', default=','.join(DEFAULT_METRICS), help=f'指标（可选：{",".join(ALL_METRICS)}）')
+    parser.add_argument('--term', default='', help='学期筛选（逗号分隔）')
+    parser.add_argument('--course', default='', help='课程筛选（逗号分隔）')
+    parser.add_argument('--students', default='', help='学号筛选（逗号分隔）')
+    parser.add_argument('--cohort', default=None, help='学号前缀（如入学年份2023）')
+    parser.add_argument('--min-score', type=float, default=None)
+    parser.add_argument('--max-score', type=float, default=None)
+    parser.add_argument('--pass-mark', type=float, default=60)
+    args = parser.parse_args()
+    with Snapshot(args.snapshot) as snap:
+        result = query(snap, _split(args.group_by), _split(args.metrics), _split(args.term), _split(args.course),
+                       _split(args.students), args.cohort, args.min_score, args.max_score, args.pass_mark)
+    for row in result:
+        print(json.dumps(row, ensure_ascii=False))
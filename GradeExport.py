@@ -0,0 +1,239 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from AwsRuntime import get_client, lazy, type_deserializer, type_serializer
+from GetTeacherCourses import get_teacher_courses, teacher_id_from
+from ObjectStore import get_object_store
+from Telemetry import instrumented
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# 并行扫描使用低层client（线程安全），resource对象不能跨线程共享
+dynamodb_client = lazy(lambda: get_client('dynamodb'))
+GRADES_TABLE_NAME = 'Grades'
+
+EXPORT_COLUMNS = ['studentId', 'gradeId', 'course', 'term', 'score']
+EXPORT_FORMATS = {
+    'csv': ('csv.gz', 'text/csv'),
+    'ndjson': ('ndjson.gz', 'application/x-ndjson'),
+}
+
+DEFAULT_SEGMENTS = 8
+MAX_SEGMENTS = 64
+# 每个分段最多积压的页数：队列有界，消费者（压缩写入）跟不上时扫描线程会阻塞，内存占用与表大小无关
+PAGES_IN_FLIGHT_PER_SEGMENT = 2
+
+_deserializer = lazy(type_deserializer)
+_serializer = lazy(type_serializer)
+_DONE = object()
+
+
+def _deserialize(item):
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
+def parallel_scan(table_name=GRADES_TABLE_NAME, total_segments=DEFAULT_SEGMENTS,
+                  page_size=None, client=None, projection=None, courses=None, term=None):
+    """分段并行扫描（Segment/TotalSegments），逐条产出已反序列化的记录
+
+    每个分段一个线程，扫描到的页放入有界队列；生成器被提前关闭时通知所有线程停止。
+    projection为属性名列表时只读取这些属性；courses/term不为None时只产出这些课程（及学期）的记录。
+    """
+    client = client or dynamodb_client
+    pages = queue.Queue(maxsize=total_segments * PAGES_IN_FLIGHT_PER_SEGMENT)
+    stop = threading.Event()
+
+    def put(obj):
+        # 带超时的put，保证消费者退出后扫描线程也能及时结束
+        while not stop.is_set():
+            try:
+                pages.put(obj, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan_segment(segment):
+        kwargs = {'TableName': table_name, 'Segment': segment, 'TotalSegments': total_segments}
+        if page_size:
+            kwargs['Limit'] = page_size
+        if projection:
+            kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+            kwargs['ExpressionAttributeNames'] = {f'#p{i}': name for i, name in enumerate(projection)}
+        if courses is not None or term:
+            kwargs.update(_scan_filter(courses, term, kwargs.get('ExpressionAttributeNames', {})))
+        try:
+            while not stop.is_set():
+                response = client.scan(**kwargs)
+                if not put(response.get('Items', [])):
+                    return
+                last_key = response.get('LastEvaluatedKey')
+                if not last_key:
+                    break
+                kwargs['ExclusiveStartKey'] = last_key
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for segment in range(total_segments):
+            executor.submit(scan_segment, segment)
+        try:
+            remaining = total_segments
+            while remaining:
+                page = pages.get()
+                if page is _DONE:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for item in page:
+                        yield _deserialize(item)
+        finally:
+            stop.set()
+
+
+def _scan_filter(courses, term, names):
+    """按课程（course IN (...)）及学期过滤的FilterExpression参数"""
+    conditions = []
+    names = dict(names)
+    values = {}
+    if courses is not None:
+        names['#fc'] = 'course'
+        placeholders = []
+        for i, course in enumerate(courses):
+            values[f':fc{i}'] = _serializer.serialize(course)
+            placeholders.append(f':fc{i}')
+        conditions.append(f"#fc IN ({', '.join(placeholders)})")
+    if term:
+        names['#ft'] = 'term'
+        values[':ft'] = _serializer.serialize(term)
+        conditions.append('#ft = :ft')
+    return {'FilterExpression': ' AND '.join(conditions), 'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f'无法序列化类型：{type(value).__name__}')
+
+
+def write_rows(rows, raw_file, export_format):
+    """把记录流式写入gzip压缩的CSV或NDJSON，返回写入行数"""
+    count = 0
+    with gzip.GzipFile(fileobj=raw_file, mode='wb') as gz:
+        text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+        if export_format == 'csv':
+            writer = csv.DictWriter(text, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                text.write(json.dumps(row, default=_json_default, ensure_ascii=False))
+                text.write('\n')
+                count += 1
+        text.flush()
+        text.detach()
+    return count
+
+
+def export_grades(export_format='csv', total_segments=DEFAULT_SEGMENTS, location=None, client=None,
+                  courses=None, term=None, owner=None):
+    """导出：并行扫描 -> 流式压缩写入/tmp临时文件 -> 上传对象存储
+
+    courses/term限定导出范围（教师只能导出自己任教的课程）；owner不为空时对象键带上导出者目录，
+    不同教师同一秒的导出不会互相覆盖。
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式：{export_format}，仅支持{list(EXPORT_FORMATS)}')
+    suffix, content_type = EXPORT_FORMATS[export_format]
+    started = time.monotonic()
+
+    with tempfile.TemporaryFile() as tmp:
+        rows = write_rows(parallel_scan(total_segments=total_segments, client=client, courses=courses, term=term),
+                          tmp, export_format)
+        size = tmp.tell()
+        tmp.seek(0)
+        prefix = f'exports/{owner}/' if owner else 'exports/'
+        key = f"{prefix}grades-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{suffix}"
+        uri = get_object_store(location).put_file(key, tmp, content_type)
+
+    elapsed = time.monotonic() - started
+    logger.info(f"导出完成：{rows}行，{size}字节，{total_segments}个分段，耗时{elapsed:.2f}秒")
+    return {
+        'location': uri,
+        'format': export_format,
+        'rows': rows,
+        'bytes': size,
+        'segments': total_segments,
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(rows / elapsed, 1) if elapsed > 0 else None
+    }
+
+
+def export_response(query_params, teacher_id, courses, term=None):
+    """校验导出参数并导出指定课程（调用方已确认教师身份和任教课程），返回Lambda响应"""
+    export_format = (query_params.get('export') or query_params.get('format') or 'csv').lower()
+    try:
+        segments = int(query_params.get('segments') or DEFAULT_SEGMENTS)
+    except ValueError:
+        segments = 0
+    if not 1 <= segments <= MAX_SEGMENTS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f'segments必须是1-{MAX_SEGMENTS}之间的整数'})
+        }
+    if export_format not in EXPORT_FORMATS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f'不支持的导出格式：{export_format}'})
+        }
+
+    result = export_grades(export_format, segments, courses=courses, term=term, owner=teacher_id)
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
+
+
+@instrumented
+def lambda_handler(event, context):
+    try:
+        query_params = event.get('queryStringParameters') or {}
+        # 与成绩列表相同：只允许教师导出自己任教的课程
+        teacher_id = teacher_id_from(event)
+        if not teacher_id:
+            return {
+                'statusCode': 401,
+                'body': json.dumps({'message': '未获取到教师身份，请重新登录'})
+            }
+        taught = [c['courseName'] for c in get_teacher_courses(teacher_id) if c.get('courseName')]
+        course = (query_params.get('course') or '').strip() or None
+        if course and course not in taught:
+            return {
+                'statusCode': 403,
+                'body': json.dumps({'message': f'无权导出课程{course}的成绩'})
+            }
+        term = (query_params.get('term') or '').strip() or None
+        return export_response(query_params, teacher_id, [course] if course else taught, term)
+    except Exception as e:
+        logger.error(f"导出失败：{str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'message': str(e)})
+        }
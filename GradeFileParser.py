@@ -1,53 +1,171 @@
 import json
-import boto3
-import csv
-import base64
+import hashlib
 import re
-from io import StringIO
+import time
 import logging
-from decimal import Decimal  # 导入Decimal模块
+from datetime import datetime, timezone
+
+from AwsRuntime import Attr, Key, dynamodb, get_table
+from ChangeLog import COURSE_VERSION_INDEX, GRADE_TOMBSTONES_TABLE_NAME, stamp
+from DynamoBatch import batch_get_items, batch_write, conditional_put
+from GradeStats import StatsDelta, update_stats
+from GradeValidation import REQUIRED_COLUMNS, validate
+from GradeViews import request_publish
+from JsonResponse import cors_headers
+from MultipartStream import decode_body, find_file_part, iter_csv_rows
+from Telemetry import instrumented
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-grades_table = dynamodb.Table('Grades')
-
-CORS_HEADERS = {
-    'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-    'Access-Control-Allow-Headers': 'Content-Type, Authorization'
-}
-
-def parse_multipart_form_data(body, boundary):
-    parts = re.split(boundary, body, flags=re.MULTILINE, maxsplit=10)
-    file_content = None
-    for i, part in enumerate(parts):
-        if not part.strip():
-            continue
-        field_match = re.search(b'name="file"; filename="(.*?)"', part, re.IGNORECASE)
-        if field_match:
-            try:
-                content_parts = part.split(b'\r\n\r\n', 1)
-                if len(content_parts) < 2:
-                    return None
-                content = content_parts[1].rstrip(b'\r\n--')
-                file_content = content.decode('utf-8')
+GRADES_TABLE_NAME = 'Grades'
+GRADES_KEY = ('studentId', 'gradeId')
+grades_table = get_table(GRADES_TABLE_NAME)
+tombstones_table = get_table(GRADE_TOMBSTONES_TABLE_NAME)
+# 成绩表二级索引（分区键course，排序键term），upsert模式按课程+学期读取已有成绩
+COURSE_TERM_INDEX = 'course-term-index'
+
+# 已导入文件的内容哈希（主键contentHash），用于跳过完全相同的重复上传；
+# 记录中保存导入时的版本号和涉及的课程+学期，此后这些课程+学期有成绩被写入或删除时不再跳过
+imports_table = get_table('GradeImports')
+IMPORT_HASH_TTL_DAYS = 30
+
+# 导入模式：replace全部覆盖写；upsert只写新增或分数有变化的成绩
+IMPORT_MODES = ('replace', 'upsert')
+
+# 并发写入的线程数（每个线程一次提交25条）
+WRITE_WORKERS = 16
+# 校验失败时响应中最多列出的错误条数
+MAX_REPORTED_ERRORS = 1000
+
+CORS_HEADERS = cors_headers()
+
+def parse_boundary(content_type):
+    """从Content-Type中提取multipart的boundary（区分大小写，需传入原始Content-Type）"""
+    match = re.search(r'boundary=(?:"([^"]+)"|([^;\s]+))', content_type or '', re.IGNORECASE)
+    return (match.group(1) or match.group(2)).encode('utf-8') if match else None
+
+def content_hash(file_part):
+    """上传文件内容的SHA-256（直接对memoryview计算，不复制）"""
+    return hashlib.sha256(file_part.view).hexdigest()
+
+def changed_since(course_terms, version):
+    """这些课程+学期在version之后是否有成绩被写入或删除（按course-version-index查询成绩和墓碑，读到一条即返回）"""
+    for table in (grades_table, tombstones_table):
+        for course, term in course_terms:
+            kwargs = {
+                'IndexName': COURSE_VERSION_INDEX,
+                'KeyConditionExpression': Key('course').eq(course) & Key('version').gt(version),
+                'FilterExpression': Attr('term').eq(term),
+                'ProjectionExpression': 'gradeId'
+            }
+            while True:
+                response = table.query(**kwargs)
+                if response.get('Items'):
+                    return True
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return False
+
+def find_previous_import(digest):
+    """查询同一内容的文件是否已成功导入过，且导入后相关成绩未被修改或删除（否则返回None，需重新导入）"""
+    item = imports_table.get_item(Key={'contentHash': digest}).get('Item')
+    if not item or int(item.get('expiresAt', 0)) <= time.time() or 'version' not in item:
+        return None
+    if changed_since(item.get('courseTerms') or [], int(item['version'])):
+        return None
+    return item
+
+def record_import(digest, file_name, row_count, version, course_terms):
+    """记录成功导入的文件哈希、本次写入的版本号和涉及的课程+学期；expiresAt配合DynamoDB TTL自动清理"""
+    try:
+        imports_table.put_item(Item={
+            'contentHash': digest,
+            'fileName': file_name,
+            'rows': row_count,
+            'version': version,
+            'courseTerms': [list(pair) for pair in sorted(course_terms)],
+            'importedAt': datetime.now(timezone.utc).isoformat(),
+            'expiresAt': int(time.time()) + IMPORT_HASH_TTL_DAYS * 86400
+        })
+    except Exception as e:
+        # 记录失败只影响下次的快速跳过，不影响本次导入结果
+        logger.warning(f"导入记录写入失败: {str(e)}")
+
+def load_existing_scores(course_terms):
+    """按课程+学期从course-term-index读取已有成绩，返回{(studentId, gradeId): score}
+
+    索引投影需包含score属性。
+    """
+    existing = {}
+    for course, term in course_terms:
+        kwargs = {
+            'IndexName': COURSE_TERM_INDEX,
+            'KeyConditionExpression': Key('course').eq(course) & Key('term').eq(term),
+            'ProjectionExpression': 'studentId, gradeId, score'
+        }
+        while True:
+            response = grades_table.query(**kwargs)
+            for item in response.get('Items', []):
+                existing[(item['studentId'], item['gradeId'])] = item.get('score')
+            if 'LastEvaluatedKey' not in response:
                 break
-            except Exception as e:
-                logger.error(f"解析文件内容失败: {str(e)}")
-                return None
-    return file_content
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return existing
+
+def diff_rows(rows, existing):
+    """与已有成绩比较，返回(条件写入请求, 新增行号集合, 更新行号集合, 未变化行数)
+
+    新增用attribute_not_exists防止覆盖并发写入的数据；更新要求分数仍为读取时的旧值（旧记录无分数时要求分数仍不存在）。
+    """
+    requests = []
+    inserted = set()
+    updated = set()
+    unchanged = 0
+    for row_num, item in rows:
+        key = (item['studentId'], item['gradeId'])
+        if key not in existing:
+            requests.append((row_num, item, 'attribute_not_exists(gradeId)', None))
+            inserted.add(row_num)
+        elif existing[key] != item['score']:
+            if existing[key] is None:
+                # 已有记录没有分数时score = :old永远不成立，改为要求分数仍不存在
+                requests.append((row_num, item, 'attribute_not_exists(score)', None))
+            else:
+                requests.append((row_num, item, 'score = :old', {':old': existing[key]}))
+            updated.add(row_num)
+        else:
+            unchanged += 1
+    return requests, inserted, updated, unchanged
+
+def load_previous_items(rows):
+    """覆盖写入（replace模式）前按主键强一致地批量读取旧成绩，返回{(studentId, gradeId): 成绩}
+
+    统计按旧成绩→新成绩的变化量累加；不在写入后查询最终一致的course-term-index重算（刚写入的行可能还读不到）。
+    """
+    keys = [{name: item[name] for name in GRADES_KEY} for _, item in rows]
+    items, unprocessed = batch_get_items(dynamodb, GRADES_TABLE_NAME, keys,
+                                         projection=['studentId', 'gradeId', 'course', 'term', 'score'],
+                                         consistent_read=True)
+    if unprocessed:
+        raise RuntimeError(f'读取已有成绩时有{len(unprocessed)}个键因限流未处理，请稍后重试')
+    return {(item['studentId'], item['gradeId']): item for item in items}
 
+@instrumented
 def lambda_handler(event, context):
     try:
-        logger.info(f"收到请求事件: {json.dumps(event, indent=2)}")
+        # 只记录请求概要，不输出整个事件（其中包含完整的上传文件内容）
+        logger.info(f"收到上传请求: bodyLength={len(event.get('body') or '')}, "
+                    f"isBase64Encoded={event.get('isBase64Encoded', False)}")
 
         headers = event.get('headers', {})
-        content_type = headers.get('content-type', headers.get('Content-Type', '')).lower()
+        raw_content_type = headers.get('content-type', headers.get('Content-Type', ''))
+        content_type = raw_content_type.lower()
         logger.info(f"请求Content-Type: [{content_type}]")
 
-        boundary_match = re.search(r'boundary=(["\']?)(.*?)\1', content_type)
-        if not boundary_match or 'multipart/form-data' not in content_type:
+        boundary = parse_boundary(raw_content_type)
+        if not boundary or 'multipart/form-data' not in content_type:
             logger.error(f"不支持的Content-Type: {content_type}")
             return {
                 'statusCode': 400,
@@ -55,23 +173,22 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': '不支持的Content-Type，需为multipart/form-data'})
             }
 
-        boundary = boundary_match.group(2).encode('utf-8')
-        full_boundary = b'--' + boundary
+        body = decode_body(event)
 
-        if event.get('isBase64Encoded', False):
-            body = base64.b64decode(event['body'])
-        else:
-            body = event['body'].encode('utf-8')
-
-        file_content = parse_multipart_form_data(body, full_boundary)
-        if not file_content:
+        # 定位文件字段（只记录偏移量，不复制文件内容）
+        try:
+            file_part = find_file_part(body, boundary)
+        except Exception as e:
+            logger.error(f"解析文件内容失败: {str(e)}")
+            file_part = None
+        if not file_part or not file_part.size:
             return {
                 'statusCode': 400,
                 'headers': CORS_HEADERS,
                 'body': json.dumps({'message': '未找到文件内容'})
             }
 
-        file_name = event.get('queryStringParameters', {}).get('filename', '')
+        file_name = (event.get('queryStringParameters') or {}).get('filename', '')
         logger.info(f"文件名: {file_name}")
         if not file_name:
             return {
@@ -87,9 +204,39 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': '仅支持.csv格式文件'})
             }
 
+        query_params = event.get('queryStringParameters') or {}
+        mode = (query_params.get('mode') or 'replace').lower()
+        if mode not in IMPORT_MODES:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({'message': f'不支持的导入模式：{mode}，仅支持{list(IMPORT_MODES)}'})
+            }
+
+        # 完全相同的文件重复上传（upsert模式）：导入后相关成绩未变化时按内容哈希直接跳过，不写成绩表；
+        # force=1时总是重新导入
+        digest = content_hash(file_part)
+        if mode == 'upsert' and str(query_params.get('force', '')).lower() not in ('1', 'true'):
+            previous = find_previous_import(digest)
+            if previous:
+                logger.info(f"文件内容与已导入文件相同，跳过：hash={digest}")
+                return {
+                    'statusCode': 200,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({
+                        'message': f'文件内容与{previous.get("importedAt")}导入的文件完全相同且成绩未被修改，无需重复导入',
+                        'mode': mode,
+                        'skipped': True,
+                        'inserted': 0,
+                        'updated': 0,
+                        'unchanged': int(previous.get('rows', 0))
+                    })
+                }
+
         try:
-            csv_reader = csv.DictReader(StringIO(file_content))
-            logger.info(f"CSV表头: {csv_reader.fieldnames}")
+            # 逐行解码、逐行产出记录，内存占用与文件大小无关
+            csv_reader = iter_csv_rows(file_part)
+            logger.info(f"CSV表头: {csv_reader.fieldnames}，文件大小: {file_part.size}字节")
         except Exception as e:
             logger.error(f"CSV解析失败: {str(e)}")
             return {
@@ -99,8 +246,8 @@ def lambda_handler(event, context):
             }
 
         # 校验CSV表头是否包含必要字段（course对应数据库字段）
-        required_columns = ['studentId', 'course', 'term', 'score']
-        missing_columns = [col for col in required_columns if col not in csv_reader.fieldnames]
+        required_columns = REQUIRED_COLUMNS
+        missing_columns = [col for col in required_columns if col not in (csv_reader.fieldnames or [])]
         if missing_columns:
             return {
                 'statusCode': 400,
@@ -110,52 +257,47 @@ def lambda_handler(event, context):
                 })
             }
 
-        success_count = 0
+        # 第一步：按列批量校验整个文件（必填、分数范围、文件内重复），任何一行有误都不写入
+        rows, errors = validate(csv_reader)
+        if errors:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({
+                    'message': f'CSV校验失败：{len(errors)}行数据有误，未导入任何成绩',
+                    'rejected': len({error['row'] for error in errors}),
+                    # 错误过多时只返回前MAX_REPORTED_ERRORS条，避免响应体过大
+                    'rows': [dict(error, status='rejected') for error in errors[:MAX_REPORTED_ERRORS]],
+                    'truncated': len(errors) > MAX_REPORTED_ERRORS
+                })
+            }
+        if not rows:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({'message': 'CSV中没有成绩数据'})
+            }
+
+        # 第二步：写入。upsert模式只写新增/变化的成绩（条件写入），replace模式全部覆盖写
         try:
-            with grades_table.batch_writer() as batch:
-                for row_num, row in enumerate(csv_reader, start=2):
-                    # 提取CSV数据（统一用course_name变量存储课程名）
-                    student_id = str(row['studentId']).strip()
-                    course_name = str(row['course']).strip()  # 从CSV的course列提取
-                    term = str(row['term']).strip()
-                    score_str = str(row['score']).strip()
-
-                    # 校验数据完整性（使用course_name变量）
-                    if not (student_id and course_name and term):
-                        return {
-                            'statusCode': 400,
-                            'headers': CORS_HEADERS,
-                            'body': json.dumps({
-                                'message': f'第{row_num}行数据不完整（学号/课程/学期不能为空）'
-                            })
-                        }
-
-                    try:
-                        # 分数转换为Decimal类型
-                        score = Decimal(score_str)
-                        if not (Decimal('0') <= score <= Decimal('100')):
-                            raise ValueError
-                    except ValueError:
-                        return {
-                            'statusCode': 400,
-                            'headers': CORS_HEADERS,
-                            'body': json.dumps({
-                                'message': f'第{row_num}行分数错误（必须是0-100之间的数字）'
-                            })
-                        }
-
-                    # 生成grade_id（使用course_name）
-                    grade_id = f"{course_name}+{term}+{student_id}"
-                    # 写入数据库（字段为course，值为course_name）
-                    batch.put_item(Item={
-                        'studentId': student_id,
-                        'gradeId': grade_id,
-                        'course': course_name,  # 对应数据库的course字段
-                        'term': term,
-                        'score': score
-                    })
-                    success_count += 1
-            logger.info(f"批量写入成功，共{success_count}条数据")
+            client = grades_table.meta.client
+            if mode == 'upsert':
+                existing = load_existing_scores({(item['course'], item['term']) for _, item in rows})
+                requests, inserted, updated, unchanged = diff_rows(rows, existing)
+                version = stamp([item for _, item, _, _ in requests])
+                report = conditional_put(client, GRADES_TABLE_NAME, requests, workers=WRITE_WORKERS)
+                counts = {
+                    'inserted': sum(1 for ref in inserted if report.status.get(ref) in ('written', 'retried')),
+                    'updated': sum(1 for ref in updated if report.status.get(ref) in ('written', 'retried')),
+                    'unchanged': unchanged
+                }
+            else:
+                previous = load_previous_items(rows)
+                puts = [(row_num, 'put', item) for row_num, item in rows]
+                version = stamp([item for _, _, item in puts])
+                report = batch_write(client, GRADES_TABLE_NAME, puts,
+                                     key_names=GRADES_KEY, workers=WRITE_WORKERS)
+                counts = {}
         except Exception as e:
             logger.error(f"DynamoDB写入失败: {str(e)}")
             return {
@@ -164,11 +306,50 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': f'数据写入失败: {str(e)}'})
             }
 
+        # 更新课程统计：upsert按条件写入的旧值增量累加；replace按写入前读取的旧成绩增量累加
+        delta = StatsDelta()
+        if mode == 'upsert':
+            delta.record_conditional_puts(requests, report.status)
+        else:
+            delta.record_overwrites(rows, previous, report.status)
+        update_stats(delta)
+        # 重建写入成功的学生的成绩视图
+        written = {ref for ref, status in report.status.items() if status in ('written', 'retried')}
+        request_publish(students=[sid for ref, sid in zip(rows.row_numbers, rows.student_ids) if ref in written])
+
+        summary = dict(report.summary(), mode=mode, **counts)
+        logger.info(f"批量写入完成：{summary}")
+        # 逐行报告只列出重试过、冲突或失败的行，其余行均为written
+        row_report = [
+            {'row': row_num, 'status': status, **({'message': report.errors[row_num]} if row_num in report.errors else {})}
+            for row_num, status in sorted(report.status.items()) if status != 'written'
+        ]
+        success_count = summary['written'] + summary['retried']
+        if summary['failed'] or summary['conflict']:
+            # 未写入的行可直接重新上传同一文件（按主键写入，重复导入是幂等的）
+            return {
+                'statusCode': 500 if summary['failed'] else 409,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({
+                    'message': f'部分成绩写入失败：成功{success_count}条，'
+                               f'失败{summary["failed"] + summary["conflict"]}条，请重新上传',
+                    **summary,
+                    'rows': row_report
+                })
+            }
+
+        record_import(digest, file_name, len(rows), version, set(zip(rows.courses, rows.terms)))
+        if mode == 'upsert':
+            message = f'批量上传成功：新增{counts["inserted"]}条，更新{counts["updated"]}条，未变化{counts["unchanged"]}条'
+        else:
+            message = f'批量上传成功，共导入{success_count}条成绩'
         return {
             'statusCode': 200,
             'headers': CORS_HEADERS,
             'body': json.dumps({
-                'message': f'批量上传成功，共导入{success_count}条成绩'
+                'message': message,
+                **summary,
+                'rows': row_report
             })
         }
 
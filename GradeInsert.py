@@ -1,81 +1,216 @@
-import boto3
 import json
-from decimal import Decimal
+import logging
 
-dynamodb = boto3.resource('dynamodb')
-grades_table = dynamodb.Table('Grades')
+from AwsRuntime import dynamodb, get_table
+from ChangeLog import stamp
+from DynamoBatch import TRANSACT_WRITE_LIMIT, batch_get_items, batch_write, conditional_put, transact_put
+from GradeStats import StatsDelta, update_stats
+from GradeViews import request_publish
+from GradeValidation import validate_columns
+from JsonResponse import cors_headers, dumps
+from MultipartStream import decode_body
+from Telemetry import instrumented
 
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+GRADES_TABLE_NAME = 'Grades'
+GRADES_KEY = ('studentId', 'gradeId')
+grades_table = get_table(GRADES_TABLE_NAME)
+
+# 请求体可以是单条成绩（页面录入）、成绩数组，或{"grades": [...], "overwrite": bool, "atomic": bool}：
+# - overwrite为false时不覆盖已有成绩（条件写入，已存在的记为exists）；默认true；
+# - atomic为true时整批用TransactWriteItems写入（全部成功或全部不写，最多100条）；
+#   否则按25条一组并发BatchWriteItem（overwrite为false时为并发条件PutItem）。
+# 字段名兼容页面表单（courseName/semester）与CSV（course/term）。
+MAX_BATCH_ITEMS = 1000
+WRITE_WORKERS = 16
+
+CORS_HEADERS = cors_headers(extra={'Content-Type': 'application/json'})
+
+
+class InvalidRequestError(ValueError):
+    """请求参数错误（返回400）"""
+
+
+def _response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': dumps(body)
+    }
+
+
+def _flag(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+
+def _text(value):
+    if value is None or isinstance(value, bool):
+        return ''
+    return str(value).strip()
+
+
+def parse_request(event):
+    """返回(成绩列表, 是否为单条录入, overwrite, atomic)"""
+    try:
+        data = json.loads(decode_body(event))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidRequestError(f'请求体格式错误（需为JSON）：{str(e)}')
+    query_params = event.get('queryStringParameters') or {}
+    options = {}
+    single = False
+    if isinstance(data, dict) and 'grades' in data:
+        grades, options = data['grades'], data
+    elif isinstance(data, list):
+        grades = data
+    elif isinstance(data, dict):
+        grades, single = [data], True
+    else:
+        raise InvalidRequestError('请求体需为成绩对象或成绩数组')
+
+    if not isinstance(grades, list) or not grades:
+        raise InvalidRequestError('grades需为非空数组')
+    if len(grades) > MAX_BATCH_ITEMS:
+        raise InvalidRequestError(f'单次最多提交{MAX_BATCH_ITEMS}条成绩')
+    overwrite = _flag(options.get('overwrite', query_params.get('overwrite')), True)
+    atomic = _flag(options.get('atomic', query_params.get('atomic')), False)
+    if atomic and len(grades) > TRANSACT_WRITE_LIMIT:
+        raise InvalidRequestError(f'atomic模式单次最多提交{TRANSACT_WRITE_LIMIT}条成绩')
+    return grades, single, overwrite, atomic
+
+
+def to_columns(grades):
+    """把成绩对象数组转为GradeValidation的按列格式（与CSV导入使用同一套校验和gradeId规则）"""
+    columns = {'studentId': [], 'course': [], 'term': [], 'score': []}
+    for grade in grades:
+        grade = grade if isinstance(grade, dict) else {}
+        columns['studentId'].append(_text(grade.get('studentId')))
+        columns['course'].append(_text(grade.get('courseName', grade.get('course'))))
+        columns['term'].append(_text(grade.get('semester', grade.get('term'))))
+        columns['score'].append(_text(grade.get('score')))
+    return columns
+
+
+def load_existing(rows):
+    """批量读取已有成绩，返回{(studentId, gradeId): 成绩}"""
+    keys = [{name: item[name] for name in GRADES_KEY} for _, item in rows]
+    items, unprocessed = batch_get_items(dynamodb, GRADES_TABLE_NAME, keys,
+                                         projection=['studentId', 'gradeId', 'course', 'term', 'score'])
+    if unprocessed:
+        raise RuntimeError(f'读取已有成绩时有{len(unprocessed)}个键因限流未处理，请稍后重试')
+    return {(item['studentId'], item['gradeId']): item for item in items}
+
+
+def plan_writes(rows, existing, overwrite):
+    """逐条决定写入方式，返回(写入请求, 预先确定的结果{序号: 状态})
+
+    写入请求与conditional_put相同：新增要求主键不存在，覆盖要求分数仍为读取时的旧值（旧记录无分数时要求分数仍不存在）。
+    """
+    requests = []
+    outcomes = {}
+    for row_num, item in rows:
+        old = existing.get((item['studentId'], item['gradeId']))
+        if old is None:
+            requests.append((row_num, item, 'attribute_not_exists(gradeId)', None))
+        elif old.get('score') == item['score']:
+            outcomes[row_num] = 'unchanged'
+        elif not overwrite:
+            outcomes[row_num] = 'exists'
+        elif old.get('score') is None:
+            # 已有记录没有分数时score = :old永远不成立，改为要求分数仍不存在
+            requests.append((row_num, item, 'attribute_not_exists(score)', None))
+        else:
+            requests.append((row_num, item, 'score = :old', {':old': old.get('score')}))
+    return requests, outcomes
+
+
+def write_grades(requests, overwrite, atomic):
+    client = grades_table.meta.client
+    if atomic:
+        return transact_put(client, GRADES_TABLE_NAME, requests)
+    if not overwrite:
+        return conditional_put(client, GRADES_TABLE_NAME, requests, workers=WRITE_WORKERS)
+    # 允许覆盖时不需要条件：按25条一组批量写入，请求数最少
+    return batch_write(client, GRADES_TABLE_NAME, [(ref, 'put', item) for ref, item, _, _ in requests],
+                       key_names=GRADES_KEY, workers=WRITE_WORKERS)
+
+
+@instrumented
 def lambda_handler(event, context):
     try:
-        # 解析前端数据
-        data = json.loads(event['body'])
-        student_id = data.get('studentId')
-        course = data.get('courseName')
-        score = data.get('score')
-        term = data.get('semester')
-
-        # 数据校验
-        if not all([student_id, course, score, term]):
-            return {
-                'statusCode': 400,
-                # 必须包含CORS头
-                'headers': {
-                    'Access-Control-Allow-Origin': 'https://dfg1ezlq7v3yy.cloudfront.net',
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({'message': '数据不完整'})
-            }
-
-        # 分数转换（Decimal类型）
         try:
-            score_decimal = Decimal(str(float(score)))
-            if score_decimal < 0 or score_decimal > 100:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Access-Control-Allow-Origin': 'https://dfg1ezlq7v3yy.cloudfront.net',
-                        'Content-Type': 'application/json'
-                    },
-                    'body': json.dumps({'message': '分数必须在0-100之间'})
-                }
-        except ValueError:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': 'https://dfg1ezlq7v3yy.cloudfront.net',
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({'message': '分数必须是有效数字'})
-            }
-
-        # 写入DynamoDB
-        grade_id = f'{course}+{term}'
-        grades_table.put_item(Item={
-            'studentId': student_id,
-            'gradeId': grade_id,
-            'course': course,
-            'score': score_decimal,
-            'term': term
-        })
-
-        # 成功响应（含CORS头）
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({'message': '成绩录入成功'})
-        }
+            grades, single, overwrite, atomic = parse_request(event)
+        except InvalidRequestError as e:
+            return _response(400, {'message': str(e)})
+
+        # 校验规则与CSV导入一致（必填、0-100分、批内重复）；任何一条有误都不写入
+        rows, errors = validate_columns(to_columns(grades), first_row=1)
+        if errors:
+            if single:
+                return _response(400, {'message': errors[0]['message']})
+            return _response(400, {
+                'message': f'校验失败：{len({error["row"] for error in errors})}条成绩有误，未写入任何成绩',
+                'results': [dict(error, status='rejected') for error in errors]
+            })
+
+        existing = load_existing(rows)
+        requests, outcomes = plan_writes(rows, existing, overwrite)
+        # 本次写入的成绩共用一个变更版本号（增量同步据此下发）
+        stamp([item for _, item, _, _ in requests])
+        report = write_grades(requests, overwrite, atomic)
+
+        # 写入成功的按新旧分数增量更新课程统计
+        delta = StatsDelta()
+        for ref, item, _, _ in requests:
+            status = report.status.get(ref)
+            if status in ('written', 'retried'):
+                old = existing.get((item['studentId'], item['gradeId']))
+                outcomes[ref] = 'updated' if old else 'inserted'
+                delta.record_item_change(old, item)
+            else:
+                outcomes[ref] = status or 'failed'
+        update_stats(delta)
+        # 重建相关学生的成绩视图（经队列异步执行）
+        request_publish(students=[item['studentId'] for ref, item, _, _ in requests
+                                  if report.status.get(ref) in ('written', 'retried')])
+
+        results = []
+        for row_num, item in rows:
+            result = {'row': row_num, 'studentId': item['studentId'], 'gradeId': item['gradeId'],
+                      'status': outcomes[row_num]}
+            if row_num in report.errors:
+                result['message'] = report.errors[row_num]
+            results.append(result)
+        counts = {status: sum(1 for r in results if r['status'] == status)
+                  for status in ('inserted', 'updated', 'unchanged', 'exists', 'conflict', 'failed')}
+        logger.info(f"成绩录入完成：{len(results)}条，{counts}，overwrite={overwrite}，atomic={atomic}")
+
+        # atomic模式下有冲突时整个事务取消，其余成绩记为failed（未写入），按冲突返回409
+        if counts['conflict'] and (atomic or not counts['failed']):
+            status_code = 409
+        else:
+            status_code = 500 if counts['failed'] else 200
+        if single:
+            result = results[0]
+            if result['status'] == 'exists':
+                return _response(409, {'message': '该成绩已存在（未覆盖）', **result})
+            if status_code != 200:
+                return _response(status_code, {'message': result.get('message') or '成绩写入失败，请重试', **result})
+            return _response(200, {'message': '成绩录入成功', **result})
+
+        message = (f'成绩录入完成：新增{counts["inserted"]}条，更新{counts["updated"]}条，'
+                   f'未变化{counts["unchanged"]}条')
+        if counts['exists']:
+            message += f'，已存在未覆盖{counts["exists"]}条'
+        if counts['conflict'] or counts['failed']:
+            message += f'，冲突{counts["conflict"]}条，失败{counts["failed"]}条（可重新提交这些成绩）'
+        return _response(status_code, {'message': message, **counts, 'results': results})
 
     except Exception as e:
-        print(f"错误：{str(e)}")
-        # 异常响应（含CORS头）
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1ezlq7v3yy.cloudfront.net',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({'message': '服务器错误'})
-        }
\ No newline at end of file
+        logger.error(f"成绩录入失败：{str(e)}", exc_info=True)
+        return _response(500, {'message': '服务器错误'})
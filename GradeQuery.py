@@ -1,45 +1,72 @@
-import boto3
 import json
+import time
 
-dynamodb = boto3.resource('dynamodb')
-grades_table = dynamodb.Table('Grades')
+from AwsRuntime import get_table
+from ChangeLog import InvalidSyncTokenError, SyncExpiredError, decode_sync_token, encode_sync_token
+from GradeViews import VIEWS_TABLE_NAME, publish_student, select_document
+from JsonResponse import RawJson, cors_headers, dumps, json_response
+from Telemetry import instrumented
 
+views_table = get_table(VIEWS_TABLE_NAME)
+
+CORS_HEADERS = cors_headers(extra={'Content-Type': 'application/json'})
+
+def get_document(student_id):
+    """读取该学生预先发布的成绩文档（一次GetItem）；文档缺失或已过期时当场重建
+
+    返回(响应JSON文本, 内容摘要)。可见性由发布时按时段计算好，这里不再查询成绩和时段。
+    """
+    view = views_table.get_item(Key={'studentId': student_id}).get('Item')
+    document = select_document(view, time.time_ns() // 1_000_000)
+    if document is None:
+        document = select_document(publish_student(student_id), time.time_ns() // 1_000_000)
+    return document
+
+def sync_response(payload, text, digest):
+    """增量同步：令牌中记录上次下发的文档摘要，未变化时返回空的变化列表，否则整体下发（full为true）"""
+    token = encode_sync_token(d=digest)
+    if payload is not None and payload.get('d') == digest:
+        return {'items': [], 'deleted': [], 'full': False, 'syncToken': token}
+    return RawJson(f'{{"items":{text},"deleted":[],"full":true,"syncToken":{dumps(token)}}}')
+
+@instrumented
 def lambda_handler(event, context):
     try:
         # 从Cognito令牌中获取学生学号
         student_id = event['requestContext']['authorizer']['claims']['cognito:username']
-        
-        # 查询该学生的所有成绩
-        response = grades_table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('studentId').eq(student_id)
-        )
-        grades = response.get('Items', [])
-        
-        # 格式化返回数据
-        result = []
-        for grade in grades:
-            result.append({
-                'course': grade.get('course'),
-                'semester': grade.get('term'),
-                'score': float(grade.get('score'))  # 转换为float方便前端处理
+
+        query_params = event.get('queryStringParameters') or {}
+
+        # 带since参数时为增量同步（返回对象，含syncToken）；否则保持原来的全量数组响应
+        if 'since' in query_params:
+            since_token = (query_params.get('since') or '').strip()
+            try:
+                payload = decode_sync_token(since_token) if since_token not in ('', '0') else None
+                text, digest = get_document(student_id)
+                result = sync_response(payload, text, digest)
+            except InvalidSyncTokenError as e:
+                return {'statusCode': 400, 'headers': CORS_HEADERS, 'body': json.dumps({'message': str(e)})}
+            except SyncExpiredError as e:
+                return {'statusCode': 410, 'headers': CORS_HEADERS,
+                        'body': json.dumps({'message': str(e), 'resync': True})}
+            return json_response(event, result, headers={
+                'Access-Control-Allow-Origin': CORS_HEADERS['Access-Control-Allow-Origin'],
+                'Cache-Control': 'private, no-store'
             })
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',  # 与前端域名一致
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps(result)
-        }
-    
+
+        text, digest = get_document(student_id)
+
+        # 放榜前后学生频繁刷新：内容未变时只返回304（ETag由文档摘要生成，无需重新序列化）；
+        # 可见性随时段变化，因此每次都需重新验证
+        return json_response(event, RawJson(text), version=digest, headers={
+            'Access-Control-Allow-Origin': CORS_HEADERS['Access-Control-Allow-Origin'],
+            'Cache-Control': 'private, no-cache'
+        })
+
     except Exception as e:
         print(f"查询错误：{str(e)}")
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Content-Type': 'application/json'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'message': '查询成绩失败'})
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,205 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from urllib.parse import quote
+
+from GradeExport import DEFAULT_SEGMENTS, parallel_scan
+from ObjectStore import get_object_store
+from Telemetry import instrumented
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# 成绩分析快照：把Grades表整体转为按学期/课程分区的列式文件，跨学期分析在本地完成，不再读在线表。
+#
+# 目录结构（manifest.json最后写入，目录整体改名，读取方不会看到写了一半的快照）：
+#   manifest.json                           分区列表与每个分区的行数、分数最小/最大值/总和
+#   students.txt.gz                         学号字典（gzip压缩，每行一个，行号即编号）
+#   term=<学期>/course=<课程>/score.i16     分数（十分之一分为单位的int16，85.5分存为855）
+#   term=<学期>/course=<课程>/student.u32   学号字典编号（uint32），与score逐行对应，按编号排序
+# 列文件为定长小端数组、不做通用压缩，查询时可直接内存映射；体积靠编码压缩：
+# 每条成绩6字节（原始条目约100字节），学号只在字典中出现一次。
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLUMNS = {
+    # 列名 -> (array类型码, 文件后缀)
+    'score': ('h', 'i16'),
+    'student': ('I', 'u32'),
+}
+STUDENTS_FILE = 'students.txt.gz'
+MANIFEST_FILE = 'manifest.json'
+SCAN_PROJECTION = ['studentId', 'course', 'term', 'score']
+
+
+def score_to_tenths(score):
+    """分数转为十分之一分的整数（四舍五入到0.1分）；不是数字时返回None"""
+    try:
+        return int((Decimal(score) * 10).to_integral_value(rounding=ROUND_HALF_UP))
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+
+def partition_path(term, course):
+    # 学期/课程名可能含"/"等字符，目录名统一做百分号编码
+    return f"term={quote(term, safe='')}/course={quote(course, safe='')}"
+
+
+def column_file(partition, column):
+    return f"{partition}/{column}.{SNAPSHOT_COLUMNS[column][1]}"
+
+
+def collect_partitions(items):
+    """把成绩流按(学期, 课程)分组为列数组，返回(分区, 学号列表, 跳过的条数)"""
+    student_index = {}
+    students = []
+    partitions = {}
+    skipped = 0
+    for item in items:
+        tenths = score_to_tenths(item.get('score'))
+        student_id, course, term = item.get('studentId'), item.get('course'), item.get('term')
+        if tenths is None or not (0 <= tenths <= 1000) or not (student_id and course and term):
+            skipped += 1
+            continue
+        index = student_index.get(student_id)
+        if index is None:
+            index = student_index[student_id] = len(students)
+            students.append(student_id)
+        part = partitions.get((term, course))
+        if part is None:
+            part = partitions[(term, course)] = (array('I'), array('h'))
+        part[0].append(index)
+        part[1].append(tenths)
+    return partitions, students, skipped
+
+
+def write_snapshot(partitions, students, output_dir, source=None):
+    """写出快照目录（先写入临时目录再整体改名），返回manifest"""
+    parent = os.path.dirname(os.path.abspath(output_dir)) or '.'
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.snapshot-', dir=parent)
+    try:
+        with gzip.open(os.path.join(staging, STUDENTS_FILE), 'wt', encoding='utf-8', newline='\n') as f:
+            for student_id in students:
+                f.write(student_id)
+                f.write('\n')
+
+        entries = []
+        for (term, course) in sorted(partitions):
+            student_col, score_col = partitions[(term, course)]
+            # 按学号编号排序：同一学生的查询局部性更好，快照内容也与扫描顺序无关
+            order = sorted(range(len(student_col)), key=student_col.__getitem__)
+            columns = {
+                'student': array('I', (student_col[i] for i in order)),
+                'score': array('h', (score_col[i] for i in order)),
+            }
+            path = partition_path(term, course)
+            os.makedirs(os.path.join(staging, path), exist_ok=True)
+            for name, values in columns.items():
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                with open(os.path.join(staging, column_file(path, name)), 'wb') as f:
+                    values.tofile(f)
+            scores = columns['score']
+            entries.append({
+                'term': term,
+                'course': course,
+                'path': path,
+                'rows': len(scores),
+                'scoreMin': min(scores),
+                'scoreMax': max(scores),
+                'scoreSum': sum(scores)
+            })
+
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'createdAt': datetime.now(timezone.utc).isoformat(),
+            'source': source or {},
+            'scoreScale': 10,
+            'rows': sum(entry['rows'] for entry in entries),
+            'students': len(students),
+            'columns': {name: code for name, (code, _) in SNAPSHOT_COLUMNS.items()},
+            'partitions': entries
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(staging, output_dir)
+        return manifest
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def build_snapshot(output_dir, total_segments=DEFAULT_SEGMENTS, client=None):
+    """并行扫描Grades表（只读快照需要的4个属性），写出列式快照；返回摘要"""
+    started = time.monotonic()
+    partitions, students, skipped = collect_partitions(
+        parallel_scan(total_segments=total_segments, client=client, projection=SCAN_PROJECTION))
+    manifest = write_snapshot(partitions, students, output_dir,
+                              source={'table': 'Grades', 'segments': total_segments, 'skipped': skipped})
+    elapsed = time.monotonic() - started
+    if skipped:
+        logger.warning(f"快照跳过{skipped}条缺少字段或分数无效的成绩")
+    logger.info(f"快照生成完成：{manifest['rows']}行，{len(manifest['partitions'])}个分区，耗时{elapsed:.2f}秒")
+    return {
+        'path': output_dir,
+        'rows': manifest['rows'],
+        'students': manifest['students'],
+        'partitions': len(manifest['partitions']),
+        'skipped': skipped,
+        'bytes': sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(output_dir) for name in names),
+        'seconds': round(elapsed, 3)
+    }
+
+
+def publish_snapshot(snapshot_dir, location=None):
+    """把快照目录逐个文件上传到对象存储（snapshots/<时间>/...，manifest最后上传），返回前缀"""
+    store = get_object_store(location)
+    prefix = f"snapshots/grades-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+    files = sorted(os.path.relpath(os.path.join(root, name), snapshot_dir)
+                   for root, _, names in os.walk(snapshot_dir) for name in names)
+    files.sort(key=lambda name: name == MANIFEST_FILE)
+    uri = None
+    for name in files:
+        with open(os.path.join(snapshot_dir, name), 'rb') as f:
+            uri = store.put_file(f"{prefix}/{name.replace(os.sep, '/')}", f)
+    return uri.rsplit('/', 1)[0] if uri else None
+
+
+@instrumented
+def lambda_handler(event, context):
+    """定时任务（如每晚一次）：生成快照并上传对象存储，分析时下载到本地用GradeAnalytics查询"""
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = build_snapshot(os.path.join(tmp, 'snapshot'),
+                                     total_segments=int((event or {}).get('segments') or DEFAULT_SEGMENTS))
+            summary['location'] = publish_snapshot(summary.pop('path'))
+        return {
+            'statusCode': 200,
+            'body': json.dumps(summary, ensure_ascii=False)
+        }
+    except Exception as e:
+        logger.error(f"快照生成失败：{str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'message': str(e)})
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成成绩列式快照（读取AWS上的Grades表）')
+    parser.add_argument('output', help='快照输出目录（已存在时整体替换）')
+    parser.add_argument('--segments', type=int, default=DEFAULT_SEGMENTS, help='并行扫描的分段数')
+    args = parser.parse_args()
+    print(json.dumps(build_snapshot(args.output, args.segments), ensure_ascii=False, indent=1))
@@ -0,0 +1,348 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from AwsRuntime import Key, get_table
+from JsonResponse import cors_headers, json_response
+from Telemetry import instrumented
+
+# 按课程+学期维护的成绩统计（人数、总分、平方和、最高/最低分、分段直方图）。
+# 各写入路径把变化量累加到统计表（ADD是原子操作，并发写入互不覆盖），
+# 看板读取统计只需一次GetItem，不再把整门课的成绩拉到浏览器里计算。
+# 统计是派生数据：更新失败只记日志，可随时用rebuild从成绩表重算。
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+STATS_TABLE_NAME = 'GradeStats'
+stats_table = get_table(STATS_TABLE_NAME)  # 统计表（分区键course，排序键term）
+grades_table = get_table('Grades')
+COURSE_TERM_INDEX = 'course-term-index'
+
+# 直方图：0-10、10-20 ... 90-100共10段（100分计入最后一段）
+BUCKET_WIDTH = 10
+BUCKET_COUNT = 10
+BUCKET_NAMES = [f'b{i}' for i in range(BUCKET_COUNT)]
+PERCENTILES = (25, 50, 75, 90)
+
+CORS_HEADERS = cors_headers()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def bucket_for(score):
+    return min(int(score // BUCKET_WIDTH), BUCKET_COUNT - 1) if score > 0 else 0
+
+
+class StatsDelta:
+    """一批写入对统计的变化量，按(课程, 学期)汇总后一次性提交"""
+
+    def __init__(self):
+        self.deltas = {}
+
+    def _entry(self, course, term):
+        entry = self.deltas.get((course, term))
+        if entry is None:
+            entry = self.deltas[(course, term)] = {
+                'count': 0, 'total': Decimal(0), 'sumSq': Decimal(0),
+                'buckets': [0] * BUCKET_COUNT,
+                'low': None, 'high': None,            # 新增分数的最小/最大值
+                'removedLow': None, 'removedHigh': None  # 移除分数的最小/最大值
+            }
+        return entry
+
+    def add(self, course, term, score):
+        if not course or not term or score is None:
+            return
+        score = Decimal(score)
+        entry = self._entry(course, term)
+        entry['count'] += 1
+        entry['total'] += score
+        entry['sumSq'] += score * score
+        entry['buckets'][bucket_for(score)] += 1
+        entry['low'] = score if entry['low'] is None else min(entry['low'], score)
+        entry['high'] = score if entry['high'] is None else max(entry['high'], score)
+
+    def remove(self, course, term, score):
+        if not course or not term or score is None:
+            return
+        score = Decimal(score)
+        entry = self._entry(course, term)
+        entry['count'] -= 1
+        entry['total'] -= score
+        entry['sumSq'] -= score * score
+        entry['buckets'][bucket_for(score)] -= 1
+        entry['removedLow'] = score if entry['removedLow'] is None else min(entry['removedLow'], score)
+        entry['removedHigh'] = score if entry['removedHigh'] is None else max(entry['removedHigh'], score)
+
+    def change(self, course, term, old_score, new_score):
+        if old_score == new_score:
+            return
+        self.remove(course, term, old_score)
+        self.add(course, term, new_score)
+
+    def record_item_change(self, old_item, new_item):
+        """单条成绩由old_item变为new_item（任一方可为None，表示新增或删除）"""
+        if old_item and new_item and (old_item.get('course'), old_item.get('term')) == \
+                (new_item.get('course'), new_item.get('term')):
+            self.change(new_item.get('course'), new_item.get('term'), old_item.get('score'), new_item.get('score'))
+            return
+        if old_item:
+            self.remove(old_item.get('course'), old_item.get('term'), old_item.get('score'))
+        if new_item:
+            self.add(new_item.get('course'), new_item.get('term'), new_item.get('score'))
+
+    def record_conditional_puts(self, requests, status):
+        """conditional_put的结果：带:old的请求为更新，否则为新增；只统计写入成功的行"""
+        for ref, item, _, values in requests:
+            if status.get(ref) not in ('written', 'retried'):
+                continue
+            if values and ':old' in values:
+                self.change(item['course'], item['term'], values[':old'], item['score'])
+            else:
+                self.add(item['course'], item['term'], item['score'])
+
+    def record_overwrites(self, rows, previous, status):
+        """覆盖写入（replace模式）的结果：previous为写入前强一致读取的旧成绩{(studentId, gradeId): 成绩}，
+        只统计写入成功的行"""
+        for ref, item in rows:
+            if status.get(ref) in ('written', 'retried'):
+                self.record_item_change(previous.get((item['studentId'], item['gradeId'])), item)
+
+    def __bool__(self):
+        return bool(self.deltas)
+
+
+def apply_delta(delta):
+    """把变化量提交到统计表（每个课程+学期一次UpdateItem，必要时再更新最高/最低分）"""
+    for (course, term), entry in delta.deltas.items():
+        names = {'#count': 'count', '#total': 'total', '#sumSq': 'sumSq', '#updatedAt': 'updatedAt'}
+        values = {':count': entry['count'], ':total': entry['total'], ':sumSq': entry['sumSq'], ':now': _now()}
+        adds = ['#count :count', '#total :total', '#sumSq :sumSq']
+        for name, count in zip(BUCKET_NAMES, entry['buckets']):
+            if count:
+                names[f'#{name}'] = name
+                values[f':{name}'] = count
+                adds.append(f'#{name} :{name}')
+        response = stats_table.update_item(
+            Key={'course': course, 'term': term},
+            UpdateExpression=f'ADD {", ".join(adds)} SET #updatedAt = :now',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        )
+        current = response.get('Attributes', {})
+        _update_bounds(course, term, entry, current)
+
+
+def _update_bounds(course, term, entry, current):
+    key = {'course': course, 'term': term}
+    # 新分数超出当前范围：条件更新，并发写入时只保留更极端的值
+    for name, value, op in (('min', entry['low'], '>'), ('max', entry['high'], '<')):
+        if value is None or (name in current and not _beyond(value, current[name], op)):
+            continue
+        try:
+            stats_table.update_item(
+                Key=key,
+                UpdateExpression='SET #b = :v',
+                ConditionExpression=f'attribute_not_exists(#b) OR #b {op} :v',
+                ExpressionAttributeNames={'#b': name},
+                ExpressionAttributeValues={':v': value}
+            )
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+    # 移除的分数恰好是最高/最低分时无法增量得到新的边界，标记为不精确，rebuild后恢复
+    removed_low, removed_high = entry['removedLow'], entry['removedHigh']
+    if (removed_low is not None and 'min' in current and removed_low <= current['min']) or \
+            (removed_high is not None and 'max' in current and removed_high >= current['max']):
+        stats_table.update_item(Key=key, UpdateExpression='SET boundsStale = :t',
+                                ExpressionAttributeValues={':t': True})
+
+
+def _beyond(value, bound, op):
+    return bound > value if op == '>' else bound < value
+
+
+def update_stats(delta):
+    """提交变化量；失败只记录日志（统计可通过rebuild重算），不影响成绩写入结果"""
+    if not delta:
+        return
+    try:
+        apply_delta(delta)
+    except Exception as e:
+        logger.warning(f"成绩统计更新失败（可执行rebuild重算）：{str(e)}")
+
+
+def compute_stats(scores):
+    """由分数序列计算完整的统计记录（不含主键）"""
+    delta = StatsDelta()
+    for score in scores:
+        delta.add('_', '_', score)
+    entry = delta.deltas.get(('_', '_'))
+    item = {'count': 0, 'total': Decimal(0), 'sumSq': Decimal(0), 'boundsStale': False}
+    item.update({name: 0 for name in BUCKET_NAMES})
+    if entry:
+        item.update(count=entry['count'], total=entry['total'], sumSq=entry['sumSq'],
+                    min=entry['low'], max=entry['high'])
+        item.update(zip(BUCKET_NAMES, entry['buckets']))
+    return item
+
+
+def query_scores(course, term):
+    """从course-term-index读取某课程某学期的全部分数"""
+    kwargs = {
+        'IndexName': COURSE_TERM_INDEX,
+        'KeyConditionExpression': Key('course').eq(course) & Key('term').eq(term),
+        'ProjectionExpression': 'score'
+    }
+    while True:
+        response = grades_table.query(**kwargs)
+        for item in response.get('Items', []):
+            if item.get('score') is not None:
+                yield item['score']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rebuild_stats(course_terms=None):
+    """从成绩表重算统计并覆盖写入：指定课程+学期时按索引查询，否则并行扫描全表
+
+    重算期间并发写入的变化可能被覆盖，应在无导入任务时执行（或事后再执行一次）。
+    """
+    now = _now()
+    if course_terms:
+        results = {(course, term): compute_stats(query_scores(course, term)) for course, term in course_terms}
+    else:
+        import GradeExport  # 全表重算才需要并行扫描
+        scores = {}
+        for row in GradeExport.parallel_scan(projection=['course', 'term', 'score']):
+            if row.get('course') and row.get('term') and row.get('score') is not None:
+                scores.setdefault((row['course'], row['term']), []).append(row['score'])
+        # 成绩已全部删除的课程+学期也要清零
+        for key in _existing_stats_keys():
+            scores.setdefault(key, [])
+        results = {key: compute_stats(values) for key, values in scores.items()}
+
+    with stats_table.batch_writer() as batch:
+        for (course, term), item in results.items():
+            batch.put_item(Item=dict(item, course=course, term=term, updatedAt=now, rebuiltAt=now))
+    logger.info(f"成绩统计重算完成：{len(results)}个课程+学期")
+    return len(results)
+
+
+def _existing_stats_keys():
+    kwargs = {'ProjectionExpression': 'course, term'}
+    while True:
+        response = stats_table.scan(**kwargs)
+        for item in response.get('Items', []):
+            yield item['course'], item['term']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def summarize(item):
+    """把统计记录转换为响应：平均分、标准差、直方图及由直方图插值得到的近似百分位数"""
+    count = int(item.get('count', 0))
+    buckets = [int(item.get(name, 0)) for name in BUCKET_NAMES]
+    low = item.get('min')
+    high = item.get('max')
+    exact = not item.get('boundsStale', False)
+    result = {
+        'course': item['course'],
+        'term': item['term'],
+        'count': count,
+        'average': None,
+        'stddev': None,
+        'min': float(low) if low is not None and count else None,
+        'max': float(high) if high is not None and count else None,
+        'boundsExact': exact,
+        'histogram': [{'from': i * BUCKET_WIDTH, 'to': (i + 1) * BUCKET_WIDTH, 'count': n}
+                      for i, n in enumerate(buckets)],
+        'percentiles': {},
+        'updatedAt': item.get('updatedAt')
+    }
+    if count <= 0:
+        return result
+    total = float(item.get('total', 0))
+    mean = total / count
+    variance = max(float(item.get('sumSq', 0)) / count - mean * mean, 0.0)
+    result['average'] = round(mean, 2)
+    result['stddev'] = round(variance ** 0.5, 2)
+
+    # 近似百分位数：在所在分段内线性插值；边界精确时用最高/最低分收紧首尾分段
+    floor = float(low) if exact and low is not None else 0.0
+    ceiling = float(high) if exact and high is not None else float(BUCKET_WIDTH * BUCKET_COUNT)
+    for p in PERCENTILES:
+        rank = p / 100 * count
+        seen = 0
+        for i, n in enumerate(buckets):
+            if n > 0 and seen + n >= rank:
+                start = max(i * BUCKET_WIDTH, floor)
+                end = min((i + 1) * BUCKET_WIDTH, ceiling)
+                result['percentiles'][f'p{p}'] = round(start + (end - start) * (rank - seen) / n, 1)
+                break
+            seen += n
+    return result
+
+
+@instrumented
+def lambda_handler(event, context):
+    """GET ?course=&term= 返回单个课程学期的统计（一次GetItem）；只传course时返回该课程各学期
+
+    {"action": "rebuild", "course": ..., "term": ...} 重算统计（定时任务或手动调用）。
+    """
+    try:
+        if event.get('action') == 'rebuild':
+            pairs = [(event['course'], event['term'])] if event.get('course') and event.get('term') else None
+            return {'rebuilt': rebuild_stats(pairs)}
+
+        if event.get('httpMethod', '').upper() == 'OPTIONS':
+            return {'statusCode': 200, 'headers': CORS_HEADERS, 'body': ''}
+
+        query_params = event.get('queryStringParameters') or {}
+        course = (query_params.get('course') or '').strip()
+        term = (query_params.get('term') or '').strip()
+        if not course:
+            return {
+                'statusCode': 400,
+                'headers': CORS_HEADERS,
+                'body': json.dumps({'message': '缺少参数：course'})
+            }
+
+        if term:
+            item = stats_table.get_item(Key={'course': course, 'term': term}).get('Item')
+            if not item:
+                return {
+                    'statusCode': 404,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({'message': '暂无该课程该学期的成绩统计'})
+                }
+            return json_response(event, summarize(item), headers=CORS_HEADERS)
+
+        response = stats_table.query(KeyConditionExpression=Key('course').eq(course))
+        return json_response(event, [summarize(item) for item in response.get('Items', [])],
+                             headers=CORS_HEADERS)
+    except Exception as e:
+        logger.error(f"查询成绩统计失败：{str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'message': '查询成绩统计失败'})
+        }
+
+
+if __name__ == '__main__':
+    # 重算命令：python GradeStats.py rebuild [课程 学期]
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild' or len(sys.argv) not in (2, 4):
+        print('用法：python GradeStats.py rebuild [课程 学期]')
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    rebuilt = rebuild_stats([tuple(sys.argv[2:4])] if len(sys.argv) == 4 else None)
+    print(f'已重算{rebuilt}个课程+学期的统计')
@@ -0,0 +1,165 @@
+import csv
+from collections import defaultdict
+from decimal import Decimal
+from itertools import zip_longest
+
+# 成绩CSV的批量校验：先把各列读入数组，再按列整体做必填、分数范围和文件内重复主键检查，
+# 一次返回全部错误（而不是逐行构造Decimal、遇到第一处错误就中止）
+
+REQUIRED_COLUMNS = ['studentId', 'course', 'term', 'score']
+# load_columns额外返回的列：每条记录在源文件中的起始行号（空行、引号内换行的字段会使其与序号不一致）
+LINE_COLUMN = '_line'
+SCORE_MIN = 0.0
+SCORE_MAX = 100.0
+# 入库的分数是原始文本的Decimal，边界按Decimal精确判断
+SCORE_BOUNDS = (Decimal(SCORE_MIN), Decimal(SCORE_MAX))
+
+
+def load_columns(csv_reader, columns=REQUIRED_COLUMNS):
+    """把CSV记录按列读入列表（已去除首尾空白，缺失值为空字符串）
+
+    csv_reader为DictReader时直接转置其底层reader的原始行（zip_longest在C层完成），
+    避免为每行构造dict；同时按reader.line_num记录每条记录的起始行号（LINE_COLUMN列）。
+    """
+    if isinstance(csv_reader, csv.DictReader):
+        header = csv_reader.fieldnames or []
+        reader = csv_reader.reader
+        # 与DictReader一致，跳过空行；上一条记录结束处的line_num + 1即本条记录的起始行
+        records = []
+        lines = []
+        previous = reader.line_num
+        for record in reader:
+            if record:
+                records.append(record)
+                lines.append(previous + 1)
+            previous = reader.line_num
+        transposed = list(zip_longest(*records, fillvalue=''))
+        empty = ('',) * (len(transposed[0]) if transposed else 0)
+        data = {}
+        for name in columns:
+            index = header.index(name) if name in header else None
+            column = transposed[index] if index is not None and index < len(transposed) else empty
+            data[name] = list(map(str.strip, column))
+        data[LINE_COLUMN] = lines
+        return data
+
+    data = {name: [] for name in columns}
+    for row in csv_reader:
+        for name in columns:
+            value = row.get(name)
+            data[name].append(value.strip() if value else '')
+    return data
+
+
+def parse_scores(texts):
+    """整列转换为float；全部合法时走map快速路径，否则逐个转换（非法值为None）"""
+    try:
+        return list(map(float, texts))
+    except ValueError:
+        return list(map(_parse_score, texts))
+
+
+def _parse_score(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _decimal_in_range(text):
+    return SCORE_BOUNDS[0] <= Decimal(text) <= SCORE_BOUNDS[1]
+
+
+def grade_id_for(course, term, student_id):
+    """成绩主键gradeId（与批量导入一致：课程+学期+学号）"""
+    return f'{course}+{term}+{student_id}'
+
+
+def validate_columns(columns, first_row=2):
+    """按列校验，返回(GradeRows, [{'row': 行号, 'message': 错误}])；有错误时GradeRows为空
+
+    行号取LINE_COLUMN列（源文件行号）；没有该列时从first_row开始按序号计（CSV第1行为表头）。
+    同一gradeId在文件中出现多次时，所有重复行都报错。
+    """
+    student_ids = columns['studentId']
+    courses = columns['course']
+    terms = columns['term']
+    score_texts = columns['score']
+    total = len(student_ids)
+    row_numbers = columns.get(LINE_COLUMN) or list(range(first_row, first_row + total))
+
+    # 必填检查：学号/课程/学期
+    complete = list(map(all, zip(student_ids, courses, terms)))
+
+    # 分数范围检查：先整体转换为float，再整体比较（NaN比较结果为False，自然被判为越界）。
+    # float舍入可能把略超出边界的文本（如'100.00000000000000001'）转换为边界值本身，
+    # 因此等于边界的少数值再用入库时的Decimal精确判断一次
+    scores = parse_scores(score_texts)
+    in_range = [x is not None and SCORE_MIN <= x <= SCORE_MAX
+                and (SCORE_MIN < x < SCORE_MAX or _decimal_in_range(text))
+                for x, text in zip(scores, score_texts)]
+
+    # 文件内重复主键检查（只对信息完整的行生成gradeId）；无重复时集合大小等于行数，跳过定位
+    grade_ids = [grade_id_for(c, t, s) if ok else None
+                 for s, c, t, ok in zip(student_ids, courses, terms, complete)]
+    duplicate_of = {}
+    present = [gid for gid in grade_ids if gid is not None]
+    if len(set(present)) != len(present):
+        positions = defaultdict(list)
+        for i, gid in enumerate(grade_ids):
+            if gid is not None:
+                positions[gid].append(i)
+        for indexes in positions.values():
+            if len(indexes) > 1:
+                for i in indexes:
+                    duplicate_of[i] = indexes
+
+    errors = []
+    if duplicate_of or not all(complete) or not all(in_range):
+        for i in range(total):
+            if complete[i] and in_range[i] and i not in duplicate_of:
+                continue
+            row_num = row_numbers[i]
+            if not complete[i]:
+                errors.append({'row': row_num, 'message': f'第{row_num}行数据不完整（学号/课程/学期不能为空）'})
+            if not in_range[i]:
+                errors.append({'row': row_num, 'message': f'第{row_num}行分数错误（必须是0-100之间的数字）'})
+            if i in duplicate_of:
+                others = '、'.join(str(row_numbers[j]) for j in duplicate_of[i] if j != i)
+                errors.append({'row': row_num, 'message': f'第{row_num}行与第{others}行重复（同一学生同一课程同一学期）'})
+    if errors:
+        return GradeRows([], [], [], [], [], []), errors
+
+    return GradeRows(student_ids, courses, terms, grade_ids, score_texts, row_numbers), errors
+
+
+class GradeRows:
+    """校验通过的成绩（按列存储）；迭代时才逐行生成(行号, 成绩记录)，不预先构造整表的dict"""
+
+    def __init__(self, student_ids, courses, terms, grade_ids, score_texts, row_numbers):
+        self.student_ids = student_ids
+        self.courses = courses
+        self.terms = terms
+        self.grade_ids = grade_ids
+        self.score_texts = score_texts
+        self.row_numbers = row_numbers
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def __iter__(self):
+        # score用Decimal（DynamoDB数值类型），保持原始文本精度
+        for i, student_id, grade_id, course, term, score in zip(
+                self.row_numbers, self.student_ids, self.grade_ids, self.courses, self.terms,
+                map(Decimal, self.score_texts)):
+            yield i, {
+                'studentId': student_id,
+                'gradeId': grade_id,
+                'course': course,
+                'term': term,
+                'score': score
+            }
+
+
+def validate(csv_reader, first_row=2):
+    return validate_columns(load_columns(csv_reader), first_row)
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from AwsRuntime import get_client, lazy, type_deserializer, type_serializer
+from ChangeLog import next_version
+from DynamoBatch import chunked, parallel_batch_get
+from GradeExport import parallel_scan
+from JsonResponse import dumps
+from PeriodWindow import COURSE_ID_MAP, PERIOD_TABLE_NAME, is_within_period, parse_period_time, period_id_for
+from TaskQueue import DEFAULT_QUEUE_URL, get_task_queue
+from Telemetry import instrumented
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# 学生成绩视图：每位学生一条预先生成的文档（StudentGradeViews表，主键studentId），
+# grades为学生端响应体（已序列化的JSON文本，只含当前可见的分数），GradeQuery只需一次GetItem。
+# - 发布：成绩写入/删除、时段设置后经队列按学生重建（PUBLISH_BATCH个学生一批，多批并行）；
+#   每次重建都重新读取该学生的全部成绩和最新时段（不读缓存），version保证旧的重建结果不会覆盖新的。
+# - 可见性翻转：文档记录下一次开放/结束的时刻validUntil；该时刻在PUBLISH_LEAD_SECONDS内时，
+#   同时预先生成翻转后的文档next（validUntil起生效），放榜时刻到来时无需任何写入即可切换。
+#   定时任务（publish_due）每SCHEDULE_INTERVAL_SECONDS秒运行一次，提前重建即将翻转的时段涉及的学生。
+# - 文档缺失或已过期（定时任务未按时运行）时，GradeQuery当场重建该学生的文档后返回。
+VIEWS_TABLE_NAME = 'StudentGradeViews'
+GRADES_TABLE_NAME = 'Grades'
+COURSE_TERM_INDEX = 'course-term-index'
+
+PUBLISH_BATCH = 25
+PUBLISH_WORKERS = int(os.environ.get('PUBLISH_WORKERS', '8'))
+PUBLISH_LEAD_SECONDS = int(os.environ.get('PUBLISH_LEAD_SECONDS', '300'))
+SCHEDULE_INTERVAL_SECONDS = int(os.environ.get('PUBLISH_SCHEDULE_SECONDS', '60'))
+# 发布消息的队列：默认与导入任务共用（消息带step，由Router分发；ImportJobs单独部署时由其worker转交）；
+# 本地替身时使用单独的进程内队列
+PUBLISH_QUEUE_URL = os.environ.get('PUBLISH_QUEUE_URL') or (
+    'local://publish' if DEFAULT_QUEUE_URL.startswith('local:') else DEFAULT_QUEUE_URL)
+
+_serializer = lazy(type_serializer)
+_deserializer = lazy(type_deserializer)
+
+
+def format_grades(grades, periods, now):
+    """格式化返回数据：不在查询时段内的分数不下发给前端"""
+    result = []
+    for grade in grades:
+        period_id = period_id_for(grade.get('course'), grade.get('term'))
+        period = periods.get(period_id) if period_id else None
+        visible = is_within_period(period, now)
+        result.append({
+            'gradeId': grade.get('gradeId'),
+            'course': grade.get('course'),
+            'semester': grade.get('term'),
+            'score': grade.get('score') if visible else None,  # Decimal由响应层编码为数字
+            'visible': visible,
+            'startTime': period.get('startTime') if period else None,
+            'endTime': period.get('endTime') if period else None
+        })
+    return result
+
+
+def _epoch_ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def flip_times(period):
+    """时段使成绩可见性翻转的时刻（毫秒）：startTime起可见，endTime之后（+1ms）不可见"""
+    try:
+        return [_epoch_ms(parse_period_time(period['startTime'])),
+                _epoch_ms(parse_period_time(period['endTime'])) + 1]
+    except (KeyError, TypeError, ValueError):
+        return []
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def build_view(student_id, grades, periods, now, version):
+    """生成一位学生的视图文档（当前文档 + 即将翻转时预先生成的下一份文档）"""
+    now_ms = _epoch_ms(now)
+    flips = set()
+    for grade in grades:
+        period = periods.get(period_id_for(grade.get('course'), grade.get('term')))
+        if period:
+            flips.update(moment for moment in flip_times(period) if moment > now_ms)
+    flips = sorted(flips)
+
+    text = dumps(format_grades(grades, periods, now))
+    view = {
+        'studentId': student_id,
+        'version': version,
+        'publishedAt': now.isoformat(),
+        'count': len(grades),
+        'grades': text,
+        'digest': _digest(text)
+    }
+    if flips:
+        view['validUntil'] = flips[0]
+        if flips[0] - now_ms <= PUBLISH_LEAD_SECONDS * 1000:
+            at = datetime.fromtimestamp(flips[0] / 1000, timezone.utc)
+            staged = dumps(format_grades(grades, periods, at))
+            view['next'] = staged
+            view['nextDigest'] = _digest(staged)
+            if len(flips) > 1:
+                view['nextValidUntil'] = flips[1]
+    return view
+
+
+def select_document(view, now_ms):
+    """按当前时刻选出视图中有效的文档，返回(响应JSON文本, 内容摘要)；文档已过期时返回None"""
+    if not view:
+        return None
+    valid_until = view.get('validUntil')
+    if valid_until is None or now_ms < valid_until:
+        return view['grades'], view['digest']
+    next_valid_until = view.get('nextValidUntil')
+    if 'next' in view and (next_valid_until is None or now_ms < next_valid_until):
+        return view['next'], view['nextDigest']
+    return None
+
+
+def _query_grades(client, student_id):
+    kwargs = {
+        'TableName': GRADES_TABLE_NAME,
+        'KeyConditionExpression': '#s = :s',
+        'ExpressionAttributeNames': {'#s': 'studentId'},
+        'ExpressionAttributeValues': {':s': {'S': student_id}}
+    }
+    grades = []
+    while True:
+        response = client.query(**kwargs)
+        grades.extend({k: _deserializer.deserialize(v) for k, v in item.items()} for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return grades
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def fetch_periods(client, period_ids):
+    """读取最新的时段（不经过热容器缓存：刚设置的时段必须立即反映到发布结果中）"""
+    if not period_ids:
+        return {}
+    items, unprocessed = parallel_batch_get(client, PERIOD_TABLE_NAME, [{'gradeId': pid} for pid in period_ids],
+                                            workers=1)
+    if unprocessed:
+        raise RuntimeError(f'{len(unprocessed)}个时段因限流未能读取，稍后重试发布')
+    return {item['gradeId']: item for item in items}
+
+
+def _grade_period_ids(grades):
+    period_ids = {period_id_for(grade.get('course'), grade.get('term')) for grade in grades}
+    period_ids.discard(None)
+    return period_ids
+
+
+def put_view(client, view):
+    """写入视图；已有更新版本（并发的另一次发布更晚开始）时放弃，返回是否写入"""
+    try:
+        client.put_item(
+            TableName=VIEWS_TABLE_NAME,
+            Item={k: _serializer.serialize(v) for k, v in view.items()},
+            ConditionExpression='attribute_not_exists(#s) OR #v < :v',
+            ExpressionAttributeNames={'#s': 'studentId', '#v': 'version'},
+            ExpressionAttributeValues={':v': {'N': str(view['version'])}}
+        )
+        return True
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def _publish_views(client, grades_by_student, versions, now):
+    periods = fetch_periods(client, set().union(*map(_grade_period_ids, grades_by_student.values())))
+    views = [build_view(student_id, grades, periods, now, versions[student_id])
+             for student_id, grades in grades_by_student.items()]
+    written = sum(put_view(client, view) for view in views)
+    return views, written
+
+
+def _publish_chunk(client, student_ids, now):
+    # 先取版本号再读数据：晚开始的发布读到的数据不会更旧，版本号也更大
+    versions = {student_id: next_version() for student_id in student_ids}
+    grades_by_student = {student_id: _query_grades(client, student_id) for student_id in student_ids}
+    return _publish_views(client, grades_by_student, versions, now)
+
+
+def _run_chunks(publish_chunk, chunks, workers):
+    started = time.monotonic()
+    if len(chunks) <= 1:
+        results = [publish_chunk(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+            results = list(executor.map(publish_chunk, chunks))
+    students = sum(len(views) for views, _ in results)
+    written = sum(written for _, written in results)
+    return {
+        'students': students,
+        'written': written,
+        'superseded': students - written,
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def publish_student(student_id, now=None, client=None):
+    """立即重建一位学生的视图并返回（GradeQuery在文档缺失或过期时使用）"""
+    views, _ = _publish_chunk(client or get_client('dynamodb'), [student_id], now or datetime.now(timezone.utc))
+    return views[0]
+
+
+def publish_students(student_ids, now=None, workers=PUBLISH_WORKERS, client=None):
+    """按学生重建视图：PUBLISH_BATCH个学生一批，多批并行"""
+    client = client or get_client('dynamodb')
+    now = now or datetime.now(timezone.utc)
+    chunks = list(chunked(list(dict.fromkeys(student_ids)), PUBLISH_BATCH))
+    return _run_chunks(lambda chunk: _publish_chunk(client, chunk, now), chunks, workers)
+
+
+def students_for_periods(period_ids, client=None):
+    """时段涉及的学生（按course-term-index查询；成绩的学期可能写作2023秋或2023年秋）"""
+    client = client or get_client('dynamodb')
+    course_names = {course_id: name for name, course_id in COURSE_ID_MAP.items()}
+    students = set()
+    for period_id in set(period_ids):
+        course_id, _, term = period_id.partition('_')
+        course = course_names.get(course_id)
+        if not course or not term:
+            continue
+        for term_value in {term, term.replace('年', '')}:
+            kwargs = {
+                'TableName': GRADES_TABLE_NAME,
+                'IndexName': COURSE_TERM_INDEX,
+                'KeyConditionExpression': '#c = :c AND #t = :t',
+                'ProjectionExpression': '#s',
+                'ExpressionAttributeNames': {'#c': 'course', '#t': 'term', '#s': 'studentId'},
+                'ExpressionAttributeValues': {':c': {'S': course}, ':t': {'S': term_value}}
+            }
+            while True:
+                response = client.query(**kwargs)
+                students.update(item['studentId']['S'] for item in response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return sorted(students)
+
+
+def publish_for_periods(period_ids, now=None, workers=PUBLISH_WORKERS, client=None):
+    """重建这些时段涉及的全部学生的视图"""
+    client = client or get_client('dynamodb')
+    summary = publish_students(students_for_periods(period_ids, client), now, workers, client)
+    summary['periods'] = sorted(set(period_ids))
+    return summary
+
+
+def publish_all(now=None, workers=PUBLISH_WORKERS, client=None):
+    """全量重建（首次上线或数据修复）：扫描一遍成绩表按学生分组，不再逐个学生查询"""
+    client = client or get_client('dynamodb')
+    now = now or datetime.now(timezone.utc)
+    version = next_version()
+    grades_by_student = {}
+    for grade in parallel_scan(client=client, projection=['studentId', 'gradeId', 'course', 'term', 'score']):
+        grades_by_student.setdefault(grade['studentId'], []).append(grade)
+    for grades in grades_by_student.values():
+        grades.sort(key=lambda grade: grade['gradeId'])  # 与按学生Query的返回顺序（排序键顺序）一致
+    chunks = list(chunked(list(grades_by_student), PUBLISH_BATCH))
+
+    def publish_chunk(chunk):
+        return _publish_views(client, {student_id: grades_by_student[student_id] for student_id in chunk},
+                              dict.fromkeys(chunk, version), now)
+
+    return _run_chunks(publish_chunk, chunks, workers)
+
+
+def due_periods(now=None, client=None):
+    """即将翻转（PUBLISH_LEAD_SECONDS后）或刚刚翻转的时段；窗口为两个调度周期，漏跑一次也能覆盖"""
+    client = client or get_client('dynamodb')
+    now_ms = _epoch_ms(now or datetime.now(timezone.utc))
+    span = 2 * SCHEDULE_INTERVAL_SECONDS * 1000
+    lead = PUBLISH_LEAD_SECONDS * 1000
+    windows = [(now_ms - span, now_ms), (now_ms + lead - span, now_ms + lead)]
+    kwargs = {
+        'TableName': PERIOD_TABLE_NAME,
+        'ProjectionExpression': '#g, #s, #e',
+        'ExpressionAttributeNames': {'#g': 'gradeId', '#s': 'startTime', '#e': 'endTime'}
+    }
+    due = []
+    while True:
+        response = client.scan(**kwargs)
+        for item in response.get('Items', []):
+            period = {k: _deserializer.deserialize(v) for k, v in item.items()}
+            if any(low < moment <= high for moment in flip_times(period) for low, high in windows):
+                due.append(period['gradeId'])
+        if 'LastEvaluatedKey' not in response:
+            return due
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def publish_due(now=None, workers=PUBLISH_WORKERS, client=None):
+    """定时任务：重建即将翻转的时段涉及的学生（预先生成翻转后的文档）"""
+    client = client or get_client('dynamodb')
+    now = now or datetime.now(timezone.utc)
+    period_ids = due_periods(now, client)
+    if not period_ids:
+        return {'periods': [], 'students': 0, 'written': 0, 'superseded': 0, 'seconds': 0.0}
+    return publish_for_periods(period_ids, now, workers, client)
+
+
+def request_publish(students=None, periods=None):
+    """成绩或时段写入后请求重建视图（经队列异步执行）；发送失败时在当前请求中直接重建"""
+    messages = [{'step': 'publish', 'students': chunk}
+                for chunk in chunked(sorted(set(students or ())), PUBLISH_BATCH)]
+    if periods:
+        messages.append({'step': 'publish', 'periods': sorted(set(periods))})
+    if not messages:
+        return
+    try:
+        get_task_queue(PUBLISH_QUEUE_URL).send_batch(messages)
+    except Exception as e:
+        logger.error(f"发布消息发送失败，改为立即重建：{str(e)}", exc_info=True)
+        if students:
+            publish_students(students)
+        if periods:
+            publish_for_periods(periods)
+
+
+@instrumented
+def worker_handler(event, context):
+    """队列消费者：按消息中的学生或时段重建视图；失败时抛出异常交给队列重试（重建是幂等的）"""
+    for record in event.get('Records', []):
+        message = json.loads(record['body'])
+        try:
+            if message.get('students'):
+                publish_students(message['students'])
+            if message.get('periods'):
+                publish_for_periods(message['periods'])
+        except Exception as e:
+            logger.error(f"视图发布失败（将由队列重试）：{str(e)}", exc_info=True)
+            raise
+
+
+def lambda_handler(event, context):
+    """定时任务（如每分钟一次）：{'action': 'publish'}重建即将翻转的时段；
+    也可指定students/periods，或all为true时全量重建"""
+    event = event or {}
+    try:
+        if event.get('all'):
+            summary = publish_all()
+        elif event.get('students') or event.get('periods'):
+            summary = {}
+            if event.get('students'):
+                summary = publish_students(event['students'])
+            if event.get('periods'):
+                summary['byPeriods'] = publish_for_periods(event['periods'])
+        else:
+            summary = publish_due()
+        logger.info(f"视图发布完成：{summary}")
+        return {
+            'statusCode': 200,
+            'body': json.dumps(summary, ensure_ascii=False)
+        }
+    except Exception as e:
+        logger.error(f"视图发布失败：{str(e)}", exc_info=True)
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'message': str(e)})
+        }
@@ -0,0 +1,376 @@
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import GradeFileParser
+from AwsRuntime import dynamodb, get_table
+from ChangeLog import stamp
+from DynamoBatch import batch_get_items, batch_write, conditional_put
+from GradeStats import StatsDelta, update_stats
+from GradeValidation import REQUIRED_COLUMNS, grade_id_for, validate
+from GetTeacherCourses import teacher_id_from
+from GradeViews import request_publish, worker_handler as publish_worker
+from MultipartStream import FilePart, decode_body, find_file_part, iter_csv_rows
+from ObjectStore import get_object_store
+from TaskQueue import get_task_queue
+from Telemetry import instrumented
+
+# 异步导入任务：文件先落对象存储，创建任务记录；队列驱动的worker先整体校验并切分为若干块，
+# 再逐块写入（每块一条消息，可并行、可重试），/teacher/upload/{jobId}查询进度
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+jobs_table = get_table('ImportJobs')  # 任务表（主键：jobId），expiresAt为TTL属性
+
+# 每块的行数：一条队列消息处理一块，单块耗时远小于Lambda超时
+CHUNK_ROWS = 5000
+JOB_TTL_DAYS = 7
+MAX_REPORTED_ERRORS = GradeFileParser.MAX_REPORTED_ERRORS
+
+CORS_HEADERS = dict(GradeFileParser.CORS_HEADERS, **{
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
+})
+
+# 任务状态流转：created（等待直传）→ queued → validating → running → succeeded / failed
+
+
+def _response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps(body, default=_json_default, ensure_ascii=False)
+    }
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError(f'无法序列化类型：{type(value).__name__}')
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def source_key(job_id):
+    return f'imports/{job_id}/source.csv'
+
+
+def chunk_key(job_id, index):
+    return f'imports/{job_id}/chunk-{index:05d}.csv'
+
+
+def get_job(job_id):
+    return jobs_table.get_item(Key={'jobId': job_id}, ConsistentRead=True).get('Item')
+
+
+def update_job(job_id, **fields):
+    fields['updatedAt'] = _now()
+    names = {f'#{k}': k for k in fields}
+    values = {f':{k}': v for k, v in fields.items()}
+    jobs_table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression='SET ' + ', '.join(f'#{k} = :{k}' for k in fields),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+
+def create_job(file_name, mode, owner):
+    job_id = uuid.uuid4().hex
+    now = _now()
+    job = {
+        'jobId': job_id,
+        'status': 'created',
+        'fileName': file_name,
+        'mode': mode,
+        'owner': owner or '',
+        'createdAt': now,
+        'updatedAt': now,
+        'expiresAt': int(time.time()) + JOB_TTL_DAYS * 86400
+    }
+    jobs_table.put_item(Item=job)
+    return job
+
+
+def enqueue_prepare(job_id):
+    """把任务置为queued并投递校验消息；只有created状态的任务可以启动（防止重复启动）"""
+    try:
+        jobs_table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #s = :queued, updatedAt = :now',
+            ConditionExpression='#s = :created',
+            ExpressionAttributeNames={'#s': 'status'},
+            ExpressionAttributeValues={':queued': 'queued', ':created': 'created', ':now': _now()}
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+    get_task_queue().send({'jobId': job_id, 'step': 'prepare'})
+    return True
+
+
+def send_chunks(job_id, indexes):
+    get_task_queue().send_batch([{'jobId': job_id, 'step': 'chunk', 'chunk': i} for i in indexes])
+
+
+def prepare_job(job_id):
+    """校验整个文件并切分为块：有任何错误则任务失败，不写入任何成绩"""
+    job = get_job(job_id)
+    if job and job['status'] == 'running':
+        # 已切块但块消息可能没有全部发出（发送失败后prepare消息被重新投递）：重发尚未完成的块；
+        # 块按completedChunks去重，重复的块消息不会重复写入或计数
+        done = job.get('completedChunks', set())
+        pending = [i for i in range(int(job.get('totalChunks', 0))) if i not in done]
+        send_chunks(job_id, pending)
+        logger.info(f"重新发送未完成的块：jobId={job_id}，{len(pending)}块")
+        return
+    # validating状态说明上次校验中途失败（消息被重新投递），可以重新校验
+    if not job or job['status'] not in ('queued', 'validating'):
+        logger.info(f"任务无需校验（可能是重复消息）：jobId={job_id}，状态={job and job['status']}")
+        return
+    update_job(job_id, status='validating')
+
+    store = get_object_store()
+    data = store.get_bytes(source_key(job_id))
+    csv_reader = iter_csv_rows(FilePart(data, 0, len(data), job.get('fileName')))
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in (csv_reader.fieldnames or [])]
+    if missing_columns:
+        update_job(job_id, status='failed', message=f'CSV缺少必要列：{missing_columns}')
+        return
+
+    rows, errors = validate(csv_reader)
+    if errors:
+        update_job(job_id, status='failed',
+                   message=f'CSV校验失败：{len(errors)}行数据有误，未导入任何成绩',
+                   rejected=len({error['row'] for error in errors}),
+                   errors=errors[:MAX_REPORTED_ERRORS])
+        return
+
+    # 切分为块写入对象存储（行号保留，便于逐行报告）
+    chunks = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    in_chunk = 0
+    for row_num, item in rows:
+        writer.writerow([row_num, item['studentId'], item['course'], item['term'], str(item['score'])])
+        in_chunk += 1
+        if in_chunk == CHUNK_ROWS:
+            store.put_bytes(chunk_key(job_id, chunks), buffer.getvalue().encode('utf-8'), 'text/csv')
+            chunks += 1
+            buffer, in_chunk = io.StringIO(), 0
+            writer = csv.writer(buffer)
+    if in_chunk:
+        store.put_bytes(chunk_key(job_id, chunks), buffer.getvalue().encode('utf-8'), 'text/csv')
+        chunks += 1
+
+    # 涉及的课程+学期（随任务进度一起返回）
+    course_terms = sorted(set(zip(rows.courses, rows.terms)))
+    update_job(job_id, status='running' if chunks else 'succeeded', totalRows=len(rows), totalChunks=chunks,
+               courseTerms=[list(pair) for pair in course_terms], processedRows=0, inserted=0, updated=0, unchanged=0, written=0, retried=0, conflict=0)
+    # 先标记为running再发送块消息（块只在running状态下处理）；发送失败时prepare消息重投，由上面的分支补发
+    send_chunks(job_id, range(chunks))
+    logger.info(f"任务校验完成：jobId={job_id}，{len(rows)}行，切分为{chunks}块")
+
+
+def _load_chunk(job_id, index):
+    data = get_object_store().get_bytes(chunk_key(job_id, index)).decode('utf-8')
+    rows = []
+    for row_num, student_id, course, term, score in csv.reader(io.StringIO(data)):
+        rows.append((int(row_num), {
+            'studentId': student_id,
+            'gradeId': grade_id_for(course, term, student_id),
+            'course': course,
+            'term': term,
+            'score': Decimal(score)
+        }))
+    return rows
+
+
+def process_chunk(job_id, index):
+    """写入一块成绩；写入按主键幂等，失败时抛出异常交给队列重试，已完成的块不会重复计数"""
+    job = get_job(job_id)
+    if not job or job['status'] != 'running' or index in job.get('completedChunks', set()):
+        return
+
+    rows = _load_chunk(job_id, index)
+    client = GradeFileParser.grades_table.meta.client
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if job.get('mode') == 'upsert':
+        items, unprocessed = batch_get_items(
+            dynamodb, GradeFileParser.GRADES_TABLE_NAME,
+            [{'studentId': item['studentId'], 'gradeId': item['gradeId']} for _, item in rows],
+            projection=['studentId', 'gradeId', 'score'])
+        if unprocessed:
+            raise RuntimeError(f'读取已有成绩时有{len(unprocessed)}个键因限流未处理')
+        existing = {(item['studentId'], item['gradeId']): item.get('score') for item in items}
+        requests, inserted, updated, unchanged = GradeFileParser.diff_rows(rows, existing)
+        stamp([item for _, item, _, _ in requests])
+        report = conditional_put(client, GradeFileParser.GRADES_TABLE_NAME, requests,
+                                 workers=GradeFileParser.WRITE_WORKERS)
+        ok = ('written', 'retried')
+        counts = {
+            'inserted': sum(1 for ref in inserted if report.status.get(ref) in ok),
+            'updated': sum(1 for ref in updated if report.status.get(ref) in ok),
+            'unchanged': unchanged
+        }
+        # 本次实际写入的行才计入统计；重试时已写入的行对比后为未变化，不会重复累加
+        delta = StatsDelta()
+        delta.record_conditional_puts(requests, report.status)
+        update_stats(delta)
+    else:
+        # 统计按写入前强一致读取的旧成绩增量累加；重投时已写入的行读到的就是新值，不会重复累加
+        previous = GradeFileParser.load_previous_items(rows)
+        puts = [(row_num, 'put', item) for row_num, item in rows]
+        stamp([item for _, _, item in puts])
+        report = batch_write(client, GradeFileParser.GRADES_TABLE_NAME, puts,
+                             key_names=GradeFileParser.GRADES_KEY, workers=GradeFileParser.WRITE_WORKERS)
+        delta = StatsDelta()
+        delta.record_overwrites(rows, previous, report.status)
+        update_stats(delta)
+
+    summary = report.summary()
+    if summary['failed']:
+        raise RuntimeError(f'第{index}块有{summary["failed"]}行写入失败，等待队列重试')
+    request_publish(students=[item['studentId'] for _, item in rows])
+
+    # 原子地累加进度；completedChunks条件保证重复投递的消息不会重复计数
+    try:
+        response = jobs_table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression=('ADD completedChunks :chunk, processedRows :rows, written :written, '
+                              'retried :retried, #conflict :conflict, inserted :inserted, '
+                              'updated :updated, unchanged :unchanged SET updatedAt = :now'),
+            ConditionExpression='attribute_not_exists(completedChunks) OR NOT contains(completedChunks, :index)',
+            ExpressionAttributeNames={'#conflict': 'conflict'},
+            ExpressionAttributeValues={
+                ':chunk': {index}, ':index': index, ':rows': len(rows),
+                ':written': summary['written'], ':retried': summary['retried'],
+                ':conflict': summary['conflict'], ':inserted': counts['inserted'],
+                ':updated': counts['updated'], ':unchanged': counts['unchanged'], ':now': _now()
+            },
+            ReturnValues='ALL_NEW'
+        )
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return
+        raise
+    job = response['Attributes']
+    if len(job.get('completedChunks', ())) >= job.get('totalChunks', 0):
+        update_job(job_id, status='succeeded', finishedAt=_now())
+        logger.info(f"导入任务完成：jobId={job_id}")
+
+
+@instrumented
+def worker_handler(event, context):
+    """队列消费者（SQS触发）：prepare消息做整体校验与切块，chunk消息写入一块
+
+    视图发布消息默认与导入任务共用队列：单独部署（不经Router）时转交GradeViews处理；
+    无法识别的消息只记日志后丢弃，不抛出异常（否则会被反复重投直到进入死信队列）。
+    """
+    publish_records = []
+    for record in event.get('Records', []):
+        try:
+            message = json.loads(record['body'])
+        except (KeyError, TypeError, ValueError):
+            logger.error(f"无法解析的任务消息，已丢弃：{record.get('body')!r}")
+            continue
+        if message.get('step') == 'publish':
+            publish_records.append(record)
+            continue
+        job_id = message.get('jobId')
+        if not job_id or message.get('step') not in ('prepare', 'chunk'):
+            logger.error(f"未知的任务消息，已丢弃：{message}")
+            continue
+        try:
+            if message.get('step') == 'prepare':
+                prepare_job(job_id)
+            else:
+                process_chunk(job_id, int(message['chunk']))
+        except Exception as e:
+            logger.error(f"任务处理失败（将由队列重试）：jobId={job_id}，{str(e)}", exc_info=True)
+            raise
+    if publish_records:
+        publish_worker(dict(event, Records=publish_records), context)
+
+
+@instrumented
+def lambda_handler(event, context):
+    """POST /teacher/upload/jobs 创建任务；POST /teacher/upload/{jobId} 直传完成后启动；
+    GET /teacher/upload/{jobId} 查询进度"""
+    try:
+        http_method = event.get('httpMethod', '').upper()
+        if http_method == 'OPTIONS':
+            return _response(200, {'message': '预检请求成功'})
+
+        # 任务只对创建者可见：没有调用者身份时拒绝，其他教师的任务按不存在处理（不暴露任务是否存在）
+        owner = teacher_id_from(event)
+        if not owner:
+            return _response(401, {'message': '未获取到教师身份，请重新登录'})
+
+        job_id = (event.get('pathParameters') or {}).get('jobId')
+        query_params = event.get('queryStringParameters') or {}
+
+        if http_method == 'GET' and job_id:
+            job = get_job(job_id)
+            if not job or job.get('owner') != owner:
+                return _response(404, {'message': f'未找到导入任务：{job_id}'})
+            job.pop('completedChunks', None)
+            total = int(job.get('totalRows') or 0)
+            job['progress'] = round(int(job.get('processedRows') or 0) / total, 4) if total else None
+            return _response(200, job)
+
+        if http_method == 'POST' and job_id:
+            job = get_job(job_id)
+            if not job or job.get('owner') != owner:
+                return _response(404, {'message': f'未找到导入任务：{job_id}'})
+            if not enqueue_prepare(job_id):
+                return _response(409, {'message': f'任务已启动或已结束（状态：{job["status"]}）'})
+            return _response(202, {'jobId': job_id, 'status': 'queued'})
+
+        if http_method == 'POST':
+            file_name = query_params.get('filename', '')
+            mode = (query_params.get('mode') or 'replace').lower()
+            if not file_name.lower().endswith('.csv'):
+                return _response(400, {'message': '仅支持.csv格式文件'})
+            if mode not in GradeFileParser.IMPORT_MODES:
+                return _response(400, {'message': f'不支持的导入模式：{mode}'})
+
+            job = create_job(file_name, mode, owner)
+            store = get_object_store()
+
+            # 请求中直接带了文件（multipart，小文件或本地测试）：存入对象存储后立即排队
+            if event.get('body'):
+                headers = event.get('headers') or {}
+                content_type = headers.get('content-type', headers.get('Content-Type', ''))
+                body = decode_body(event)
+                if 'multipart/form-data' in content_type.lower():
+                    boundary = GradeFileParser.parse_boundary(content_type)
+                    part = find_file_part(body, boundary) if boundary else None
+                    if not part:
+                        return _response(400, {'message': '未找到文件内容'})
+                    body = part.view
+                store.put_bytes(source_key(job['jobId']), bytes(body), 'text/csv')
+                enqueue_prepare(job['jobId'])
+                return _response(202, {'jobId': job['jobId'], 'status': 'queued'})
+
+            upload_url = store.presign_put(source_key(job['jobId']), 'text/csv')
+            if not upload_url:
+                return _response(400, {'message': '当前对象存储不支持直传，请随请求提交文件'})
+            return _response(201, {'jobId': job['jobId'], 'status': 'created',
+                                   'uploadUrl': upload_url, 'uploadMethod': 'PUT'})
+
+        return _response(405, {'message': f'不支持{http_method}方法'})
+
+    except Exception as e:
+        logger.error(f"导入任务请求失败：{str(e)}", exc_info=True)
+        return _response(500, {'message': f'处理失败：{str(e)}'})
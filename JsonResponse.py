@@ -0,0 +1,182 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+from decimal import Decimal
+
+try:
+    import brotli  # 可选依赖：未安装时只使用gzip
+except ImportError:
+    brotli = None
+
+# 读接口的统一响应层：一次序列化（Decimal直接编码，无需逐字段转换）、按ETag回应304、
+# 超过阈值且客户端支持时压缩响应体。
+# 压缩后的响应体以base64返回（isBase64Encoded），需使用Lambda代理集成并在API Gateway中
+# 把*/*配置为二进制媒体类型，才能以原始字节下发给浏览器。
+
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# 前端页面域名（CORS严格匹配，无末尾斜杠）；所有处理函数与Router共用这一处配置，本地调试可用环境变量覆盖
+CORS_ALLOW_ORIGIN = os.environ.get('CORS_ALLOW_ORIGIN', 'https://dfg1elzq7v3yy.cloudfront.net')
+CORS_ALLOW_HEADERS = 'Content-Type, Authorization'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)  # 与原先逐字段转换为float的结果一致
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f'无法序列化的类型：{type(value).__name__}')
+
+
+# 复用同一个编码器实例（C实现的encoder，只在遇到Decimal等类型时回调default）；
+# DynamoDB返回的数据不会有循环引用，关闭循环检查省去每个容器的登记开销
+_encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(',', ':'),
+                            check_circular=False)
+
+
+class RawJson(str):
+    """已序列化好的JSON文本（如预先生成的文档），响应层直接使用，不再编码"""
+
+    __slots__ = ()
+
+
+def dumps(payload):
+    """序列化为JSON字符串（Decimal按float输出）"""
+    return _encoder.encode(payload)
+
+
+def cors_headers(methods=None, extra=None):
+    """CORS响应头：methods为预检响应中允许的方法（如'GET, POST, OPTIONS'），extra为附加的响应头"""
+    headers = {
+        'Access-Control-Allow-Origin': CORS_ALLOW_ORIGIN,
+        'Access-Control-Allow-Headers': CORS_ALLOW_HEADERS
+    }
+    if methods:
+        headers['Access-Control-Allow-Methods'] = methods
+    if extra:
+        headers.update(extra)
+    return headers
+
+
+def error_response(status_code, message, headers=None, **fields):
+    """错误响应：{"message": ..., 其他字段}，默认附带CORS头"""
+    headers = dict(headers if headers is not None else cors_headers())
+    headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': dumps(dict(fields, message=message))
+    }
+
+
+def get_header(event, name):
+    """大小写不敏感地读取请求头"""
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == lowered:
+                return candidate
+    return value
+
+
+def make_etag(data):
+    """由响应内容（或数据版本号）生成弱ETag；压缩与否不影响其取值"""
+    if not isinstance(data, bytes):
+        data = str(data).encode('utf-8')
+    return 'W/"%s"' % hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def etag_matches(event, etag):
+    """If-None-Match是否命中（弱比较，支持逗号分隔的多个值和*）"""
+    header = get_header(event, 'If-None-Match')
+    if not header:
+        return False
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def choose_encoding(event):
+    """按Accept-Encoding选择压缩算法：优先br（需安装brotli），其次gzip"""
+    header = (get_header(event, 'Accept-Encoding') or '').lower()
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            accepted.add(name.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0：相同内容压缩结果相同
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def json_response(event, payload, status_code=200, headers=None, version=None):
+    """构造API Gateway代理响应
+
+    status_code为200时附带ETag：传入version（如数据的最新更新时间戳）则由其生成，
+    命中If-None-Match时不再序列化payload；否则由序列化后的内容生成。
+    payload可以是可调用对象，仅在需要响应体时才调用。
+    """
+    headers = dict(headers or {})
+    headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+    headers['Vary'] = 'Accept-Encoding'
+
+    etag = None
+    if status_code == 200 and version is not None:
+        etag = make_etag(version)
+        if etag_matches(event, etag):
+            return _not_modified(headers, etag)
+
+    if callable(payload):
+        payload = payload()
+    text = payload if isinstance(payload, RawJson) else dumps(payload)
+    body = text.encode('utf-8')
+
+    if status_code == 200:
+        if etag is None:
+            etag = make_etag(body)
+            if etag_matches(event, etag):
+                return _not_modified(headers, etag)
+        headers['ETag'] = etag
+
+    encoding = choose_encoding(event) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        return {
+            'statusCode': status_code,
+            'headers': headers,
+            'body': base64.b64encode(compress(body, encoding)).decode('ascii'),
+            'isBase64Encoded': True
+        }
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': text
+    }
+
+
+def _not_modified(headers, etag):
+    headers.pop('Content-Type', None)
+    headers['ETag'] = etag
+    return {'statusCode': 304, 'headers': headers, 'body': ''}
@@ -0,0 +1,1343 @@
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+# 进程内的DynamoDB替身：实现本项目用到的resource/client接口（Get/Put/Update/Delete、
+# Query/Scan含GSI与分页、BatchGet/BatchWrite、TransactWrite、条件表达式与更新表达式），并统计每张表的
+# 读写条数与消耗的容量单位。用于离线基准测试和本地调试，不依赖boto3：
+#
+#     import LocalDynamoDB
+#     db = LocalDynamoDB.LocalDynamoDB()
+#     AwsRuntime.install_dynamodb(db, conditions=LocalDynamoDB, types=LocalDynamoDB)
+#
+# （本模块同时提供Key/Attr与TypeSerializer/TypeDeserializer，可直接作为conditions/types传入。）
+#
+# Query/Scan与真实服务一样每页最多读取约1MB（按近似条目大小计算）。
+# 事务只支持TransactWriteItems；未实现的部分：TransactGetItems、流、TTL删除。
+# 默认不限流；传入limiter（如CapacityLimiter按表的预置容量限速）可模拟限流，
+# 客户端的限流重试（botocore的retries配置）由SdkRetries包装模拟。
+
+# 本项目用到的表：表名 -> (分区键, 排序键, {索引名: (分区键, 排序键)})
+DEFAULT_SCHEMAS = {
+    'Grades': ('studentId', 'gradeId', {
+        'course-term-index': ('course', 'term'),
+        'term-course-index': ('term', 'course'),
+        'studentId-version-index': ('studentId', 'version'),
+        'course-version-index': ('course', 'version'),
+    }),
+    'GradeTombstones': ('studentId', 'gradeId', {
+        'studentId-version-index': ('studentId', 'version'),
+        'course-version-index': ('course', 'version'),
+    }),
+    'QueryPeriods': ('gradeId', None, {}),
+    'StudentInfo': ('studentId', None, {}),
+    'TeacherCourses': ('teacherId', 'courseId', {}),
+    'GradeImports': ('contentHash', None, {}),
+    'ImportJobs': ('jobId', None, {}),
+    'GradeStats': ('course', 'term', {}),
+    'StudentGradeViews': ('studentId', None, {}),
+}
+
+READ_UNIT = 4096
+PAGE_BYTES = 1024 * 1024
+WRITE_UNIT = 1024
+
+
+class ClientError(Exception):
+    """与botocore.exceptions.ClientError一致：错误码在e.response['Error']['Code']"""
+
+    def __init__(self, code, message=''):
+        super().__init__(f'{code}: {message}' if message else code)
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class ConditionalCheckFailedException(ClientError):
+    def __init__(self, message='The conditional request failed'):
+        super().__init__('ConditionalCheckFailedException', message)
+
+
+# ---------------------------------------------------------------- 类型序列化
+
+class TypeSerializer:
+    """Python值 -> DynamoDB AttributeValue（与boto3.dynamodb.types.TypeSerializer一致）"""
+
+    def serialize(self, value):
+        if value is None:
+            return {'NULL': True}
+        if isinstance(value, bool):
+            return {'BOOL': value}
+        if isinstance(value, (int, Decimal)):
+            return {'N': str(value)}
+        if isinstance(value, float):
+            raise TypeError('Float types are not supported. Use Decimal types instead.')
+        if isinstance(value, str):
+            return {'S': value}
+        if isinstance(value, (bytes, bytearray)):
+            return {'B': bytes(value)}
+        if isinstance(value, (set, frozenset)):
+            if all(isinstance(v, str) for v in value):
+                return {'SS': sorted(value)}
+            if all(isinstance(v, (int, Decimal)) and not isinstance(v, bool) for v in value):
+                return {'NS': [str(v) for v in value]}
+            return {'BS': [bytes(v) for v in value]}
+        if isinstance(value, dict):
+            return {'M': {k: self.serialize(v) for k, v in value.items()}}
+        if isinstance(value, (list, tuple)):
+            return {'L': [self.serialize(v) for v in value]}
+        raise TypeError(f'Unsupported type "{type(value)}" for value "{value}"')
+
+
+class TypeDeserializer:
+    def deserialize(self, value):
+        (kind, data), = value.items()
+        if kind == 'S':
+            return data
+        if kind == 'N':
+            return Decimal(data)
+        if kind == 'BOOL':
+            return data
+        if kind == 'NULL':
+            return None
+        if kind == 'B':
+            return data
+        if kind == 'SS':
+            return set(data)
+        if kind == 'NS':
+            return {Decimal(v) for v in data}
+        if kind == 'BS':
+            return set(data)
+        if kind == 'M':
+            return {k: self.deserialize(v) for k, v in data.items()}
+        if kind == 'L':
+            return [self.deserialize(v) for v in data]
+        raise TypeError(f'未知的AttributeValue类型：{kind}')
+
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _ser_item(item):
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+def _de_item(item):
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
+def _normalize(item):
+    """按AttributeValue往返一次：与boto3一致，存入后读出的数字均为Decimal（float直接报错），返回新的副本"""
+    return _de_item(_ser_item(item))
+
+
+# ---------------------------------------------------------------- 条件对象（Key/Attr）
+
+_MISSING = object()
+
+
+def _resolve(item, path):
+    value = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(value, list) or part >= len(value):
+                return _MISSING
+            value = value[part]
+        else:
+            if not isinstance(value, dict) or part not in value:
+                return _MISSING
+            value = value[part]
+    return value
+
+
+def _compare(op, left, right):
+    if left is _MISSING or right is _MISSING:
+        return op == '<>' and not (left is _MISSING and right is _MISSING)
+    try:
+        if op == '=':
+            return left == right
+        if op == '<>':
+            return left != right
+        if op == '<':
+            return left < right
+        if op == '<=':
+            return left <= right
+        if op == '>':
+            return left > right
+        if op == '>=':
+            return left >= right
+    except TypeError:
+        return False
+    raise ValueError(f'未知的比较运算：{op}')
+
+
+class Condition:
+    def __and__(self, other):
+        return _Logical('AND', self, other)
+
+    def __or__(self, other):
+        return _Logical('OR', self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+
+class _Logical(Condition):
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, left, right
+
+    def evaluate(self, item):
+        if self.op == 'AND':
+            return self.left.evaluate(item) and self.right.evaluate(item)
+        return self.left.evaluate(item) or self.right.evaluate(item)
+
+
+class _Not(Condition):
+    def __init__(self, inner):
+        self.inner = inner
+
+    def evaluate(self, item):
+        return not self.inner.evaluate(item)
+
+
+class _Operand:
+    """路径或常量"""
+
+    def __init__(self, path=None, value=_MISSING, size_of=False):
+        self.path, self.value, self.size_of = path, value, size_of
+
+    def get(self, item):
+        if self.path is None:
+            return self.value
+        value = _resolve(item, self.path)
+        if self.size_of:
+            if value is _MISSING:
+                return _MISSING
+            return Decimal(len(value)) if not isinstance(value, (int, Decimal)) else _MISSING
+        return value
+
+
+class _Comparison(Condition):
+    def __init__(self, op, left, *rights):
+        self.op, self.left, self.rights = op, left, rights
+
+    def evaluate(self, item):
+        left = self.left.get(item)
+        values = [right.get(item) for right in self.rights]
+        op = self.op
+        if op == 'BETWEEN':
+            return _compare('>=', left, values[0]) and _compare('<=', left, values[1])
+        if op == 'IN':
+            return left is not _MISSING and any(_compare('=', left, v) for v in values)
+        if op == 'begins_with':
+            return isinstance(left, (str, bytes)) and isinstance(values[0], type(left)) \
+                and left.startswith(values[0])
+        if op == 'contains':
+            if left is _MISSING or values[0] is _MISSING:
+                return False
+            if isinstance(left, str):
+                return isinstance(values[0], str) and values[0] in left
+            if isinstance(left, (set, frozenset, list)):
+                return values[0] in left
+            return False
+        if op == 'attribute_exists':
+            return left is not _MISSING
+        if op == 'attribute_not_exists':
+            return left is _MISSING
+        if op == 'attribute_type':
+            return left is not _MISSING and _serializer.serialize(left).keys() == {values[0]}
+        return _compare(op, left, values[0])
+
+    def key_part(self):
+        """(属性名, 运算, 值列表)，供Query选择分区与排序键范围"""
+        if self.left.path is None or len(self.left.path) != 1:
+            return None
+        return self.left.path[0], self.op, [right.value for right in self.rights]
+
+
+class _AttributeBase:
+    def __init__(self, name):
+        self.name = name
+        self._path = [name]
+
+    def _cmp(self, op, *values):
+        return _Comparison(op, _Operand(self._path), *[_Operand(value=v) for v in values])
+
+    def eq(self, value):
+        return self._cmp('=', value)
+
+    def lt(self, value):
+        return self._cmp('<', value)
+
+    def lte(self, value):
+        return self._cmp('<=', value)
+
+    def gt(self, value):
+        return self._cmp('>', value)
+
+    def gte(self, value):
+        return self._cmp('>=', value)
+
+    def begins_with(self, value):
+        return self._cmp('begins_with', value)
+
+    def between(self, low, high):
+        return self._cmp('BETWEEN', low, high)
+
+
+class Key(_AttributeBase):
+    """与boto3.dynamodb.conditions.Key用法一致"""
+
+
+class Attr(_AttributeBase):
+    """与boto3.dynamodb.conditions.Attr用法一致"""
+
+    def ne(self, value):
+        return self._cmp('<>', value)
+
+    def is_in(self, values):
+        return self._cmp('IN', *values)
+
+    def exists(self):
+        return self._cmp('attribute_exists')
+
+    def not_exists(self):
+        return self._cmp('attribute_not_exists')
+
+    def contains(self, value):
+        return self._cmp('contains', value)
+
+
+# ---------------------------------------------------------------- 字符串表达式解析
+
+_TOKEN = re.compile(r'\s*(?:(<>|<=|>=|[=<>(),.\[\]+-])|(#[A-Za-z0-9_]+)|(:[A-Za-z0-9_]+)|(\d+)|([A-Za-z_][A-Za-z0-9_]*))')
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ClientError('ValidationException', f'无法解析的表达式：{expression[pos:]}')
+        pos = match.end()
+        symbol, name_ref, value_ref, number, word = match.groups()
+        if symbol:
+            tokens.append(('sym', symbol))
+        elif name_ref:
+            tokens.append(('name', name_ref))
+        elif value_ref:
+            tokens.append(('value', value_ref))
+        elif number:
+            tokens.append(('num', int(number)))
+        else:
+            tokens.append(('word', word))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression, names, values):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, symbol):
+        kind, value = self.take()
+        if value != symbol:
+            raise ClientError('ValidationException', f'表达式缺少{symbol}')
+
+    def keyword(self, word):
+        kind, value = self.peek()
+        if kind == 'word' and value.upper() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # 路径：name(.name | [n])*
+    def path(self):
+        kind, value = self.take()
+        parts = [self._name(kind, value)]
+        while True:
+            kind, value = self.peek()
+            if value == '.':
+                self.pos += 1
+                kind, value = self.take()
+                parts.append(self._name(kind, value))
+            elif value == '[':
+                self.pos += 1
+                kind, value = self.take()
+                parts.append(int(value))
+                self.expect(']')
+            else:
+                return parts
+
+    def _name(self, kind, value):
+        if kind == 'name':
+            if value not in self.names:
+                raise ClientError('ValidationException', f'未定义的属性名占位符：{value}')
+            return self.names[value]
+        if kind == 'word':
+            return value
+        raise ClientError('ValidationException', f'期望属性名，得到{value}')
+
+    def operand(self):
+        kind, value = self.peek()
+        if kind == 'value':
+            self.pos += 1
+            if value not in self.values:
+                raise ClientError('ValidationException', f'未定义的属性值占位符：{value}')
+            return _Operand(value=self.values[value])
+        if kind == 'word' and value == 'size' and self.peek(1)[1] == '(':
+            self.pos += 2
+            path = self.path()
+            self.expect(')')
+            return _Operand(path, size_of=True)
+        return _Operand(self.path())
+
+    # 条件表达式
+    def condition(self):
+        node = self._and()
+        while self.keyword('OR'):
+            node = _Logical('OR', node, self._and())
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self.keyword('AND'):
+            node = _Logical('AND', node, self._not())
+        return node
+
+    def _not(self):
+        if self.keyword('NOT'):
+            return _Not(self._not())
+        return self._primary()
+
+    def _primary(self):
+        kind, value = self.peek()
+        if value == '(':
+            self.pos += 1
+            node = self.condition()
+            self.expect(')')
+            return node
+        if kind == 'word' and value in ('attribute_exists', 'attribute_not_exists', 'begins_with',
+                                         'contains', 'attribute_type') and self.peek(1)[1] == '(':
+            self.pos += 2
+            path = self.path()
+            args = []
+            while self.peek()[1] == ',':
+                self.pos += 1
+                args.append(self.operand())
+            self.expect(')')
+            return _Comparison(value, _Operand(path), *args)
+        left = self.operand()
+        if self.keyword('BETWEEN'):
+            low = self.operand()
+            if not self.keyword('AND'):
+                raise ClientError('ValidationException', 'BETWEEN缺少AND')
+            return _Comparison('BETWEEN', left, low, self.operand())
+        if self.keyword('IN'):
+            self.expect('(')
+            options = [self.operand()]
+            while self.peek()[1] == ',':
+                self.pos += 1
+                options.append(self.operand())
+            self.expect(')')
+            return _Comparison('IN', left, *options)
+        kind, op = self.take()
+        if op not in ('=', '<>', '<', '<=', '>', '>='):
+            raise ClientError('ValidationException', f'不支持的比较运算：{op}')
+        return _Comparison(op, left, self.operand())
+
+    # 更新表达式
+    def update_actions(self):
+        actions = []
+        while not self.done():
+            kind, clause = self.take()
+            clause = (clause or '').upper()
+            if clause not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise ClientError('ValidationException', f'不支持的更新子句：{clause}')
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append(('SET', path, self._set_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path, None))
+                else:
+                    actions.append((clause, path, self.operand()))
+                if self.peek()[1] != ',':
+                    break
+                self.pos += 1
+        return actions
+
+    def _set_value(self):
+        left = self._set_operand()
+        kind, value = self.peek()
+        if value in ('+', '-'):
+            self.pos += 1
+            return (value, left, self._set_operand())
+        return ('value', left)
+
+    def _set_operand(self):
+        kind, value = self.peek()
+        if kind == 'word' and value in ('if_not_exists', 'list_append') and self.peek(1)[1] == '(':
+            self.pos += 2
+            first = self.operand()
+            self.expect(',')
+            second = self.operand()
+            self.expect(')')
+            return (value, first, second)
+        return ('operand', self.operand())
+
+    def projection(self):
+        paths = [self.path()]
+        while self.peek()[1] == ',':
+            self.pos += 1
+            paths.append(self.path())
+        return paths
+
+
+def parse_condition(expression, names=None, values=None):
+    if expression is None or isinstance(expression, Condition):
+        return expression
+    parser = _Parser(expression, names, values)
+    node = parser.condition()
+    if not parser.done():
+        raise ClientError('ValidationException', f'表达式多余内容：{expression}')
+    return node
+
+
+def _set_operand_value(item, spec):
+    kind = spec[0]
+    if kind == 'operand':
+        return spec[1].get(item)
+    if kind == 'if_not_exists':
+        existing = spec[1].get(item)
+        return spec[2].get(item) if existing is _MISSING else existing
+    if kind == 'list_append':
+        return list(spec[1].get(item)) + list(spec[2].get(item))
+    raise ValueError(kind)
+
+
+def _assign(item, path, value):
+    target = item
+    for part in path[:-1]:
+        target = target[part]
+    if value is _MISSING:
+        raise ClientError('ValidationException', f'更新表达式引用了不存在的属性：{path}')
+    target[path[-1]] = value
+
+
+def _remove(item, path):
+    target = _resolve(item, path[:-1]) if len(path) > 1 else item
+    if target is _MISSING:
+        return
+    if isinstance(target, dict):
+        target.pop(path[-1], None)
+    elif isinstance(target, list) and path[-1] < len(target):
+        del target[path[-1]]
+
+
+def apply_update(item, expression, names=None, values=None):
+    """在item（副本）上执行更新表达式"""
+    for action, path, spec in _Parser(expression, names, values).update_actions():
+        current = _resolve(item, path)
+        if action == 'SET':
+            if spec[0] == 'value':
+                value = _set_operand_value(item, spec[1])
+            else:
+                left = _set_operand_value(item, spec[1])
+                right = _set_operand_value(item, spec[2])
+                if left is _MISSING or right is _MISSING:
+                    raise ClientError('ValidationException', '算术运算引用了不存在的属性')
+                value = left + right if spec[0] == '+' else left - right
+            _assign(item, path, value)
+        elif action == 'REMOVE':
+            _remove(item, path)
+        elif action == 'ADD':
+            value = spec.get(item)
+            if current is _MISSING:
+                _assign(item, path, set(value) if isinstance(value, (set, frozenset)) else value)
+            elif isinstance(current, (set, frozenset)):
+                _assign(item, path, set(current) | set(value))
+            else:
+                _assign(item, path, current + value)
+        elif action == 'DELETE':
+            if isinstance(current, (set, frozenset)):
+                remaining = set(current) - set(spec.get(item))
+                if remaining:
+                    _assign(item, path, remaining)
+                else:
+                    _remove(item, path)
+    return item
+
+
+def parse_projection(expression, names=None):
+    if not expression:
+        return None
+    return [path[0] for path in _Parser(expression, names, None).projection()]
+
+
+def _project(item, attributes):
+    if attributes is None:
+        return dict(item)
+    return {name: item[name] for name in attributes if name in item}
+
+
+# ---------------------------------------------------------------- 表与索引
+
+def item_size(item):
+    """近似的条目大小（字节）：属性名 + 值的长度"""
+    size = 0
+    for name, value in item.items():
+        size += len(name)
+        if isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, (int, Decimal)):
+            size += 21 if isinstance(value, Decimal) and len(value.as_tuple().digits) > 20 else 8
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        elif isinstance(value, (set, frozenset, list, dict)):
+            size += len(str(value))
+        else:
+            size += 1
+    return size
+
+
+class _IndexView:
+    """一个键结构（表本身或GSI）下的分区：分区键值 -> {排序元组: 主键}，排序列表按需重建"""
+
+    def __init__(self, hash_key, range_key, table_keys):
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.table_keys = table_keys
+        self.partitions = {}
+        self._sorted = {}  # 分区键值 -> (排序元组列表, 排序键值列表)
+
+    def sort_tuple(self, item, pk):
+        head = (item[self.range_key],) if self.range_key else ()
+        return head + pk
+
+    def add(self, item, pk):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return  # 稀疏索引：缺少索引键的条目不进入索引
+        hash_value = item[self.hash_key]
+        self.partitions.setdefault(hash_value, {})[self.sort_tuple(item, pk)] = pk
+        self._sorted.pop(hash_value, None)
+
+    def remove(self, item, pk):
+        if self.hash_key not in item or (self.range_key and self.range_key not in item):
+            return
+        hash_value = item[self.hash_key]
+        partition = self.partitions.get(hash_value)
+        if partition is not None:
+            partition.pop(self.sort_tuple(item, pk), None)
+            if not partition:
+                del self.partitions[hash_value]
+            self._sorted.pop(hash_value, None)
+
+    def sorted_partition(self, hash_value):
+        cached = self._sorted.get(hash_value)
+        if cached is None:
+            keys = sorted(self.partitions.get(hash_value, {}))
+            cached = self._sorted[hash_value] = (keys, [key[0] for key in keys] if self.range_key else [])
+        return cached
+
+
+class LocalTable:
+    def __init__(self, name, hash_key, range_key=None, indexes=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.key_names = (hash_key, range_key) if range_key else (hash_key,)
+        self.items = {}
+        self.view = _IndexView(hash_key, range_key, self.key_names)
+        self.indexes = {index: _IndexView(h, r, self.key_names) for index, (h, r) in (indexes or {}).items()}
+        self._scan_order = None
+        self._segments = {}
+        self.stats = {'reads': 0, 'writes': 0, 'rcu': 0.0, 'wcu': 0.0, 'calls': {}, 'throttles': 0}
+
+    def pk(self, key):
+        try:
+            return tuple(key[name] for name in self.key_names)
+        except KeyError as e:
+            raise ClientError('ValidationException', f'缺少主键属性：{e.args[0]}')
+
+    def key_of(self, item):
+        return {name: item[name] for name in self.key_names}
+
+    def index_key_of(self, item, view):
+        key = self.key_of(item)
+        key[view.hash_key] = item[view.hash_key]
+        if view.range_key:
+            key[view.range_key] = item[view.range_key]
+        return key
+
+    def store(self, item):
+        pk = self.pk(item)
+        old = self.items.get(pk)
+        if old is not None:
+            self._unindex(old, pk)
+        else:
+            self._scan_order = None
+            self._segments.clear()
+        self.items[pk] = item
+        self.view.add(item, pk)
+        for view in self.indexes.values():
+            view.add(item, pk)
+        return old
+
+    def delete(self, pk):
+        old = self.items.pop(pk, None)
+        if old is not None:
+            self._unindex(old, pk)
+            self._scan_order = None
+            self._segments.clear()
+        return old
+
+    def _unindex(self, item, pk):
+        self.view.remove(item, pk)
+        for view in self.indexes.values():
+            view.remove(item, pk)
+
+    def scan_segment(self, segment, total):
+        if self._scan_order is None:
+            self._scan_order = list(self.items)
+        cached = self._segments.get(total)
+        if cached is None:
+            buckets = [[] for _ in range(total)]
+            for pk in self._scan_order:
+                buckets[zlib.crc32(repr(pk).encode('utf-8')) % total].append(pk)
+            cached = self._segments[total] = [(keys, {pk: i for i, pk in enumerate(keys)}) for keys in buckets]
+        return cached[segment]
+
+
+def _units(size, unit):
+    return max(1, math.ceil(size / unit))
+
+
+class LocalDynamoDB:
+    """resource风格的入口：Table(name)、batch_get_item，以及meta.client（低层客户端）"""
+
+    def __init__(self, schemas=None, limiter=None):
+        self.tables = {}
+        self.lock = threading.RLock()
+        # limiter(表名, 'read'|'write', 容量单位)：返回False时按限流处理（模拟预置容量不足）
+        self.limiter = limiter
+        self.meta = _Meta(LocalClient(self))
+        for name, (hash_key, range_key, indexes) in (schemas or DEFAULT_SCHEMAS).items():
+            self.create_table(name, hash_key, range_key, indexes)
+
+    def create_table(self, name, hash_key, range_key=None, indexes=None):
+        self.tables[name] = LocalTable(name, hash_key, range_key, indexes)
+        return self.Table(name)
+
+    def Table(self, name):
+        return TableResource(self, name)
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            raise ClientError('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found')
+        return table
+
+    # -------- 统计
+
+    def _account(self, table, operation, read_items=0, write_items=0, rcu=0.0, wcu=0.0, calls=1):
+        stats = table.stats
+        if self.limiter is not None:
+            # 与真实服务一致：被限流的请求不读写数据、不计读写条数与容量，只计限流次数
+            for kind, units in (('read', rcu), ('write', wcu)):
+                if units and not self.limiter(table.name, kind, units):
+                    stats['throttles'] += 1
+                    raise ClientError('ProvisionedThroughputExceededException',
+                                      f"{table.name}{'读取' if kind == 'read' else '写入'}容量不足")
+        stats['reads'] += read_items
+        stats['writes'] += write_items
+        stats['rcu'] += rcu
+        stats['wcu'] += wcu
+        stats['calls'][operation] = stats['calls'].get(operation, 0) + calls
+
+    def stats(self):
+        """各表累计的读写条数、容量单位与调用次数"""
+        with self.lock:
+            return {name: {'reads': t.stats['reads'], 'writes': t.stats['writes'],
+                           'rcu': round(t.stats['rcu'], 2), 'wcu': round(t.stats['wcu'], 2),
+                           'calls': dict(t.stats['calls']), 'throttles': t.stats['throttles'],
+                           'items': len(t.items)}
+                    for name, t in self.tables.items()}
+
+    def reset_stats(self):
+        with self.lock:
+            for table in self.tables.values():
+                table.stats = {'reads': 0, 'writes': 0, 'rcu': 0.0, 'wcu': 0.0, 'calls': {}, 'throttles': 0}
+
+    def load(self, table_name, items):
+        """直接装载数据（不计入统计），用于准备基准数据集"""
+        with self.lock:
+            table = self.table(table_name)
+            for item in items:
+                table.store(_normalize(item))
+
+    # -------- 单条操作（Python原生值）
+
+    def get_item(self, table_name, key, projection=None, consistent=False, operation='GetItem', calls=1):
+        with self.lock:
+            table = self.table(table_name)
+            item = table.items.get(table.pk(key))
+            size = item_size(item) if item else 0
+            rcu = _units(size, READ_UNIT) * (1 if consistent else 0.5)
+            self._account(table, operation, read_items=1 if item else 0, rcu=rcu, calls=calls)
+            return (_project(item, projection) if item else None), {'TableName': table_name, 'CapacityUnits': rcu}
+
+    def put_item(self, table_name, item, condition=None, operation='PutItem', calls=1):
+        with self.lock:
+            table = self.table(table_name)
+            pk = table.pk(item)
+            old = table.items.get(pk)
+            wcu = _units(max(item_size(item), item_size(old) if old else 0), WRITE_UNIT)
+            if condition is not None and not condition.evaluate(old or {}):
+                self._account(table, operation, wcu=wcu, calls=calls)
+                raise ConditionalCheckFailedException()
+            self._account(table, operation, write_items=1, wcu=wcu, calls=calls)
+            table.store(_normalize(item))
+            return old, {'TableName': table_name, 'CapacityUnits': wcu}
+
+    def update_item(self, table_name, key, expression, names=None, values=None, condition=None):
+        with self.lock:
+            table = self.table(table_name)
+            pk = table.pk(key)
+            old = table.items.get(pk)
+            if condition is not None and not condition.evaluate(old or {}):
+                self._account(table, 'UpdateItem', wcu=_units(item_size(old) if old else 0, WRITE_UNIT))
+                raise ConditionalCheckFailedException()
+            new = _normalize(apply_update(_copy(old) if old else dict(key), expression, names, values))
+            if table.pk(new) != pk:
+                raise ClientError('ValidationException', '不能更新主键属性')
+            wcu = _units(max(item_size(new), item_size(old) if old else 0), WRITE_UNIT)
+            self._account(table, 'UpdateItem', write_items=1, wcu=wcu)
+            table.store(new)
+            return old, new, {'TableName': table_name, 'CapacityUnits': wcu}
+
+    def delete_item(self, table_name, key, condition=None, operation='DeleteItem', calls=1):
+        with self.lock:
+            table = self.table(table_name)
+            pk = table.pk(key)
+            old = table.items.get(pk)
+            wcu = _units(item_size(old) if old else 0, WRITE_UNIT)
+            if condition is not None and not condition.evaluate(old or {}):
+                self._account(table, operation, wcu=wcu, calls=calls)
+                raise ConditionalCheckFailedException()
+            self._account(table, operation, write_items=1 if old else 0, wcu=wcu, calls=calls)
+            table.delete(pk)
+            return old, {'TableName': table_name, 'CapacityUnits': wcu}
+
+    # -------- Query / Scan
+
+    def query(self, table_name, key_condition, index_name=None, filter_condition=None, projection=None,
+              limit=None, start_key=None, forward=True, consistent=False, select=None):
+        with self.lock:
+            table = self.table(table_name)
+            view = table.view if not index_name else table.indexes.get(index_name)
+            if view is None:
+                raise ClientError('ValidationException', f'表{table_name}没有索引{index_name}')
+            hash_value, range_part = _plan_key_condition(key_condition, view)
+            keys, range_values = view.sorted_partition(hash_value)
+
+            lo, hi = 0, len(keys)
+            if range_part:
+                lo, hi = _range_bounds(range_part, range_values)
+            if start_key:
+                position = view.sort_tuple(start_key, table.pk(start_key))
+                if forward:
+                    lo = max(lo, bisect_right(keys, position))
+                else:
+                    hi = min(hi, bisect_left(keys, position))
+            indexes = range(lo, hi) if forward else range(hi - 1, lo - 1, -1)
+
+            items, evaluated, size, last = [], 0, 0, None
+            partition = view.partitions.get(hash_value, {})
+            for i in indexes:
+                if (limit is not None and evaluated >= limit) or size >= PAGE_BYTES:
+                    break
+                item = table.items[partition[keys[i]]]
+                evaluated += 1
+                size += item_size(item)
+                last = item
+                if filter_condition is None or filter_condition.evaluate(item):
+                    items.append(item)
+            more = evaluated < hi - lo
+            rcu = _units(size, READ_UNIT) * (1 if consistent else 0.5) if size else 0.5
+            self._account(table, 'Query', read_items=evaluated, rcu=rcu)
+            result = {
+                'Items': [] if select == 'COUNT' else [_project(item, projection) for item in items],
+                'Count': len(items),
+                'ScannedCount': evaluated
+            }
+            if more and last is not None:
+                result['LastEvaluatedKey'] = table.index_key_of(last, view) if index_name else table.key_of(last)
+            return result, {'TableName': table_name, 'CapacityUnits': rcu}
+
+    def scan(self, table_name, index_name=None, filter_condition=None, projection=None, limit=None,
+             start_key=None, segment=0, total_segments=1, consistent=False, select=None):
+        with self.lock:
+            table = self.table(table_name)
+            if index_name:
+                raise ClientError('ValidationException', '替身不支持扫描索引')
+            keys, positions = table.scan_segment(segment, total_segments)
+            start = positions[table.pk(start_key)] + 1 if start_key else 0
+            stop = len(keys) if limit is None else min(len(keys), start + limit)
+            items, size, end = [], 0, start
+            while end < stop and size < PAGE_BYTES:
+                item = table.items[keys[end]]
+                end += 1
+                size += item_size(item)
+                if filter_condition is None or filter_condition.evaluate(item):
+                    items.append(item)
+            evaluated = end - start
+            rcu = _units(size, READ_UNIT) * (1 if consistent else 0.5) if size else 0.5
+            self._account(table, 'Scan', read_items=evaluated, rcu=rcu)
+            result = {
+                'Items': [] if select == 'COUNT' else [_project(item, projection) for item in items],
+                'Count': len(items),
+                'ScannedCount': evaluated
+            }
+            if end < len(keys):
+                result['LastEvaluatedKey'] = table.key_of(table.items[keys[end - 1]])
+            return result, {'TableName': table_name, 'CapacityUnits': rcu}
+
+    # -------- resource级批量读取
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None):
+        if sum(len(request['Keys']) for request in RequestItems.values()) > 100:
+            raise ClientError('ValidationException', 'BatchGetItem单次最多100个键')
+        responses, consumed = {}, []
+        for table_name, request in RequestItems.items():
+            projection = parse_projection(request.get('ProjectionExpression'), request.get('ExpressionAttributeNames'))
+            found = []
+            rcu = 0.0
+            # 每张表计一次BatchGetItem调用，读取条数与容量逐键累加
+            for i, key in enumerate(request['Keys']):
+                item, capacity = self.get_item(table_name, key, projection, request.get('ConsistentRead', False),
+                                               'BatchGetItem', int(i == 0))
+                rcu += capacity['CapacityUnits']
+                if item is not None:
+                    found.append(item)
+            responses[table_name] = found
+            consumed.append({'TableName': table_name, 'CapacityUnits': rcu})
+        result = {'Responses': responses, 'UnprocessedKeys': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            result['ConsumedCapacity'] = consumed
+        return result
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+def _copy(item):
+    copied = {}
+    for name, value in item.items():
+        if isinstance(value, dict):
+            value = _copy(value)
+        elif isinstance(value, list):
+            value = list(value)
+        elif isinstance(value, (set, frozenset)):
+            value = set(value)
+        copied[name] = value
+    return copied
+
+
+def _flatten_and(node):
+    if isinstance(node, _Logical) and node.op == 'AND':
+        return _flatten_and(node.left) + _flatten_and(node.right)
+    return [node]
+
+
+def _plan_key_condition(condition, view):
+    """从键条件中取出分区键等值条件和排序键条件"""
+    hash_value, range_part = _MISSING, None
+    for part in _flatten_and(condition):
+        key_part = part.key_part() if isinstance(part, _Comparison) else None
+        if key_part is None:
+            raise ClientError('ValidationException', '不支持的键条件')
+        name, op, values = key_part
+        if name == view.hash_key and op == '=':
+            hash_value = values[0]
+        elif name == view.range_key:
+            range_part = (op, values)
+        else:
+            raise ClientError('ValidationException', f'键条件中的{name}不是索引键')
+    if hash_value is _MISSING:
+        raise ClientError('ValidationException', '键条件缺少分区键等值条件')
+    return hash_value, range_part
+
+
+def _range_bounds(range_part, values):
+    op, args = range_part
+    try:
+        if op == '=':
+            return bisect_left(values, args[0]), bisect_right(values, args[0])
+        if op == '<':
+            return 0, bisect_left(values, args[0])
+        if op == '<=':
+            return 0, bisect_right(values, args[0])
+        if op == '>':
+            return bisect_right(values, args[0]), len(values)
+        if op == '>=':
+            return bisect_left(values, args[0]), len(values)
+        if op == 'BETWEEN':
+            return bisect_left(values, args[0]), bisect_right(values, args[1])
+        if op == 'begins_with':
+            lo = bisect_left(values, args[0])
+            hi = lo
+            while hi < len(values) and values[hi].startswith(args[0]):
+                hi += 1
+            return lo, hi
+    except TypeError:
+        return 0, 0
+    raise ClientError('ValidationException', f'排序键不支持运算{op}')
+
+
+def _with_capacity(result, consumed, kwargs):
+    if kwargs.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+        result['ConsumedCapacity'] = consumed
+    return result
+
+
+def _return_values(kwargs, old, new=None):
+    mode = kwargs.get('ReturnValues', 'NONE')
+    if mode == 'ALL_OLD' and old:
+        return {'Attributes': dict(old)}
+    if mode == 'ALL_NEW' and new:
+        return {'Attributes': dict(new)}
+    if mode in ('UPDATED_NEW', 'UPDATED_OLD') and new:
+        source = new if mode == 'UPDATED_NEW' else (old or {})
+        changed = {k: v for k, v in source.items() if (old or {}).get(k, _MISSING) != new.get(k, _MISSING)}
+        return {'Attributes': changed} if changed else {}
+    return {}
+
+
+class TableResource:
+    """resource风格的Table：参数与返回值均为Python原生值"""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.table_name = name
+        self.meta = db.meta
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False, **kwargs):
+        item, consumed = self.db.get_item(self.name, Key, parse_projection(ProjectionExpression, ExpressionAttributeNames),
+                                          ConsistentRead)
+        result = {'Item': item} if item is not None else {}
+        return _with_capacity(result, consumed, kwargs)
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        condition = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        old, consumed = self.db.put_item(self.name, Item, condition)
+        return _with_capacity(_return_values(kwargs, old), consumed, kwargs)
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        condition = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        old, new, consumed = self.db.update_item(self.name, Key, UpdateExpression, ExpressionAttributeNames,
+                                                 ExpressionAttributeValues, condition)
+        return _with_capacity(_return_values(kwargs, old, new), consumed, kwargs)
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        condition = parse_condition(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        old, consumed = self.db.delete_item(self.name, Key, condition)
+        return _with_capacity(_return_values(kwargs, old), consumed, kwargs)
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None,
+              ScanIndexForward=True, ConsistentRead=False, Select=None, **kwargs):
+        result, consumed = self.db.query(
+            self.name,
+            parse_condition(KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues),
+            IndexName,
+            parse_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues),
+            parse_projection(ProjectionExpression, ExpressionAttributeNames),
+            Limit, ExclusiveStartKey, ScanIndexForward, ConsistentRead, Select)
+        return _with_capacity(result, consumed, kwargs)
+
+    def scan(self, FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, Limit=None, ExclusiveStartKey=None, Segment=0, TotalSegments=1,
+             IndexName=None, ConsistentRead=False, Select=None, **kwargs):
+        result, consumed = self.db.scan(
+            self.name, IndexName,
+            parse_condition(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues),
+            parse_projection(ProjectionExpression, ExpressionAttributeNames),
+            Limit, ExclusiveStartKey, Segment, TotalSegments, ConsistentRead, Select)
+        return _with_capacity(result, consumed, kwargs)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self)
+
+
+class _BatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.delete_item(Key=Key)
+
+
+class LocalClient:
+    """低层客户端：参数与返回值为带类型的AttributeValue（{'S': ...}等）"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def _values(kwargs):
+        values = kwargs.get('ExpressionAttributeValues')
+        return {k: _deserializer.deserialize(v) for k, v in values.items()} if values else None
+
+    def _table(self, kwargs):
+        return TableResource(self.db, kwargs.pop('TableName'))
+
+    def _call(self, method, kwargs, typed_keys=('Key', 'Item', 'ExclusiveStartKey')):
+        kwargs = dict(kwargs)
+        table = self._table(kwargs)
+        for name in typed_keys:
+            if name in kwargs:
+                kwargs[name] = _de_item(kwargs[name])
+        if 'ExpressionAttributeValues' in kwargs:
+            kwargs['ExpressionAttributeValues'] = self._values(kwargs)
+        result = getattr(table, method)(**kwargs)
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in result:
+                result[name] = _ser_item(result[name])
+        if 'Items' in result:
+            result['Items'] = [_ser_item(item) for item in result['Items']]
+        return result
+
+    def get_item(self, **kwargs):
+        return self._call('get_item', kwargs)
+
+    def put_item(self, **kwargs):
+        return self._call('put_item', kwargs)
+
+    def update_item(self, **kwargs):
+        return self._call('update_item', kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._call('delete_item', kwargs)
+
+    def query(self, **kwargs):
+        return self._call('query', kwargs)
+
+    def scan(self, **kwargs):
+        return self._call('scan', kwargs)
+
+    def batch_get_item(self, RequestItems, ReturnConsumedCapacity=None):
+        native = {name: dict(request, Keys=[_de_item(key) for key in request['Keys']])
+                  for name, request in RequestItems.items()}
+        result = self.db.batch_get_item(native, ReturnConsumedCapacity)
+        result['Responses'] = {name: [_ser_item(item) for item in items]
+                               for name, items in result['Responses'].items()}
+        return result
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None):
+        consumed = []
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ClientError('ValidationException', 'BatchWriteItem单次最多25条')
+            wcu = 0.0
+            for i, request in enumerate(requests):
+                if 'PutRequest' in request:
+                    _, capacity = self.db.put_item(table_name, _de_item(request['PutRequest']['Item']),
+                                                   operation='BatchWriteItem', calls=int(i == 0))
+                else:
+                    _, capacity = self.db.delete_item(table_name, _de_item(request['DeleteRequest']['Key']),
+                                                      operation='BatchWriteItem', calls=int(i == 0))
+                wcu += capacity['CapacityUnits']
+            consumed.append({'TableName': table_name, 'CapacityUnits': wcu})
+        result = {'UnprocessedItems': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            result['ConsumedCapacity'] = consumed
+        return result
+
+    def transact_write_items(self, TransactItems, ReturnConsumedCapacity=None):
+        """全部条件都满足才执行；否则抛出TransactionCanceledException，CancellationReasons与请求一一对应"""
+        if len(TransactItems) > 100:
+            raise ClientError('ValidationException', 'TransactWriteItems单次最多100个操作')
+        actions = []
+        for entry in TransactItems:
+            (kind, request), = entry.items()
+            request = dict(request)
+            names = request.get('ExpressionAttributeNames')
+            values = self._values(request)
+            condition = parse_condition(request.get('ConditionExpression'), names, values)
+            actions.append((kind, request, names, values, condition))
+
+        with self.db.lock:
+            reasons = []
+            for kind, request, names, values, condition in actions:
+                table = self.db.table(request['TableName'])
+                key = _de_item(request['Item'] if kind == 'Put' else request['Key'])
+                current = table.items.get(table.pk(key))
+                ok = condition is None or condition.evaluate(current or {})
+                reasons.append({'Code': 'None'} if ok else {'Code': 'ConditionalCheckFailed',
+                                                           'Message': 'The conditional request failed'})
+            if any(reason['Code'] != 'None' for reason in reasons):
+                error = ClientError('TransactionCanceledException', 'Transaction cancelled')
+                error.response['CancellationReasons'] = reasons
+                raise error
+
+            consumed = {}
+            for i, (kind, request, names, values, _) in enumerate(actions):
+                table_name = request['TableName']
+                calls = int(table_name not in consumed)
+                if kind == 'Put':
+                    _, capacity = self.db.put_item(table_name, _de_item(request['Item']),
+                                                   operation='TransactWriteItems', calls=calls)
+                elif kind == 'Delete':
+                    _, capacity = self.db.delete_item(table_name, _de_item(request['Key']),
+                                                      operation='TransactWriteItems', calls=calls)
+                elif kind == 'Update':
+                    *_, capacity = self.db.update_item(table_name, _de_item(request['Key']),
+                                                       request['UpdateExpression'], names, values)
+                else:
+                    continue  # ConditionCheck只校验不写入
+                consumed[table_name] = consumed.get(table_name, 0.0) + capacity['CapacityUnits']
+        result = {}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            # 事务写入消耗两倍的写入容量
+            result['ConsumedCapacity'] = [{'TableName': name, 'CapacityUnits': units * 2}
+                                          for name, units in consumed.items()]
+        return result
+
+
+# ---------------------------------------------------------------- 容量限流与客户端重试（压测用）
+
+class CapacityLimiter:
+    """按表的预置容量限流（令牌桶）：每秒补充read/write个容量单位，最多积累burst_seconds秒的容量
+
+    read_units/write_units为所有表共用的数值，或{表名: 数值}（未列出的表不限流）。
+    作为LocalDynamoDB(limiter=...)传入；在替身的锁内调用，本身不等待。
+    """
+
+    def __init__(self, read_units=None, write_units=None, burst_seconds=1.0, clock=time.monotonic):
+        self.clock = clock
+        self.burst_seconds = burst_seconds
+        self.rates = {'read': read_units, 'write': write_units}
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def rate(self, table_name, kind):
+        rate = self.rates[kind]
+        return rate.get(table_name) if isinstance(rate, dict) else rate
+
+    def __call__(self, table_name, kind, units):
+        rate = self.rate(table_name, kind)
+        if not rate:
+            return True
+        with self._lock:
+            now = self.clock()
+            capacity = rate * self.burst_seconds
+            tokens, updated = self.buckets.get((table_name, kind), (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= units or tokens >= capacity  # 大于桶容量的单次请求在桶满时放行
+            self.buckets[(table_name, kind)] = (tokens - units if allowed else tokens, now)
+            return allowed
+
+
+class SdkRetries:
+    """包装替身的resource/Table/client，模拟botocore对限流错误的重试（指数退避 + 全抖动）
+
+    max_attempts与AwsRuntime.MAX_ATTEMPTS含义一致（含首次调用）；retries、exhausted为累计的
+    重试次数与重试耗尽后仍失败的次数。用AwsRuntime.install_dynamodb(SdkRetries(db), ...)安装。
+    """
+
+    THROTTLE_CODES = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+    def __init__(self, target, max_attempts=5, base_delay=0.025, max_delay=20.0, parent=None):
+        self._target = target
+        self._root = parent._root if parent is not None else self
+        if parent is None:
+            self.max_attempts = max_attempts
+            self.base_delay = base_delay
+            self.max_delay = max_delay
+            self.retries = 0
+            self.exhausted = 0
+            self._sleep = time.sleep
+            self._lock = threading.Lock()
+
+    def _wrap(self, target):
+        return SdkRetries(target, parent=self)
+
+    def _count(self, name):
+        root = self._root
+        with root._lock:
+            setattr(root, name, getattr(root, name) + 1)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name in ('meta', 'client'):
+            return self._wrap(value)
+        if name.startswith('_') or not callable(value):
+            return value
+        if name == 'Table':
+            return lambda *args, **kwargs: self._wrap(value(*args, **kwargs))
+        return self._retrying(value)
+
+    def _retrying(self, method):
+        root = self._root
+
+        def call(*args, **kwargs):
+            attempt = 1
+            while True:
+                try:
+                    return method(*args, **kwargs)
+                except ClientError as e:
+                    if e.response['Error']['Code'] not in self.THROTTLE_CODES:
+                        raise
+                    if attempt >= root.max_attempts:
+                        self._count('exhausted')
+                        raise
+                    self._count('retries')
+                    root._sleep(random.random() * min(root.max_delay, root.base_delay * 2 ** attempt))
+                    attempt += 1
+        return call
+
+    def retry_stats(self):
+        root = self._root
+        return {'retries': root.retries, 'exhausted': root.exhausted}
+
+    def reset_retry_stats(self):
+        root = self._root
+        with root._lock:
+            root.retries = root.exhausted = 0
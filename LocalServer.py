@@ -0,0 +1,348 @@
+"""本地HTTP服务器：用asyncio承载Router，在LocalDynamoDB替身上运行全部接口（离线调试、整机压测与性能剖析）
+
+请求被转换为API Gateway代理集成事件（httpMethod/path/headers/queryStringParameters/body），
+Cognito授权信息来自：Authorization中的JWT载荷（本地不验签）> X-Dev-User请求头 > --user默认用户。
+处理函数是同步代码，在线程池中执行（--workers控制并发）；--inline时直接在事件循环线程中执行，
+便于 python -m cProfile LocalServer.py --inline 剖析完整调用链。
+导入任务与视图发布的队列（TASK_QUEUE_URL=local://）在每次请求后于后台排空，对象存储默认写入本地目录；
+启动时装载数据后全量发布一次学生成绩视图。
+--rcu/--wcu按表模拟预置容量（令牌桶限流 + 客户端重试）；GET /_local/stats返回各表读写、限流与重试统计。
+
+用法：python LocalServer.py [--port 8080] [--scale 1k|100k|<成绩条数>] [--user 20230000000] [--cors-origin *]
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+logger = logging.getLogger()
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+MAX_HEADER_LINES = 100
+# 视为文本的Content-Type，其余请求体按二进制以base64传入（与API Gateway二进制媒体类型一致）
+TEXT_TYPES = ('text/', 'application/json', 'application/x-www-form-urlencoded')
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def jwt_claims(token):
+    """解析JWT载荷（不验签，仅用于本地调试）；不是JWT时返回None"""
+    parts = token.split('.')
+    if len(parts) != 3:
+        return None
+    payload = parts[1] + '=' * (-len(parts[1]) % 4)
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (binascii.Error, ValueError):
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def request_claims(headers, default_user):
+    authorization = headers.get('authorization', '')
+    token = authorization[7:] if authorization.lower().startswith('bearer ') else authorization
+    claims = jwt_claims(token.strip()) if token else None
+    if claims:
+        claims.setdefault('cognito:username', claims.get('username') or claims.get('sub'))
+        return claims
+    user = headers.get('x-dev-user') or default_user
+    return {'cognito:username': user} if user else None
+
+
+def build_event(method, target, headers, body, default_user, stage='local'):
+    """把HTTP请求转换为API Gateway（REST API，代理集成）事件"""
+    url = urlsplit(target)
+    query = {}
+    multi_query = {}
+    for name, value in parse_qsl(url.query, keep_blank_values=True):
+        query[name] = value
+        multi_query.setdefault(name, []).append(value)
+    content_type = headers.get('content-type', '').lower()
+    is_text = not body or content_type.startswith(TEXT_TYPES)
+    request_context = {'stage': stage, 'httpMethod': method, 'requestTimeEpoch': int(time.time() * 1000)}
+    claims = request_claims(headers, default_user)
+    if claims:
+        request_context['authorizer'] = {'claims': claims}
+    return {
+        'httpMethod': method,
+        'path': unquote(url.path),
+        'resource': '/{proxy+}',
+        'headers': headers,
+        'queryStringParameters': query or None,
+        'multiValueQueryStringParameters': multi_query or None,
+        'pathParameters': None,
+        'requestContext': request_context,
+        'body': (body.decode('utf-8') if is_text else base64.b64encode(body).decode('ascii')) if body else None,
+        'isBase64Encoded': not is_text
+    }
+
+
+async def read_request(reader):
+    """读取一个HTTP/1.1请求；连接关闭时返回None"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode('utf-8', 'replace').split()
+    except ValueError:
+        raise BadRequest(400, '请求行格式错误')
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        # 请求头名统一小写（与API Gateway HTTP API一致；处理函数按大小写不敏感读取）
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise BadRequest(431, '请求头过多')
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise BadRequest(411, '不支持分块传输的请求体，请提供Content-Length')
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise BadRequest(400, 'Content-Length格式错误')
+    if length > MAX_BODY_BYTES:
+        raise BadRequest(413, '请求体过大')
+    body = await reader.readexactly(length) if length else b''
+    keep_alive = (headers.get('connection', '').lower() != 'close') if version == 'HTTP/1.1' \
+        else headers.get('connection', '').lower() == 'keep-alive'
+    return method.upper(), target, headers, body, keep_alive
+
+
+def encode_response(response, keep_alive):
+    status = int(response.get('statusCode') or 200)
+    body = response.get('body') or ''
+    data = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ''
+    lines = [f'HTTP/1.1 {status} {reason}']
+    headers = dict(response.get('headers') or {})
+    headers['Content-Length'] = str(len(data))
+    headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+    for name, value in headers.items():
+        lines.append(f'{name}: {value}')
+    for name, values in (response.get('multiValueHeaders') or {}).items():
+        lines.extend(f'{name}: {value}' for value in values)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + data
+
+
+class LocalServer:
+    def __init__(self, handler, default_user=None, workers=32, inline=False, drain_queue=None, backend=None):
+        self.handler = handler
+        self.backend = backend
+        self.default_user = default_user
+        self.inline = inline
+        self.executor = None if inline else ThreadPoolExecutor(max_workers=workers,
+                                                               thread_name_prefix='handler')
+        self.drain_queue = drain_queue
+        self._draining = None
+        self.requests = 0
+
+    async def local_endpoint(self, method, path):
+        """/_local/stats：各表读写与限流统计、客户端重试次数；POST /_local/reset清零；
+        POST /_local/drain等待队列消息（导入任务、视图发布）全部处理完（压测工具使用）"""
+        if path == '/_local/drain' and method == 'POST':
+            await self.drain_now()
+            return {'statusCode': 204, 'body': ''}
+        if self.backend is None:
+            return {'statusCode': 404, 'body': json.dumps({'message': '未安装本地替身'})}
+        db, resource = self.backend
+        if path == '/_local/reset' and method == 'POST':
+            db.reset_stats()
+            resource.reset_retry_stats()
+            self.requests = 0
+            return {'statusCode': 204, 'body': ''}
+        if path == '/_local/stats' and method == 'GET':
+            payload = {'tables': db.stats(), 'sdk': resource.retry_stats(), 'requests': self.requests}
+            return {'statusCode': 200, 'headers': {'Content-Type': 'application/json; charset=utf-8'},
+                    'body': json.dumps(payload, ensure_ascii=False)}
+        return {'statusCode': 404, 'body': json.dumps({'message': f'未知的本地接口：{path}'})}
+
+    async def invoke(self, event):
+        if self.inline:
+            return self.handler(event, None)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.handler, event, None)
+
+    def _schedule_drain(self):
+        # 导入任务的队列消息在后台处理，不阻塞当前响应；同一时刻只有一个排空任务
+        if self.drain_queue is None or (self._draining and not self._draining.done()):
+            return
+        loop = asyncio.get_running_loop()
+        self._draining = loop.run_in_executor(self.executor, self.drain_queue)
+
+    async def drain_now(self):
+        if self.drain_queue is None:
+            return
+        if self._draining is not None:
+            await self._draining
+        if self.inline:
+            self.drain_queue()
+        else:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.drain_queue)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    writer.write(encode_response({'statusCode': e.status,
+                                                  'body': json.dumps({'message': str(e)})}, False))
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                started = time.perf_counter()
+                if target.startswith('/_local/'):
+                    writer.write(encode_response(await self.local_endpoint(method, urlsplit(target).path), keep_alive))
+                    await writer.drain()
+                    if not keep_alive:
+                        break
+                    continue
+                event = build_event(method, target, headers, body, self.default_user)
+                try:
+                    response = await self.invoke(event)
+                except Exception as e:
+                    logger.error(f"处理请求失败：{method} {target}：{str(e)}", exc_info=True)
+                    response = {'statusCode': 500, 'body': json.dumps({'message': str(e)})}
+                self.requests += 1
+                writer.write(encode_response(response, keep_alive))
+                await writer.drain()
+                logger.info(f"{method} {target} -> {response.get('statusCode')} "
+                            f"{(time.perf_counter() - started) * 1000:.1f}ms")
+                if method != 'GET':
+                    self._schedule_drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=1024 * 1024)
+        if ready is not None:
+            ready(server)
+        async with server:
+            await server.serve_forever()
+
+
+def parse_capacity(value):
+    """容量参数：'1000'（每张表）或'Grades=500,StudentInfo=200'；空值表示不限流"""
+    if not value:
+        return None
+    if '=' not in value:
+        return float(value)
+    units = {}
+    for part in value.split(','):
+        table, _, amount = part.partition('=')
+        units[table.strip()] = float(amount)
+    return units
+
+
+def install_local_backend(scale=None, read_units=None, write_units=None, burst_seconds=1.0, max_attempts=None):
+    """安装LocalDynamoDB替身，按需装载合成数据（benchmarks/synthetic_data），返回(替身, 重试包装)
+
+    指定read_units/write_units时按表限流（装载数据与重算统计不受限），并用SdkRetries模拟
+    客户端的限流重试（默认次数同AwsRuntime.MAX_ATTEMPTS）。
+    """
+    import AwsRuntime
+    import LocalDynamoDB
+    db = LocalDynamoDB.LocalDynamoDB()
+    resource = LocalDynamoDB.SdkRetries(db, max_attempts=max_attempts or AwsRuntime.MAX_ATTEMPTS)
+    AwsRuntime.install_dynamodb(resource, conditions=LocalDynamoDB, types=LocalDynamoDB)
+    if scale:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+        import PeriodWindow
+        from synthetic_data import Dataset, parse_scale
+        dataset = Dataset(parse_scale(scale))
+        dataset.seed_into(db)
+        dataset.register_courses(PeriodWindow.COURSE_ID_MAP)
+        import GradeStats
+        GradeStats.rebuild_stats()
+        import GradeViews
+        GradeViews.publish_all()
+    if read_units or write_units:
+        db.limiter = LocalDynamoDB.CapacityLimiter(read_units, write_units, burst_seconds)
+    return db, resource
+
+
+def local_queue_drainer():
+    """TASK_QUEUE_URL为local://时返回排空进程内队列（导入任务、视图发布）的函数，否则返回None（由SQS触发worker）"""
+    import TaskQueue
+    if not isinstance(TaskQueue.get_task_queue(), TaskQueue.LocalQueue):
+        return None
+    import GradeViews
+    import Router
+    TaskQueue.get_task_queue(GradeViews.PUBLISH_QUEUE_URL)
+
+    def drain():
+        # 处理消息时可能产生新的消息（导入一块成绩后请求发布视图），直到所有队列都为空
+        while sum(queue.drain(Router.dispatch_records) for queue in TaskQueue.local_queues().values()):
+            pass
+    return drain
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--scale', default='1k', help='合成数据规模（1k、100k、1M或成绩条数；0为空库）')
+    parser.add_argument('--user', default='20230000000', help='请求未携带身份时使用的学号/工号')
+    parser.add_argument('--workers', type=int, default=32, help='执行处理函数的线程数')
+    parser.add_argument('--inline', action='store_true', help='在事件循环线程中直接执行处理函数（便于剖析）')
+    parser.add_argument('--cors-origin', default=None, help='覆盖CORS允许的域名（如*或http://localhost:8000）')
+    parser.add_argument('--quiet', action='store_true', help='不输出每个请求的日志')
+    parser.add_argument('--rcu', default=None, help='模拟预置读取容量（每秒，如1000或Grades=500,StudentInfo=200）')
+    parser.add_argument('--wcu', default=None, help='模拟预置写入容量（格式同--rcu）')
+    parser.add_argument('--burst', type=float, default=1.0, help='令牌桶最多积累的秒数')
+    args = parser.parse_args(argv)
+
+    # 须在导入处理函数模块之前设置（模块导入时读取）
+    if args.cors_origin:
+        os.environ['CORS_ALLOW_ORIGIN'] = args.cors_origin
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    # 各处理函数模块导入时会把根日志器设为INFO，因此级别设在输出handler上
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(logging.WARNING if args.quiet else logging.INFO)
+
+    started = time.perf_counter()
+    db, resource = install_local_backend(None if args.scale in ('', '0') else args.scale,
+                                         parse_capacity(args.rcu), parse_capacity(args.wcu), args.burst)
+    import Router
+    server = LocalServer(Router.lambda_handler, default_user=args.user, workers=args.workers,
+                         inline=args.inline, drain_queue=local_queue_drainer(), backend=(db, resource))
+    loaded = {name: table['items'] for name, table in db.stats().items() if table['items']}
+
+    def ready(srv):
+        address = srv.sockets[0].getsockname()
+        print(f"本地服务已启动：http://{address[0]}:{address[1]} （装载{time.perf_counter() - started:.1f}秒，{loaded}）",
+              flush=True)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import base64
+import binascii
+import csv
+import io
+import re
+
+# multipart/form-data流式解析：只在解码后的请求体上记录偏移量，文件内容以memoryview切片逐行产出，
+# 不做split/整体decode/StringIO等整份复制
+
+_HEADER_END = b'\r\n\r\n'
+# 每次解码的块大小（按换行对齐），决定逐行解析时的额外内存上限
+CHUNK_SIZE = 256 * 1024
+# base64按块解码的块大小（必须是4的倍数）
+B64_CHUNK_SIZE = 1024 * 1024
+_DISPOSITION_RE = re.compile(rb'content-disposition:[^\r\n]*?\bname="([^"]*)"(?:[^\r\n]*?\bfilename="([^"]*)")?',
+                             re.IGNORECASE)
+
+
+class FilePart:
+    """multipart中的文件字段：buffer为整个请求体，[start, end)为文件内容所在区间"""
+
+    __slots__ = ('buffer', 'start', 'end', 'filename')
+
+    def __init__(self, buffer, start, end, filename):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.filename = filename
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    @property
+    def view(self):
+        return memoryview(self.buffer)[self.start:self.end]
+
+
+def decode_body(event):
+    """取出API Gateway事件中的请求体（bytes-like）
+
+    base64请求体按块解码进bytearray，避免b64decode先把整个字符串转成ASCII bytes的额外副本。
+    """
+    body = event.get('body') or ''
+    if not event.get('isBase64Encoded', False):
+        return body.encode('utf-8')
+    if len(body) % 4:
+        return base64.b64decode(body)  # 非标准填充（含换行等），交给b64decode校验
+    step = B64_CHUNK_SIZE
+    decoded = bytearray()
+    for i in range(0, len(body), step):
+        decoded += binascii.a2b_base64(body[i:i + step])
+    return decoded
+
+
+def find_file_part(body, boundary, field_name='file'):
+    """在请求体中定位文件字段，返回FilePart；找不到时返回None
+
+    boundary为Content-Type中的boundary参数（不含前导"--"），bytes或str均可。
+    """
+    if isinstance(boundary, str):
+        boundary = boundary.encode('utf-8')
+    delimiter = b'--' + boundary
+    closing = b'\r\n' + delimiter
+
+    pos = body.find(delimiter)
+    while pos != -1:
+        header_start = pos + len(delimiter)
+        if body.startswith(b'--', header_start):
+            return None  # 结束分隔符
+        header_end = body.find(_HEADER_END, header_start)
+        if header_end == -1:
+            return None
+        content_start = header_end + len(_HEADER_END)
+        next_pos = body.find(closing, content_start)
+        if next_pos == -1:
+            return None
+
+        match = _DISPOSITION_RE.search(body, header_start, header_end)
+        if match and match.group(1).decode('utf-8', 'replace') == field_name and match.group(2) is not None:
+            return FilePart(body, content_start, next_pos, match.group(2).decode('utf-8', 'replace'))
+        pos = next_pos + 2
+    return None
+
+
+def iter_lines(part, encoding='utf-8', chunk_size=CHUNK_SIZE):
+    """逐行产出文件内容（保留行尾，与newline=''打开的文件行为一致，便于csv处理引号内的换行）
+
+    每次只解码一个以换行结尾的块（默认256KB），行切分交给C实现的StringIO。
+    """
+    buffer = part.buffer
+    view = memoryview(buffer)
+    pos, end = part.start, part.end
+    # 跳过UTF-8 BOM（Excel导出的CSV常带BOM，否则第一列表头会变成"\ufeffstudentId"）
+    if buffer.startswith(b'\xef\xbb\xbf', pos, end):
+        pos += 3
+    while pos < end:
+        stop = end
+        if pos + chunk_size < end:
+            newline = buffer.find(b'\n', pos + chunk_size, end)
+            if newline != -1:
+                stop = newline + 1
+        yield from io.StringIO(str(view[pos:stop], encoding), newline='')
+        pos = stop
+
+
+def iter_csv_rows(part):
+    """以DictReader的形式逐行产出CSV记录；fieldnames在读取第一行后可用"""
+    return csv.DictReader(iter_lines(part))
@@ -0,0 +1,87 @@
+import os
+import shutil
+from urllib.parse import urlparse
+
+# 对象存储位置：s3://bucket/prefix 写入S3；file:///path 或普通目录路径写入本地文件系统（本地调试用）
+DEFAULT_LOCATION = os.environ.get('OBJECT_STORE_LOCATION', 'file:///tmp/grade-objects')
+
+
+class S3ObjectStore:
+    """S3对象存储：upload_fileobj自动分片上传，文件不会整体读入内存"""
+
+    def __init__(self, bucket, prefix=''):
+        from AwsRuntime import get_client  # 仅在真正使用S3时加载boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.s3 = get_client('s3')
+
+    def _key(self, key):
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def put_file(self, key, fileobj, content_type='application/octet-stream'):
+        full_key = self._key(key)
+        self.s3.upload_fileobj(fileobj, self.bucket, full_key,
+                               ExtraArgs={'ContentType': content_type})
+        return f's3://{self.bucket}/{full_key}'
+
+    def put_bytes(self, key, data, content_type='application/octet-stream'):
+        full_key = self._key(key)
+        self.s3.put_object(Bucket=self.bucket, Key=full_key, Body=data, ContentType=content_type)
+        return f's3://{self.bucket}/{full_key}'
+
+    def get_bytes(self, key):
+        return self.s3.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+
+    def presign_put(self, key, content_type='application/octet-stream', expires=900):
+        """生成浏览器直传用的预签名PUT地址（文件不经过API Gateway，不受其负载大小限制）"""
+        return self.s3.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': self._key(key), 'ContentType': content_type},
+            ExpiresIn=expires)
+
+
+class LocalObjectStore:
+    """本地文件系统替身：与S3ObjectStore接口一致，便于离线测试"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f'非法的对象键：{key}')
+        return path
+
+    def put_file(self, key, fileobj, content_type='application/octet-stream'):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+        return f'file://{path}'
+
+    def put_bytes(self, key, data, content_type='application/octet-stream'):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            out.write(data)
+        return f'file://{path}'
+
+    def get_bytes(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def presign_put(self, key, content_type='application/octet-stream', expires=900):
+        return None  # 本地替身不支持直传，调用方需把文件内容随请求一起提交
+
+
+def get_object_store(location=None):
+    """按位置字符串创建对象存储（默认读取环境变量OBJECT_STORE_LOCATION）"""
+    location = location or DEFAULT_LOCATION
+    parsed = urlparse(location)
+    if parsed.scheme == 's3':
+        return S3ObjectStore(parsed.netloc, parsed.path)
+    if parsed.scheme == 'file':
+        return LocalObjectStore(parsed.path)
+    if not parsed.scheme:
+        return LocalObjectStore(location)
+    raise ValueError(f'不支持的对象存储位置：{location}')
@@ -1,28 +1,50 @@
 import json
-import boto3
-from datetime import datetime, timezone
 import logging
 
+from AwsRuntime import dynamodb, get_table
+from ChangeLog import stamp
+from GradeViews import request_publish
+from PeriodWindow import PERIOD_TABLE_NAME, get_periods, parse_period_time, period_cache
+from JsonResponse import cors_headers, dumps
+from RefCache import MISS, cache_stats
+from Telemetry import debug_log, instrumented, summarize_event
+
 # 配置日志（详细级别，便于调试）
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# 初始化DynamoDB资源（确保区域和表名与实际一致）
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-period_table = dynamodb.Table('QueryPeriods')  # 时段表（主键：gradeId，字符串类型）
+# DynamoDB资源由AwsRuntime统一创建（首次使用时初始化，区域默认ap-northeast-2）
+period_table = get_table(PERIOD_TABLE_NAME)  # 时段表（主键：gradeId，字符串类型）
 
-# CORS配置（严格匹配前端域名，避免跨域问题）
-CORS_HEADERS = {
-    'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'
-}
+# 批量查询时单次请求最多携带的gradeId数量（超过100个会自动分块调用BatchGetItem）
+MAX_BATCH_GRADE_IDS = 500
 
+# CORS配置（严格匹配前端域名，避免跨域问题）
+CORS_HEADERS = cors_headers('GET, POST, OPTIONS')
+
+def batch_get_periods(grade_ids):
+    """批量查询多个gradeId的时段（热容器缓存 + BatchGetItem），返回({gradeId: 时段}, 未找到的gradeId列表)"""
+    periods = get_periods(dynamodb, grade_ids, strict=True)
+    missing = [gid for gid in grade_ids if gid not in periods]
+    return periods, missing
+
+def get_period(grade_id):
+    """查询单个gradeId的时段，优先读热容器缓存；不存在时返回None（同样会被负缓存）"""
+    cached = period_cache.get(grade_id)
+    if cached is not MISS:
+        return cached
+    item = period_table.get_item(Key={'gradeId': grade_id}).get('Item')
+    period_cache.put(grade_id, item, version=item.get('updatedAt') if item else None)
+    return item
+
+@instrumented
 def lambda_handler(event, context):
     try:
         # 安全获取HTTP方法（避免KeyError，兼容非代理集成场景）
         http_method = event.get('httpMethod', '').upper()  # 转为大写统一处理
-        logger.info(f"收到请求：方法={http_method}，事件数据={event}")
+        # 只记录请求概要；完整事件按比例采样输出
+        logger.info(f"收到请求：{summarize_event(event)}")
+        debug_log('请求事件', event)
 
         # 1. 处理OPTIONS预检请求（跨域必选）
         if http_method == 'OPTIONS':
@@ -37,7 +59,7 @@ def lambda_handler(event, context):
             # 解析请求体（容错：body为None时默认为空JSON）
             try:
                 request_body = json.loads(event.get('body', '{}'))
-                logger.info(f"POST请求体：{request_body}")
+                debug_log('POST请求体', request_body)
             except json.JSONDecodeError as e:
                 return {
                     'statusCode': 400,
@@ -84,8 +106,9 @@ def lambda_handler(event, context):
 
             # 校验时间格式（ISO 8601：YYYY-MM-DDTHH:MM，如2025-11-08T09:00）
             try:
-                start_dt = datetime.fromisoformat(start_time).replace(tzinfo=timezone.utc)
-                end_dt = datetime.fromisoformat(end_time).replace(tzinfo=timezone.utc)
+                # 与学生端可见性判断使用同一时区解释（PeriodWindow.PERIOD_TZ，默认学校时间UTC+9）
+                start_dt = parse_period_time(start_time)
+                end_dt = parse_period_time(end_time)
                 if start_dt >= end_dt:
                     return {
                         'statusCode': 400,
@@ -103,12 +126,17 @@ def lambda_handler(event, context):
 
             # 写入DynamoDB（用gradeId作为主键）
             try:
-                period_table.put_item(Item={
+                item = {
                     'gradeId': grade_id,  # 与表主键定义一致
                     'startTime': start_time,
-                    'endTime': end_time,
-                    'updatedAt': datetime.now(timezone.utc).isoformat()  # UTC时间戳
-                })
+                    'endTime': end_time
+                }
+                stamp([item])  # 变更版本号version与UTC时间戳updatedAt（学生端增量同步据此判断时段是否变化）
+                period_table.put_item(Item=item)
+                # 写穿缓存：本容器后续读取立即看到新时段（其他容器最迟在TTL后刷新）
+                period_cache.put(grade_id, item, version=item['updatedAt'])
+                # 重建该时段涉及的学生的成绩视图（时段开始/结束时刻的翻转由定时任务预先生成）
+                request_publish(periods=[grade_id])
                 logger.info(f"时段设置成功：gradeId={grade_id}，start={start_time}，end={end_time}")
                 return {
                     'statusCode': 200,
@@ -134,6 +162,41 @@ def lambda_handler(event, context):
         elif http_method == 'GET':
             # 安全获取查询参数（兼容queryStringParameters为None的情况）
             query_params = event.get('queryStringParameters', {}) or {}
+
+            # 批量查询：gradeIds=ID1,ID2,...（学生页一次请求取回所有课程的时段）
+            if 'gradeIds' in query_params:
+                grade_ids = list(dict.fromkeys(
+                    gid.strip() for gid in (query_params.get('gradeIds') or '').split(',') if gid.strip()
+                ))
+                if not grade_ids:
+                    return {
+                        'statusCode': 400,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'message': 'gradeIds不能为空'})
+                    }
+                if len(grade_ids) > MAX_BATCH_GRADE_IDS:
+                    return {
+                        'statusCode': 400,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'message': f'单次最多查询{MAX_BATCH_GRADE_IDS}个gradeId'})
+                    }
+                try:
+                    periods, missing = batch_get_periods(grade_ids)
+                    logger.info(f"批量查询时段：请求{len(grade_ids)}个，命中{len(periods)}个，缓存统计={cache_stats()}")
+                    return {
+                        'statusCode': 200,
+                        'headers': CORS_HEADERS,
+                        # 时段项含数值型version（DynamoDB读出为Decimal），用支持Decimal的编码器序列化
+                        'body': dumps({'periods': periods, 'missing': missing})
+                    }
+                except Exception as e:
+                    logger.error(f"DynamoDB批量查询失败：{str(e)}", exc_info=True)
+                    return {
+                        'statusCode': 500,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'message': f'数据库操作失败：{str(e)}'})
+                    }
+
             grade_id = query_params.get('gradeId', '').strip()
 
             if not grade_id:
@@ -145,8 +208,8 @@ def lambda_handler(event, context):
 
             # 从DynamoDB查询
             try:
-                response = period_table.get_item(Key={'gradeId': grade_id})
-                if 'Item' not in response:
+                period = get_period(grade_id)
+                if period is None:
                     logger.info(f"未找到时段：gradeId={grade_id}")
                     return {
                         'statusCode': 404,
@@ -155,11 +218,11 @@ def lambda_handler(event, context):
                             'message': f'未找到gradeId={grade_id}的时段设置'
                         })
                     }
-                logger.info(f"查询到时段：gradeId={grade_id}，数据={response['Item']}")
+                debug_log(f'查询到时段：gradeId={grade_id}，缓存统计={cache_stats()}', period)
                 return {
                     'statusCode': 200,
                     'headers': CORS_HEADERS,
-                    'body': json.dumps(response['Item'])  # 返回完整时段数据（含startTime/endTime）
+                    'body': dumps(period)  # 返回完整时段数据（含startTime/endTime，version为Decimal）
                 }
             except Exception as e:
                 logger.error(f"DynamoDB查询失败：{str(e)}", exc_info=True)
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from DynamoBatch import batch_get_items
+from RefCache import MISS, get_cache
+
+PERIOD_TABLE_NAME = 'QueryPeriods'
+
+# 课程名→课程ID映射表（与教师端设置时段时使用的课程ID一致，QueryPeriods的gradeId前缀）
+COURSE_ID_MAP = {
+    '大学物理': 'PHY101',
+    '高等数学': 'MATH101',
+    '计算机基础': 'CS101'
+}
+
+# 时段时间为不带时区的"YYYY-MM-DDTHH:MM"（教师端datetime-local输入的学校本地时间），按此时区解释。
+# 默认UTC+9（学校时间）；此前默认UTC，开放/结束时刻会整体推迟9小时。部署在其他时区时用PERIOD_TZ_OFFSET_HOURS调整
+PERIOD_TZ = timezone(timedelta(hours=float(os.environ.get('PERIOD_TZ_OFFSET_HOURS', '9'))))
+
+# 热容器内的时段缓存（TTL见RefCache，可用CACHE_TTL_QUERYPERIODS调整）
+period_cache = get_cache(PERIOD_TABLE_NAME)
+
+
+def period_id_for(course, term):
+    """由成绩的课程名和学期生成QueryPeriods主键（如 高等数学/2023秋 → MATH101_2023年秋）"""
+    course_id = COURSE_ID_MAP.get(course)
+    if not course_id or not term:
+        return None
+    if '年' not in term:
+        term = term.replace('秋', '年秋').replace('春', '年春')
+    return f'{course_id}_{term}'
+
+
+def parse_period_time(value):
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=PERIOD_TZ)
+    return dt
+
+
+def is_within_period(period, now=None):
+    """当前时间是否在时段[startTime, endTime]内；时段缺失或格式错误时一律视为不可见"""
+    if not period:
+        return False
+    try:
+        start = parse_period_time(period['startTime'])
+        end = parse_period_time(period['endTime'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    now = now or datetime.now(timezone.utc)
+    return start <= now <= end
+
+
+def get_periods(dynamodb, grade_ids, strict=False):
+    """批量获取时段：先查热容器缓存，未命中的用BatchGetItem一次取回；返回{gradeId: 时段}
+
+    不存在的gradeId会被负缓存。strict为True时，限流重试耗尽仍未取到的键会抛出异常，
+    否则按"未设置时段"处理（调用方据此把成绩视为不可见）。
+    """
+    found = {}
+    misses = []
+    for gid in set(grade_ids):
+        cached = period_cache.get(gid)
+        if cached is MISS:
+            misses.append(gid)
+        elif cached is not None:
+            found[gid] = cached
+
+    if misses:
+        items, unprocessed = batch_get_items(dynamodb, PERIOD_TABLE_NAME,
+                                             [{'gradeId': gid} for gid in misses])
+        if unprocessed and strict:
+            raise RuntimeError(f'{len(unprocessed)}个gradeId因限流未能查询，请稍后重试')
+        fetched = {item['gradeId']: item for item in items}
+        skipped = {key['gradeId'] for key in unprocessed}
+        for gid in misses:
+            if gid in skipped:
+                continue  # 限流未取到的不缓存，下次重新查询
+            item = fetched.get(gid)
+            period_cache.put(gid, item, version=item.get('updatedAt') if item else None)
+            if item is not None:
+                found[gid] = item
+    return found
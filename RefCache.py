@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 未命中标记：get()返回MISS表示需要回源查询；返回None表示"已确认不存在"（负缓存）
+MISS = object()
+
+# 各参考数据表的默认TTL（秒），可用环境变量CACHE_TTL_<表名大写>覆盖
+DEFAULT_TTLS = {
+    'QueryPeriods': 30,
+    'StudentInfo': 300,
+    'TeacherCourses': 300,
+}
+DEFAULT_TTL = 60
+# 各表的默认容量（条目数），可用环境变量CACHE_MAX_ENTRIES_<表名大写>覆盖。
+# 学生信息按名单批量补全（一页成绩涉及数百名学生），容量需覆盖一名教师的全部学生
+DEFAULT_SIZES = {
+    'StudentInfo': 20000,
+}
+# 负缓存（404）TTL较短：刚创建的数据不会被长时间误判为不存在
+NEGATIVE_TTL = float(os.environ.get('CACHE_NEGATIVE_TTL', '10'))
+MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '2048'))
+
+
+class TTLCache:
+    """热容器内的LRU + TTL缓存，线程安全，带命中统计
+
+    条目可携带版本号（如updatedAt）：写入时若已缓存的版本更新，则保留新版本，
+    避免慢的回源读覆盖刚写穿（write-through）的新数据。
+    """
+
+    def __init__(self, name, ttl, maxsize=MAX_ENTRIES, negative_ttl=NEGATIVE_TTL, clock=time.monotonic):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._data = OrderedDict()  # key -> (过期时间, 值, 版本)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, version=None):
+        """缓存值；value为None表示负缓存（使用较短TTL）"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            current = self._data.get(key)
+            if (current is not None and version is not None and current[2] is not None
+                    and current[2] > version and current[0] > self.clock()):
+                return
+            self._data[key] = (self.clock() + ttl, value, version)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'negativeHits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else None
+            }
+
+
+_caches = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(table_name):
+    """按表名获取（或创建）共享缓存，同一容器内各模块共用同一实例"""
+    with _registry_lock:
+        cache = _caches.get(table_name)
+        if cache is None:
+            ttl = float(os.environ.get(f'CACHE_TTL_{table_name.upper()}',
+                                       DEFAULT_TTLS.get(table_name, DEFAULT_TTL)))
+            maxsize = int(os.environ.get(f'CACHE_MAX_ENTRIES_{table_name.upper()}',
+                                         DEFAULT_SIZES.get(table_name, MAX_ENTRIES)))
+            cache = _caches[table_name] = TTLCache(table_name, ttl, maxsize=maxsize)
+        return cache
+
+
+def cache_stats():
+    """所有缓存的命中统计，用于按真实流量调整TTL"""
+    with _registry_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def invalidate_all():
+    """清空所有缓存（模拟新容器，基准测试用）"""
+    with _registry_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
@@ -0,0 +1,157 @@
+import importlib
+import json
+import logging
+import re
+import threading
+
+from JsonResponse import CORS_ALLOW_ORIGIN, cors_headers, error_response
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# 单一入口：所有接口部署为同一个Lambda（API Gateway配置 ANY /{proxy+} 代理集成），
+# 按 方法 + 路径 分发到原有各模块的lambda_handler。一个热容器即可服务全部路由，
+# 各模块在首次命中时才导入（boto3客户端、缓存由AwsRuntime/RefCache在模块间共享）。
+# CORS预检、未知路由（404）、不支持的方法（405）、未捕获异常（500）在这里统一处理，
+# 并保证每个响应都带CORS头。原各函数仍可单独部署，行为不变。
+
+# (路径模板, {方法: (模块, 函数)})；{name}匹配一段路径，写入pathParameters
+ROUTES = [
+    ('/info', {'GET': ('StudentInfo', 'lambda_handler')}),
+    ('/grades', {'GET': ('GradeQuery', 'lambda_handler'),
+                 'POST': ('GradeInsert', 'lambda_handler')}),
+    ('/teacher/courses', {'GET': ('GetTeacherCourses', 'lambda_handler')}),
+    ('/teacher/grades', {'GET': ('TeacherGetGrades', 'lambda_handler'),
+                         'DELETE': ('TeacherDeleteGrade', 'lambda_handler')}),
+    ('/teacher/set-period', {'GET': ('PeriodManage', 'lambda_handler'),
+                             'POST': ('PeriodManage', 'lambda_handler')}),
+    ('/teacher/stats', {'GET': ('GradeStats', 'lambda_handler')}),
+    ('/teacher/upload', {'POST': ('GradeFileParser', 'lambda_handler')}),
+    ('/teacher/upload/jobs', {'POST': ('ImportJobs', 'lambda_handler')}),
+    ('/teacher/upload/{jobId}', {'GET': ('ImportJobs', 'lambda_handler'),
+                                 'POST': ('ImportJobs', 'lambda_handler')}),
+]
+
+# 队列消息按step分发（导入任务与视图发布可共用一个队列）；未列出的step交给导入任务
+RECORD_HANDLERS = {
+    'publish': ('GradeViews', 'worker_handler'),
+}
+DEFAULT_RECORD_HANDLER = ('ImportJobs', 'worker_handler')
+
+# 非HTTP事件（定时任务等）的分发：(判断函数, (模块, 函数))
+EVENT_HANDLERS = [
+    (lambda event: event.get('action') == 'rebuild', ('GradeStats', 'lambda_handler')),
+    (lambda event: event.get('action') == 'snapshot', ('GradeSnapshot', 'lambda_handler')),
+    (lambda event: event.get('action') == 'publish', ('GradeViews', 'lambda_handler')),
+]
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _compile(template):
+    pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', re.escape(template))
+    return re.compile(f'^{pattern}$')
+
+
+# 静态路径优先于带参数的路径（/teacher/upload/jobs 不会被当作jobId）
+_COMPILED = sorted(((template, _compile(template), methods) for template, methods in ROUTES),
+                   key=lambda route: '{' in route[0])
+
+
+def get_handler(target):
+    """按(模块, 函数)返回处理函数；模块首次使用时才导入"""
+    handler = _handlers.get(target)
+    if handler is None:
+        with _handlers_lock:
+            handler = _handlers.get(target)
+            if handler is None:
+                module_name, function_name = target
+                handler = _handlers[target] = getattr(importlib.import_module(module_name), function_name)
+    return handler
+
+
+def match_route(path):
+    """返回(路径模板, {方法: 处理函数}, 路径参数)；未匹配时返回(None, None, None)"""
+    path = '/' + path.strip('/') if path else '/'
+    for template, pattern, methods in _COMPILED:
+        matched = pattern.match(path)
+        if matched:
+            return template, methods, matched.groupdict()
+    return None, None, None
+
+
+def _request_path(event):
+    path = event.get('path') or ''
+    # 自定义域名映射时路径可能带阶段前缀（/prod/grades）
+    stage = (event.get('requestContext') or {}).get('stage')
+    if stage and path.startswith(f'/{stage}/'):
+        template, _, _ = match_route(path)
+        if template is None:
+            return path[len(stage) + 1:]
+    return path
+
+
+def allowed_methods(methods):
+    return ', '.join(sorted(methods) + ['OPTIONS'])
+
+
+def _with_cors(response, methods):
+    if not isinstance(response, dict):
+        return response
+    headers = response.get('headers')
+    headers = dict(headers) if headers else {}
+    headers.setdefault('Access-Control-Allow-Origin', CORS_ALLOW_ORIGIN)
+    headers.setdefault('Access-Control-Allow-Methods', allowed_methods(methods))
+    response['headers'] = headers
+    return response
+
+
+def dispatch_http(event, context):
+    http_method = (event.get('httpMethod') or '').upper()
+    path = _request_path(event)
+    template, methods, params = match_route(path)
+    if template is None:
+        return error_response(404, f'接口不存在：{path}')
+    if http_method == 'OPTIONS':
+        # 预检请求直接应答，不加载也不调用具体处理函数
+        return {'statusCode': 200, 'headers': cors_headers(allowed_methods(methods)), 'body': ''}
+    target = methods.get(http_method)
+    if target is None:
+        headers = cors_headers(allowed_methods(methods), extra={'Allow': allowed_methods(methods)})
+        return error_response(405, f'{template}不支持{http_method}方法', headers=headers)
+
+    if params:
+        event = dict(event, pathParameters=dict(event.get('pathParameters') or {}, **params))
+    try:
+        response = get_handler(target)(event, context)
+    except Exception as e:
+        logger.error(f"处理{http_method} {template}失败：{str(e)}", exc_info=True)
+        return error_response(500, '服务器处理失败，请稍后重试')
+    return _with_cors(response, methods)
+
+
+def dispatch_records(event, context):
+    """队列消息按消息体中的step分组后交给对应的消费者（一批消息可能混有导入与发布）"""
+    groups = {}
+    for record in event.get('Records', []):
+        try:
+            step = json.loads(record['body']).get('step')
+        except (KeyError, TypeError, ValueError):
+            step = None
+        groups.setdefault(RECORD_HANDLERS.get(step, DEFAULT_RECORD_HANDLER), []).append(record)
+    for target, records in groups.items():
+        get_handler(target)(dict(event, Records=records), context)
+
+
+def lambda_handler(event, context):
+    """统一入口：HTTP请求按路由分发；队列消息、定时任务按事件内容分发"""
+    if 'httpMethod' in event:
+        return dispatch_http(event, context)
+    if event.get('Records'):
+        return dispatch_records(event, context)
+    for predicate, target in EVENT_HANDLERS:
+        if predicate(event):
+            return get_handler(target)(event, context)
+    logger.error(f"无法识别的事件：{sorted(event)}")
+    raise ValueError('无法识别的事件类型')
@@ -1,45 +1,86 @@
-import boto3
 import json
 
+from AwsRuntime import get_client, get_table
+from DynamoBatch import parallel_batch_get
+from JsonResponse import cors_headers
+from RefCache import MISS, get_cache
+from Telemetry import instrumented
+
 # 连接DynamoDB的StudentInfo表（表名必须与你创建的一致）
-dynamodb = boto3.resource('dynamodb')
-student_table = dynamodb.Table('StudentInfo')  # 表名：StudentInfo
+student_table = get_table('StudentInfo')  # 表名：StudentInfo
+
+# 学生信息极少变更：热容器内缓存（含"不存在"的负缓存），TTL可用CACHE_TTL_STUDENTINFO调整
+student_cache = get_cache('StudentInfo')
+
+# CORS头：域名由JsonResponse.CORS_ALLOW_ORIGIN统一配置（必须与前端域名完全一致，无斜杠）
+CORS_HEADERS = cors_headers(extra={'Content-Type': 'application/json'})
+
+def get_student_info(student_id):
+    """按学号查询学生信息，优先读缓存；不存在时返回None"""
+    cached = student_cache.get(student_id)
+    if cached is not MISS:
+        return cached
+    student_info = student_table.get_item(
+        Key={
+            'studentId': student_id  # 主键查询，studentId为表的分区键
+        }
+    ).get('Item')  # 提取查询结果（若不存在，Item字段会缺失）
+    student_cache.put(student_id, student_info)
+    return student_info
 
+def get_students(student_ids, strict=False):
+    """批量查询学生信息（成绩名单补全姓名/班级用），返回{studentId: 学生信息}
+
+    先查热容器缓存，未命中的学号按100个一组并发BatchGetItem取回并写入缓存（不存在的负缓存）。
+    strict为True时，限流重试耗尽仍未取到的学号会抛出异常，否则这些学号按"未找到"处理（不缓存）。
+    """
+    found = {}
+    misses = []
+    for student_id in set(student_ids):
+        cached = student_cache.get(student_id)
+        if cached is MISS:
+            misses.append(student_id)
+        elif cached is not None:
+            found[student_id] = cached
+
+    if misses:
+        items, unprocessed = parallel_batch_get(get_client('dynamodb'), 'StudentInfo',
+                                                [{'studentId': student_id} for student_id in misses])
+        if unprocessed and strict:
+            raise RuntimeError(f'{len(unprocessed)}个学号因限流未能查询，请稍后重试')
+        fetched = {item['studentId']: item for item in items}
+        skipped = {key['studentId'] for key in unprocessed}
+        for student_id in misses:
+            if student_id in skipped:
+                continue
+            student_info = fetched.get(student_id)
+            student_cache.put(student_id, student_info)
+            if student_info is not None:
+                found[student_id] = student_info
+    return found
+
+@instrumented
 def lambda_handler(event, context):
     try:
         # 从Cognito授权信息中获取学生学号（username即studentId，需与StudentInfo表的主键一致）
         # 注意：确保Cognito学生用户的username与StudentInfo表中的studentId完全匹配
         student_id = event['requestContext']['authorizer']['claims']['cognito:username']
         
-        # 从StudentInfo表中查询该学生的信息
-        response = student_table.get_item(
-            Key={
-                'studentId': student_id  # 主键查询，studentId为表的分区键
-            }
-        )
-        
-        # 提取查询结果（若不存在，Item字段会缺失）
-        student_info = response.get('Item')
+        # 从StudentInfo表（或热容器缓存）中查询该学生的信息
+        student_info = get_student_info(student_id)
         
         # 处理“学生信息不存在”的情况
         if not student_info:
             return {
                 'statusCode': 404,  # 未找到
-                'headers': {
-                    # CORS头：必须与前端域名完全一致（无斜杠）
-                    'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                    'Content-Type': 'application/json'
-                },
+                'headers': CORS_HEADERS,
                 'body': json.dumps({'message': f'未找到学号为{student_id}的学生信息'})
             }
         
         # 正常返回学生信息（只包含需要前端展示的字段）
         return {
             'statusCode': 200,  # 成功
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Content-Type': 'application/json'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({
                 'studentId': student_info.get('studentId'),  # 学号（必返）
                 'name': student_info.get('name', '未填写'),  # 姓名（默认“未填写”）
@@ -54,9 +95,6 @@ def lambda_handler(event, context):
         print(f"查询学生信息时出错：{str(e)}")  # 打印错误到CloudWatch日志
         return {
             'statusCode': 500,  # 服务器错误
-            'headers': {
-                'Access-Control-Allow-Origin': 'https://dfg1elzq7v3yy.cloudfront.net',
-                'Content-Type': 'application/json'
-            },
+            'headers': CORS_HEADERS,
             'body': json.dumps({'message': '查询个人信息失败，请稍后重试'})
         }
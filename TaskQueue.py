@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+# 任务队列位置：SQS队列URL（https://sqs.<region>.amazonaws.com/...）或 local://（进程内替身，本地测试用）
+DEFAULT_QUEUE_URL = os.environ.get('TASK_QUEUE_URL', 'local://')
+
+# SendMessageBatch单次最多10条
+SQS_BATCH_LIMIT = 10
+
+
+class SqsQueue:
+    def __init__(self, queue_url):
+        from AwsRuntime import get_client  # 仅在真正使用SQS时加载boto3
+        self.queue_url = queue_url
+        self.sqs = get_client('sqs')
+
+    def send(self, message):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message, ensure_ascii=False))
+
+    def send_batch(self, messages):
+        for i in range(0, len(messages), SQS_BATCH_LIMIT):
+            entries = [{'Id': str(j), 'MessageBody': json.dumps(m, ensure_ascii=False)}
+                       for j, m in enumerate(messages[i:i + SQS_BATCH_LIMIT])]
+            response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            if response.get('Failed'):
+                raise RuntimeError(f"SQS批量发送失败：{response['Failed']}")
+
+
+class LocalQueue:
+    """进程内队列替身：消息以SQS事件的格式交给处理函数，drain()处理到队列为空为止"""
+
+    def __init__(self):
+        self.messages = deque()
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            self.messages.append(json.dumps(message, ensure_ascii=False))
+
+    def send_batch(self, messages):
+        for message in messages:
+            self.send(message)
+
+    def drain(self, handler, context=None):
+        processed = 0
+        while True:
+            with self._lock:
+                if not self.messages:
+                    return processed
+                body = self.messages.popleft()
+            handler({'Records': [{'body': body, 'eventSource': 'local:queue'}]}, context)
+            processed += 1
+
+
+# 进程内队列按位置区分（local://与local://publish是两个队列），各自排空
+_local_queues = {}
+_local_queues_lock = threading.Lock()
+
+
+def local_queues():
+    """已创建的进程内队列（本地服务器据此在后台排空）"""
+    with _local_queues_lock:
+        return dict(_local_queues)
+
+
+def get_task_queue(queue_url=None):
+    queue_url = queue_url or DEFAULT_QUEUE_URL
+    scheme = urlparse(queue_url).scheme
+    if scheme == 'local':
+        with _local_queues_lock:
+            queue = _local_queues.get(queue_url)
+            if queue is None:
+                queue = _local_queues[queue_url] = LocalQueue()
+            return queue
+    if scheme == 'https':
+        return SqsQueue(queue_url)
+    raise ValueError(f'不支持的队列位置：{queue_url}')
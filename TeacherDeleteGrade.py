@@ -1,19 +1,182 @@
 import json
-import boto3
 import logging
 from urllib.parse import unquote  # 导入URL解码工具
 
+from AwsRuntime import Key, dynamodb, get_table
+from ChangeLog import record_tombstones
+from DynamoBatch import batch_get_items, batch_write
+from GetTeacherCourses import get_teacher_courses, teacher_id_from
+from GradeStats import StatsDelta, update_stats
+from GradeViews import request_publish
+from JsonResponse import dumps
+from MultipartStream import decode_body
+from Telemetry import debug_log, instrumented, summarize_event
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-grades_table = dynamodb.Table('Grades')
+GRADES_TABLE_NAME = 'Grades'
+GRADES_KEY = ('studentId', 'gradeId')
+grades_table = get_table(GRADES_TABLE_NAME)
+# 成绩表二级索引（分区键course，排序键term），按课程+学期批量删除时用它找出要删的成绩
+COURSE_TERM_INDEX = 'course-term-index'
+GRADE_ATTRIBUTES = ['studentId', 'gradeId', 'course', 'term', 'score']
+
+# 批量删除：请求体{"keys": [{"studentId", "gradeId"}, ...]}（最多MAX_BULK_KEYS条），
+# 或{"course": ..., "term": ...}删除该课程该学期的全部成绩（如撤销一次错误的上传）
+MAX_BULK_KEYS = 5000
+# 并发删除的线程数（每个线程一次提交25条）
+WRITE_WORKERS = 16
+# 响应中最多列出的删除失败的主键
+MAX_REPORTED_FAILURES = 1000
+
+
+class InvalidRequestError(ValueError):
+    """请求参数错误（返回400）"""
+
+
+def parse_bulk_request(event):
+    """解析批量删除请求体，返回('keys', 去重后的主键列表) 或 ('course_term', (course, term))"""
+    try:
+        body = json.loads(decode_body(event))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidRequestError(f'请求体格式错误（需为JSON）：{str(e)}')
+    if not isinstance(body, dict):
+        raise InvalidRequestError('请求体需为JSON对象')
+
+    if 'keys' in body:
+        keys = body['keys']
+        if not isinstance(keys, list) or not keys:
+            raise InvalidRequestError('keys需为非空数组')
+        if len(keys) > MAX_BULK_KEYS:
+            raise InvalidRequestError(f'单次最多删除{MAX_BULK_KEYS}条成绩')
+        unique = {}
+        for key in keys:
+            if not isinstance(key, dict) or not all(isinstance(key.get(name), str) and key.get(name)
+                                                    for name in GRADES_KEY):
+                raise InvalidRequestError('keys中的每一项都需包含studentId和gradeId')
+            unique[(key['studentId'], key['gradeId'])] = {name: key[name] for name in GRADES_KEY}
+        return 'keys', list(unique.values())
+
+    course = str(body.get('course') or '').strip()
+    term = str(body.get('term') or '').strip()
+    if not course or not term:
+        raise InvalidRequestError('请提供keys，或同时提供course和term')
+    return 'course_term', (course, term)
+
+
+def find_course_term_grades(course, term):
+    """从course-term-index读取该课程该学期的全部成绩（索引投影需包含score）"""
+    kwargs = {
+        'IndexName': COURSE_TERM_INDEX,
+        'KeyConditionExpression': Key('course').eq(course) & Key('term').eq(term),
+        'ProjectionExpression': ', '.join(f'#p{i}' for i in range(len(GRADE_ATTRIBUTES))),
+        'ExpressionAttributeNames': {f'#p{i}': name for i, name in enumerate(GRADE_ATTRIBUTES)}
+    }
+    items = []
+    while True:
+        response = grades_table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_grades(keys):
+    """按主键批量读取要删除的成绩（用于权限校验、统计扣减和"未找到"计数）"""
+    items, unprocessed = batch_get_items(dynamodb, GRADES_TABLE_NAME, keys, projection=GRADE_ATTRIBUTES)
+    if unprocessed:
+        raise RuntimeError(f'读取成绩时有{len(unprocessed)}个键因限流未处理，请稍后重试')
+    return items
+
+
+def delete_grades(items):
+    """并发BatchWriteItem删除（25条一组，UnprocessedItems与限流自动退避重试），扣减课程统计并写入墓碑"""
+    client = grades_table.meta.client
+    report = batch_write(client, GRADES_TABLE_NAME,
+                         [(i, 'delete', {name: item[name] for name in GRADES_KEY}) for i, item in enumerate(items)],
+                         key_names=GRADES_KEY, workers=WRITE_WORKERS)
+    delta = StatsDelta()
+    deleted = [item for i, item in enumerate(items) if report.status.get(i) in ('written', 'retried')]
+    for item in deleted:
+        delta.record_item_change(item, None)
+    update_stats(delta)
+    record_tombstones(deleted, client)
+    request_publish(students=[item['studentId'] for item in deleted])
+    return report
+
 
+def bulk_delete(event):
+    teacher_id = teacher_id_from(event)
+    if not teacher_id:
+        return {
+            'statusCode': 401,
+            'body': json.dumps({'message': '未获取到教师身份，请重新登录'})
+        }
+    try:
+        mode, target = parse_bulk_request(event)
+    except InvalidRequestError as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
+
+    # 只能删除本人任教课程的成绩（成绩表中的course为课程名称）
+    taught = {c['courseName'] for c in get_teacher_courses(teacher_id) if c.get('courseName')}
+    if mode == 'course_term':
+        course, term = target
+        if course not in taught:
+            return {
+                'statusCode': 403,
+                'body': json.dumps({'message': f'无权删除课程{course}的成绩'})
+            }
+        requested = items = find_course_term_grades(course, term)
+    else:
+        requested = target
+        items = load_grades(target)
+        forbidden = sorted({item.get('course') for item in items} - taught)
+        if forbidden:
+            return {
+                'statusCode': 403,
+                'body': json.dumps({'message': f'无权删除课程{"、".join(forbidden)}的成绩，未删除任何成绩'})
+            }
+
+    report = delete_grades(items)
+    summary = report.summary()
+    deleted = summary['written'] + summary['retried']
+    failed_keys = [{name: items[i][name] for name in GRADES_KEY}
+                   for i, status in sorted(report.status.items()) if status == 'failed']
+    result = {
+        'requested': len(requested),
+        'deleted': deleted,
+        'notFound': len(requested) - len(items),
+        'failed': summary['failed'],
+        'throttles': summary['throttles'],
+        'seconds': summary['seconds']
+    }
+    logger.info(f"批量删除完成：mode={mode}，{result}")
+    if failed_keys:
+        # 失败的主键原样返回，前端可用keys形式重新提交
+        return {
+            'statusCode': 500,
+            'body': dumps(dict(result, message=f'部分成绩删除失败：成功{deleted}条，失败{len(failed_keys)}条，请重试',
+                               failedKeys=failed_keys[:MAX_REPORTED_FAILURES]))
+        }
+    return {
+        'statusCode': 200,
+        'body': dumps(dict(result, message=f'批量删除成功：删除{deleted}条成绩'))
+    }
+
+@instrumented
 def lambda_handler(event, context):
     try:
-        logger.info(f"删除请求完整事件：{json.dumps(event)}")
-        
-        query_params = event.get('queryStringParameters', {})
+        logger.info(f"收到删除请求：{summarize_event(event)}")
+
+        # 带请求体的为批量删除；否则按查询参数删除单条成绩
+        if event.get('body'):
+            return bulk_delete(event)
+
+        query_params = event.get('queryStringParameters') or {}
         student_id = query_params.get('studentId')
         grade_id_encoded = query_params.get('gradeId')  # 接收编码后的gradeId
         
@@ -21,7 +184,6 @@ def lambda_handler(event, context):
         grade_id = None
         if grade_id_encoded:
             grade_id = unquote(grade_id_encoded)  # 自动解码所有URL编码字符（包括中文、+号等）
-            logger.info(f"完整解码后的gradeId：{grade_id}")  # 打印解码结果
         
         logger.info(f"接收删除参数：studentId={student_id}, 解码后gradeId={grade_id}")
         
@@ -41,12 +203,18 @@ def lambda_handler(event, context):
             ReturnValues='ALL_OLD'
         )
         
-        logger.info(f"删除操作响应：{json.dumps(response)}")
+        # 删除结果含Decimal，统一用JsonResponse的编码器序列化（采样输出）
+        debug_log('删除操作响应', response)
         if 'Attributes' in response:
-            logger.info(f"成功删除数据：{json.dumps(response['Attributes'])}")
+            logger.info(f"成功删除数据：studentId={student_id}, gradeId={grade_id}")
+            delta = StatsDelta()
+            delta.record_item_change(response['Attributes'], None)
+            update_stats(delta)
+            record_tombstones([response['Attributes']], grades_table.meta.client)
+            request_publish(students=[student_id])
             return {
                 'statusCode': 200,
-                'body': json.dumps({'message': '删除成功', 'deletedItem': response['Attributes']})
+                'body': dumps({'message': '删除成功', 'deletedItem': response['Attributes']})
             }
         else:
             logger.warning(f"未找到数据：studentId={student_id}, gradeId={grade_id}")
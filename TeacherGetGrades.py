@@ -1,29 +1,354 @@
 import json
-import boto3
+import base64
+import binascii
+from concurrent.futures import ThreadPoolExecutor
 # 导入Decimal类型用于判断
 from decimal import Decimal
 
-dynamodb = boto3.resource('dynamodb', region_name='ap-northeast-2')
-grades_table = dynamodb.Table('Grades')
+from AwsRuntime import get_client, lazy, type_deserializer, type_serializer
+from ChangeLog import (COURSE_VERSION_INDEX, GRADE_TOMBSTONES_TABLE_NAME, InvalidSyncTokenError, SyncExpiredError,
+                       decode_sync_token, encode_sync_token, merge_changes, query_changes)
+from GetTeacherCourses import get_teacher_courses, teacher_id_from
+from JsonResponse import json_response
+from StudentInfo import get_students
+from Telemetry import instrumented
 
+GRADES_TABLE_NAME = 'Grades'
+
+# 二级索引（GSI）course-term-index：分区键course，排序键term。
+# 每位教师只读取自己任教课程的分区（分页列表按课程顺序Query，增量同步各课程并行Query），不再扫描全表
+COURSE_TERM_INDEX = 'course-term-index'
+# 索引查询的续页键（索引键 + 表主键）
+INDEX_KEY_NAMES = ('course', 'term', 'studentId', 'gradeId')
+# 并行查询的最大线程数（一位教师通常只有几门课）
+MAX_PARALLEL_QUERIES = 8
+
+# 并行查询使用低层client（线程安全），resource对象不能跨线程共享
+_serializer = lazy(type_serializer)
+_deserializer = lazy(type_deserializer)
+
+# 教师端每次打开页面都需重新验证（ETag未变时只返回304）
+CACHE_HEADERS = {'Cache-Control': 'private, no-cache'}
+
+# 分页大小（每页条数），前端可通过limit参数调整，但不超过上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# 增量同步单次最多下发的变化条数；超过时让客户端重新全量加载（避免响应体超过Lambda上限）
+MAX_SYNC_CHANGES = 5000
+
+# enrich=1时为每条成绩补充学生姓名和班级（学生信息属性 → 返回字段）
+ENRICH_FIELDS = {'name': 'studentName', 'className': 'className'}
+
+# fields=逗号分隔的返回字段：成绩属性映射为ProjectionExpression，未请求的属性不读取也不序列化；
+# 请求studentName/className时自动补全学生信息（此时enrich参数不再需要）
+GRADE_FIELDS = ('studentId', 'gradeId', 'course', 'term', 'score', 'version', 'updatedAt')
+# format=columns时返回紧凑的列式结构：{"columns": [列名...], "rows": [[值...], ...]}，
+# 列名只出现一次；未指定fields时列为GRADE_FIELDS（补全时加上姓名、班级），缺失的属性为null
+RESPONSE_FORMATS = ('objects', 'columns')
+
+
+class InvalidRequestError(ValueError):
+    """请求参数错误（分页参数、续页令牌不合法等），返回400"""
+
+
+def _json_default(value):
+    # LastEvaluatedKey中可能含Decimal（数字类型的键），序列化为字符串保证令牌可还原
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'无法序列化类型：{type(value).__name__}')
+
+
+def encode_next_token(cursors, course, term):
+    """把各课程的续页位置和筛选条件编码为不透明的续页令牌（URL安全的base64）"""
+    if not cursors:
+        return None
+    payload = json.dumps({'k': cursors, 'c': course, 't': term},
+                         default=_json_default, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_next_token(token, course, term):
+    """还原续页令牌{课程: 续页键或None}；令牌与本次筛选条件不一致时视为非法，防止跨查询续页"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidRequestError('nextToken无效')
+    if not isinstance(payload, dict) or not isinstance(payload.get('k'), dict):
+        raise InvalidRequestError('nextToken无效')
+    if payload.get('c') != course or payload.get('t') != term:
+        raise InvalidRequestError('nextToken与当前筛选条件不一致，请重新加载第一页')
+    return payload['k']
+
+
+def parse_fields(raw):
+    """解析fields参数，返回去重后的字段列表；未指定时返回None（返回全部属性）"""
+    if raw in (None, ''):
+        return None
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in GRADE_FIELDS and name not in ENRICH_FIELDS.values()]
+    if unknown:
+        raise InvalidRequestError(f'不支持的字段：{",".join(unknown)}')
+    if not fields:
+        raise InvalidRequestError('fields不能为空')
+    return fields
+
+
+def parse_format(raw):
+    response_format = (raw or 'objects').strip()
+    if response_format not in RESPONSE_FORMATS:
+        raise InvalidRequestError(f'format只能是{"、".join(RESPONSE_FORMATS)}')
+    return response_format
+
+
+def read_projection(fields, enrich, extra=()):
+    """需要从成绩表读取的属性：请求的成绩字段 + 续页游标的键（及补全所需的学号、调用方附加的属性）"""
+    if fields is None:
+        return None
+    names = [name for name in fields if name in GRADE_FIELDS]
+    names.extend(INDEX_KEY_NAMES)
+    if enrich:
+        names.append('studentId')
+    names.extend(extra)
+    return list(dict.fromkeys(names))
+
+
+def shape_items(items, fields, response_format, enrich):
+    """按请求的字段与格式输出成绩：列式时返回(列名, 行)，否则返回(None, 对象列表)
+
+    为续页游标、合并去重多读的属性不会出现在响应中。
+    """
+    if response_format == 'columns':
+        columns = list(fields) if fields is not None else \
+            list(GRADE_FIELDS) + (list(ENRICH_FIELDS.values()) if enrich else [])
+        return columns, [[item.get(name) for name in columns] for item in items]
+    if fields is None:
+        return None, items
+    return None, [{name: item.get(name) for name in fields} for item in items]
+
+
+def parse_page_size(raw):
+    if raw in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(raw)
+    except (TypeError, ValueError):
+        raise InvalidRequestError('limit必须是整数')
+    if page_size <= 0:
+        raise InvalidRequestError('limit必须大于0')
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def query_course_page(course, term, limit, start_key=None, client=None, projection=None):
+    """按课程（及学期）查询一页成绩，返回(items, LastEvaluatedKey)；projection为只读取的属性名列表"""
+    client = client or get_client('dynamodb')
+    condition = 'course = :course'
+    values = {':course': course}
+    if term:
+        condition += ' AND term = :term'
+        values[':term'] = term
+    kwargs = {
+        'TableName': GRADES_TABLE_NAME,
+        'IndexName': COURSE_TERM_INDEX,
+        'KeyConditionExpression': condition,
+        'ExpressionAttributeValues': {k: _serializer.serialize(v) for k, v in values.items()},
+        'Limit': limit
+    }
+    if projection:
+        kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+        kwargs['ExpressionAttributeNames'] = {f'#p{i}': name for i, name in enumerate(projection)}
+    if start_key:
+        kwargs['ExclusiveStartKey'] = {k: _serializer.serialize(v) for k, v in start_key.items()}
+    response = client.query(**kwargs)
+    items = [{k: _deserializer.deserialize(v) for k, v in item.items()} for item in response.get('Items', [])]
+    last_key = response.get('LastEvaluatedKey')
+    if last_key:
+        last_key = {k: _deserializer.deserialize(v) for k, v in last_key.items()}
+    return items, last_key
+
+
+def enrich_with_students(items):
+    """名单补全：收集本页去重后的学号，批量（带缓存）查询StudentInfo并合并到每条成绩
+
+    浏览器不必再逐个学生请求；查不到的学生对应字段为None。
+    """
+    students = get_students(item['studentId'] for item in items if item.get('studentId'))
+    for item in items:
+        student = students.get(item.get('studentId')) or {}
+        for attr, field in ENRICH_FIELDS.items():
+            item[field] = student.get(attr)
+    return items
+
+
+def fetch_grades_page(cursors, term=None, page_size=DEFAULT_PAGE_SIZE, projection=None):
+    """读取一页成绩：按课程顺序Query，每次只读取本页剩余的条数（Limit=剩余空间），读满page_size条为止
+
+    cursors为{课程: 续页键（None表示从头读）}；返回(items, 下一页的cursors，读完时为None)。
+    读取的记录全部返回，不会读出后再丢弃；下一页从最后一条之后继续，未轮到的课程保持原位置
+    （教师的课程通常足够填满一页，多数页面只需一次Query）。
+    """
+    courses = list(cursors)
+    if not courses:
+        return [], None
+    client = get_client('dynamodb')
+    items = []
+    next_cursors = {}
+    for course in courses:
+        start_key = cursors[course]
+        if len(items) >= page_size:
+            # 本页已满，未轮到的课程保持原位置
+            next_cursors[course] = start_key
+            continue
+        while len(items) < page_size:
+            course_items, start_key = query_course_page(course, term, page_size - len(items), start_key,
+                                                        client=client, projection=projection)
+            items.extend(course_items)
+            # 结果可能受1MB上限截断（少于Limit但仍有续页键），继续读取同一课程
+            if not start_key:
+                break
+        if start_key:
+            next_cursors[course] = start_key
+    return items, next_cursors or None
+
+
+def fetch_changes(courses, term, since, projection=None):
+    """增量同步：各课程并行按course-version-index查询since之后变化的成绩和墓碑，返回(变化, 删除)
+
+    projection为变化的成绩要读取的属性（需含version，合并去重时比较）；墓碑只读取主键与version。
+    """
+    if not courses:
+        return [], []
+    client = get_client('dynamodb')
+    tombstone_projection = list(INDEX_KEY_NAMES) + ['version']
+
+    def course_changes(course):
+        return (query_changes(client, GRADES_TABLE_NAME, COURSE_VERSION_INDEX, 'course', course, since, term,
+                              projection=projection),
+                query_changes(client, GRADE_TOMBSTONES_TABLE_NAME, COURSE_VERSION_INDEX, 'course', course, since, term,
+                              projection=tombstone_projection))
+
+    with ThreadPoolExecutor(max_workers=min(len(courses), MAX_PARALLEL_QUERIES)) as executor:
+        results = list(executor.map(course_changes, courses))
+    changed = [item for course_items, _ in results for item in course_items]
+    deleted = [item for _, course_tombstones in results for item in course_tombstones]
+    return merge_changes(changed, deleted)
+
+
+@instrumented
 def lambda_handler(event, context):
     try:
-        response = grades_table.scan()
-        items = response['Items']
-        
-        # 遍历所有成绩，转换Decimal类型为float
-        for item in items:
-            # 处理每个字段，若为Decimal则转为float
-            for key, value in item.items():
-                if isinstance(value, Decimal):
-                    item[key] = float(value)  # 转换为float（或int(value)，根据需求）
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps(items)  # 此时可正常序列化
-        }
+        query_params = event.get('queryStringParameters') or {}
+
+        course = (query_params.get('course') or '').strip() or None
+        term = (query_params.get('term') or '').strip() or None
+
+        teacher_id = teacher_id_from(event)
+        if not teacher_id:
+            return {
+                'statusCode': 401,
+                'body': json.dumps({'message': '未获取到教师身份，请重新登录'})
+            }
+        # 成绩表中的course为课程名称
+        taught = [c['courseName'] for c in get_teacher_courses(teacher_id) if c.get('courseName')]
+        if course and course not in taught:
+            return {
+                'statusCode': 403,
+                'body': json.dumps({'message': f'无权查看课程{course}的成绩'})
+            }
+        courses = [course] if course else taught
+
+        # 期末导出（export=csv|ndjson）：只导出任教课程，并行分段扫描并写入对象存储，不走分页列表
+        if query_params.get('export'):
+            import GradeExport  # 导出请求较少，按需加载，不计入普通查询的冷启动
+            return GradeExport.export_response(query_params, teacher_id, courses, term)
+
+        # since为上次响应中的syncToken时只返回此后变化/删除的成绩（不分页）；since为空或0时正常分页，
+        # 第一页附带syncToken（客户端保存第一页的令牌，覆盖翻页期间发生的变化）
+        since = (query_params.get('since') or '').strip()
+        try:
+            fields = parse_fields(query_params.get('fields'))
+            response_format = parse_format(query_params.get('format'))
+        except InvalidRequestError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'message': str(e)})
+            }
+        if fields is None:
+            enrich = query_params.get('enrich') in ('1', 'true')
+        else:
+            enrich = any(name in fields for name in ENRICH_FIELDS.values())
+        if since not in ('', '0'):
+            try:
+                payload = decode_sync_token(since)
+                if payload.get('c') != course or payload.get('t') != term:
+                    raise InvalidSyncTokenError('since令牌与当前筛选条件不一致，请重新加载')
+            except InvalidSyncTokenError as e:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'message': str(e)})
+                }
+            except SyncExpiredError as e:
+                return {
+                    'statusCode': 410,
+                    'body': json.dumps({'message': str(e), 'resync': True})
+                }
+            sync_token = encode_sync_token(c=course, t=term)
+            items, deleted = fetch_changes(courses, term, payload['v'],
+                                           read_projection(fields, enrich, extra=('version',)))
+            if len(items) + len(deleted) > MAX_SYNC_CHANGES:
+                return {
+                    'statusCode': 410,
+                    'body': json.dumps({'message': '变化的成绩过多，请重新加载全部成绩', 'resync': True})
+                }
+            if enrich:
+                enrich_with_students(items)
+            columns, rows = shape_items(items, fields, response_format, enrich)
+            delta = {'columns': columns, 'rows': rows} if columns else {'items': rows}
+            delta.update({
+                'deleted': [{name: item.get(name) for name in INDEX_KEY_NAMES} for item in deleted],
+                'count': len(items),
+                'syncToken': sync_token
+            })
+            return json_response(event, delta, headers={'Cache-Control': 'private, no-store'})
+
+        try:
+            page_size = parse_page_size(query_params.get('limit'))
+            cursors = decode_next_token(query_params.get('nextToken'), course, term)
+        except InvalidRequestError as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'message': str(e)})
+            }
+        if cursors is None:
+            cursors = {name: None for name in courses}
+        else:
+            # 只续读本人任教的课程（令牌内容来自客户端）
+            cursors = {name: key for name, key in cursors.items() if name in courses}
+
+        sync_token = None
+        if 'since' in query_params and not query_params.get('nextToken'):
+            sync_token = encode_sync_token(c=course, t=term)
+        items, next_cursors = fetch_grades_page(cursors, term, page_size, read_projection(fields, enrich))
+        if enrich:
+            enrich_with_students(items)
+
+        columns, rows = shape_items(items, fields, response_format, enrich)
+        page = {'columns': columns, 'rows': rows} if columns else {'items': rows}
+        page.update({
+            'count': len(items),
+            # 为空表示已是最后一页
+            'nextToken': encode_next_token(next_cursors, course, term)
+        })
+        if sync_token:
+            page['syncToken'] = sync_token
+        # 一次序列化（Decimal由编码器直接输出为数字），带ETag，未变化时返回304
+        return json_response(event, page, headers=CACHE_HEADERS)
     except Exception as e:
         return {
             'statusCode': 500,
             'body': json.dumps({'message': str(e)})
-        }
\ No newline at end of file
+        }
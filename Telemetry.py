@@ -0,0 +1,252 @@
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+# 每次调用的性能埋点：
+# - instrumented装饰lambda_handler，统计整次调用耗时；
+# - DynamoDB客户端上挂botocore事件钩子，统计每次表调用的耗时，并自动请求ReturnConsumedCapacity；
+# - 调用结束时按CloudWatch嵌入式指标格式（EMF）输出一行JSON，按函数、按表生成指标；
+# - debug_log按比例采样并截断，热路径上不再输出整个事件或响应。
+
+logger = logging.getLogger()
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'GradeSystem')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false')
+# TOTAL：每次调用返回总消耗；INDEXES：另含各索引的消耗；NONE：不请求
+CONSUMED_CAPACITY = os.environ.get('METRICS_CONSUMED_CAPACITY', 'TOTAL').upper()
+DEBUG_LOG_SAMPLE_RATE = float(os.environ.get('DEBUG_LOG_SAMPLE_RATE', '0.01'))
+DEBUG_LOG_MAX_CHARS = int(os.environ.get('DEBUG_LOG_MAX_CHARS', '2000'))
+
+READ_OPERATIONS = {'GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'}
+
+_cold_start = True
+
+
+class InvocationRecorder:
+    """一次调用内所有表调用的汇总（批量写入等多线程场景共用，带锁）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tables = {}      # 表名 -> {'calls', 'ms', 'rcu', 'wcu', 'throttles'}
+        self.operations = {}  # 操作名 -> {'calls', 'ms'}
+
+    def record(self, table, operation, elapsed_ms, capacity=0.0, throttled=False):
+        with self._lock:
+            stats = self.tables.setdefault(table, {'calls': 0, 'ms': 0.0, 'rcu': 0.0, 'wcu': 0.0, 'throttles': 0})
+            stats['calls'] += 1
+            stats['ms'] += elapsed_ms
+            stats['rcu' if operation in READ_OPERATIONS else 'wcu'] += capacity
+            stats['throttles'] += int(throttled)
+            op = self.operations.setdefault(operation, {'calls': 0, 'ms': 0.0})
+            op['calls'] += 1
+            op['ms'] += elapsed_ms
+
+
+# 当前调用的记录器；不在任何调用内（如模块导入、命令行脚本）时为None，表调用不做统计
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def _capacity_by_table(consumed, default_table):
+    """ConsumedCapacity可能是单个dict（GetItem等）或列表（Batch/Transact），按表汇总"""
+    if not consumed:
+        return {}
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    totals = {}
+    for entry in consumed:
+        table = entry.get('TableName') or default_table
+        totals[table] = totals.get(table, 0.0) + float(entry.get('CapacityUnits', 0) or 0)
+    return totals
+
+
+def _request_tables(params):
+    if params.get('TableName'):
+        return [params['TableName']]
+    items = params.get('RequestItems')
+    if isinstance(items, dict):
+        return list(items)
+    if params.get('TransactItems'):
+        names = []
+        for entry in params['TransactItems']:
+            for action in entry.values():
+                if isinstance(action, dict) and action.get('TableName') not in names:
+                    names.append(action.get('TableName'))
+        return names
+    return []
+
+
+def _on_provide_params(params, model, context=None, **kwargs):
+    if context is not None:
+        context['telemetry_tables'] = _request_tables(params)
+        context['telemetry_start'] = time.perf_counter()
+    if CONSUMED_CAPACITY != 'NONE' and 'ReturnConsumedCapacity' in model.input_shape.members \
+            and 'ReturnConsumedCapacity' not in params:
+        params['ReturnConsumedCapacity'] = CONSUMED_CAPACITY
+
+
+def _on_after_call(http_response, parsed, model, context=None, **kwargs):
+    recorder = _recorder
+    if recorder is None or context is None or 'telemetry_start' not in context:
+        return
+    elapsed_ms = (time.perf_counter() - context['telemetry_start']) * 1000
+    tables = context.get('telemetry_tables') or ['-']
+    throttled = (parsed.get('Error') or {}).get('Code') in (
+        'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+    capacity = _capacity_by_table(parsed.get('ConsumedCapacity'), tables[0])
+    # 耗时与限流计入请求涉及的第一张表；Batch/Transact同时涉及多表时容量单位按表分别累加
+    for i, table in enumerate(dict.fromkeys(tables + list(capacity))):
+        recorder.record(table, model.name, elapsed_ms if i == 0 else 0.0,
+                        capacity.get(table, 0.0), throttled and i == 0)
+
+
+def instrument_client(client):
+    """在botocore客户端上注册埋点钩子（AwsRuntime创建DynamoDB客户端时调用）"""
+    events = getattr(getattr(client, 'meta', None), 'events', None)
+    if events is None or not METRICS_ENABLED:
+        return client
+    events.register('provide-client-params.dynamodb', _on_provide_params)
+    events.register('after-call.dynamodb', _on_after_call)
+    return client
+
+
+def _status_of(response):
+    return response.get('statusCode') if isinstance(response, dict) else None
+
+
+def emit_metrics(function_name, duration_ms, status, cold_start, recorder, request_id=None):
+    """按EMF输出：一条函数级记录（维度Function），每张表一条表级记录（维度Function, Table）"""
+    timestamp = int(time.time() * 1000)
+    total_calls = sum(stats['calls'] for stats in recorder.tables.values())
+    total_ms = sum(stats['ms'] for stats in recorder.tables.values())
+    documents = [{
+        '_aws': {
+            'Timestamp': timestamp,
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Function']],
+                'Metrics': [
+                    {'Name': 'Duration', 'Unit': 'Milliseconds'},
+                    {'Name': 'DynamoCalls', 'Unit': 'Count'},
+                    {'Name': 'DynamoTime', 'Unit': 'Milliseconds'},
+                    {'Name': 'Errors', 'Unit': 'Count'},
+                    {'Name': 'ColdStart', 'Unit': 'Count'}
+                ]
+            }]
+        },
+        'Function': function_name,
+        'Duration': round(duration_ms, 2),
+        'DynamoCalls': total_calls,
+        'DynamoTime': round(total_ms, 2),
+        'Errors': int(status is None or status >= 500),
+        'ColdStart': int(cold_start),
+        'statusCode': status,
+        'requestId': request_id,
+        'operations': {name: {'calls': op['calls'], 'ms': round(op['ms'], 2)}
+                       for name, op in recorder.operations.items()}
+    }]
+    for table, stats in recorder.tables.items():
+        documents.append({
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Function', 'Table']],
+                    'Metrics': [
+                        {'Name': 'TableCalls', 'Unit': 'Count'},
+                        {'Name': 'TableTime', 'Unit': 'Milliseconds'},
+                        {'Name': 'ConsumedRCU', 'Unit': 'Count'},
+                        {'Name': 'ConsumedWCU', 'Unit': 'Count'},
+                        {'Name': 'Throttles', 'Unit': 'Count'}
+                    ]
+                }]
+            },
+            'Function': function_name,
+            'Table': table,
+            'TableCalls': stats['calls'],
+            'TableTime': round(stats['ms'], 2),
+            'ConsumedRCU': round(stats['rcu'], 2),
+            'ConsumedWCU': round(stats['wcu'], 2),
+            'Throttles': stats['throttles'],
+            'requestId': request_id
+        })
+    # EMF需直接写到标准输出（不带日志前缀），CloudWatch据此提取指标
+    sys.stdout.write(''.join(json.dumps(doc, ensure_ascii=False) + '\n' for doc in documents))
+    sys.stdout.flush()
+
+
+def instrumented(handler):
+    """装饰lambda_handler：统计耗时与表调用，结束时输出EMF指标
+
+    嵌套调用（如TeacherGetGrades转交GradeExport）只由最外层统计和输出。
+    """
+    function_name = handler.__module__ if handler.__name__ == 'lambda_handler' \
+        else f'{handler.__module__}.{handler.__name__}'
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _recorder, _cold_start
+        if not METRICS_ENABLED:
+            return handler(event, context)
+        with _recorder_lock:
+            nested = _recorder is not None
+            if not nested:
+                _recorder = InvocationRecorder()
+        if nested:
+            return handler(event, context)
+
+        recorder = _recorder
+        cold_start, _cold_start = _cold_start, False
+        start = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            with _recorder_lock:
+                _recorder = None
+            try:
+                emit_metrics(function_name, duration_ms, _status_of(response), cold_start, recorder,
+                             getattr(context, 'aws_request_id', None))
+            except Exception as e:
+                logger.warning(f"指标输出失败：{str(e)}")
+
+    return wrapper
+
+
+def summarize_event(event):
+    """请求概要（方法、路径、参数名、请求体长度），用于常规日志，不包含请求内容"""
+    event = event or {}
+    return {
+        'method': event.get('httpMethod'),
+        'path': event.get('path') or event.get('resource'),
+        'query': sorted((event.get('queryStringParameters') or {}).keys()),
+        'bodyLength': len(event.get('body') or ''),
+        'records': len(event.get('Records') or []) or None
+    }
+
+
+def _should_sample():
+    return logger.isEnabledFor(logging.DEBUG) or random.random() < DEBUG_LOG_SAMPLE_RATE
+
+
+def debug_log(message, payload=None):
+    """采样输出调试日志：DEBUG级别时全部输出，否则按DEBUG_LOG_SAMPLE_RATE采样；内容超长时截断"""
+    if not _should_sample():
+        return
+    if payload is not None:
+        from JsonResponse import dumps
+        try:
+            text = dumps(payload)
+        except TypeError:
+            text = repr(payload)
+        if len(text) > DEBUG_LOG_MAX_CHARS:
+            text = f'{text[:DEBUG_LOG_MAX_CHARS]}...（已截断，共{len(text)}字符）'
+        message = f'{message}：{text}'
+    logger.info(f'[debug] {message}')
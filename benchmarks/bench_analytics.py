@@ -0,0 +1,102 @@
+"""成绩分析基准：在线表上的逐行聚合（扫描Grades + Decimal转float）对比列式快照查询（GradeAnalytics）
+
+在LocalDynamoDB替身上装载合成数据，生成一次快照，然后对同一组分析问题分别计时：
+  scan      分段并行扫描Grades，逐行float(score)后在Python中分组聚合（每次都消耗整表读取）
+  snapshot  GradeAnalytics.query（分区/列裁剪 + mmap + 直方图聚合，不读在线表）
+两种方式的结果逐项比对（平均分允许0.01分的舍入差异）。
+
+用法：python benchmarks/bench_analytics.py [--scale 1k|100k|1M|<成绩条数>] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import AwsRuntime  # noqa: E402
+import LocalDynamoDB  # noqa: E402
+from synthetic_data import TERMS, Dataset, parse_scale  # noqa: E402
+
+
+def scan_aggregate(group_by, terms=None, cohort=None, pass_mark=60):
+    """改造前的做法：扫描全表，逐行转换并分组"""
+    from GradeExport import parallel_scan
+    groups = {}
+    for item in parallel_scan(projection=['studentId', 'course', 'term', 'score']):
+        if terms and item['term'] not in terms:
+            continue
+        if cohort and not item['studentId'].startswith(cohort):
+            continue
+        key = tuple(item[name] for name in group_by)
+        stats = groups.setdefault(key, [0, 0.0, 0])
+        score = float(item['score'])
+        stats[0] += 1
+        stats[1] += score
+        stats[2] += score >= pass_mark
+    return [dict(zip(group_by, key), count=n, mean=round(total / n, 2), passRate=round(passed / n, 4))
+            for key, (n, total, passed) in sorted(groups.items())]
+
+
+def same_results(actual, expected):
+    # 逐行float累加与直方图整数累加的舍入不同，平均分允许0.01分的差异
+    if len(actual) != len(expected):
+        return False
+    for a, e in zip(actual, expected):
+        if {k: v for k, v in a.items() if k != 'mean'} != {k: v for k, v in e.items() if k != 'mean'}:
+            return False
+        if abs(a['mean'] - e['mean']) > 0.011:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='100k')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    ds = Dataset(parse_scale(args.scale))
+    db = LocalDynamoDB.LocalDynamoDB()
+    AwsRuntime.install_dynamodb(db, conditions=LocalDynamoDB, types=LocalDynamoDB)
+    ds.seed_into(db)
+
+    import GradeAnalytics
+    import GradeSnapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.reset_stats()
+        summary = GradeSnapshot.build_snapshot(os.path.join(tmp, 'snapshot'))
+        print(f"快照：{summary['rows']}行，{summary['partitions']}个分区，{summary['bytes'] / 1024:.0f}KB，"
+              f"生成{summary['seconds'] * 1000:.0f}ms，扫描读取{db.stats()['Grades']['reads']}条")
+
+        metrics = ('count', 'mean', 'passRate')
+        questions = [
+            ('各课程各学期及格率', dict(group_by=('course', 'term'))),
+            ('单学期各课程', dict(group_by=('course',), terms=[TERMS[-1]])),
+            ('某届学生逐学期趋势', dict(group_by=('term',), cohort='20230000')),
+        ]
+        print(f"{'问题':<14} {'方式':<9} {'耗时ms':>9} {'读取条目':>9}")
+        with GradeAnalytics.Snapshot(os.path.join(tmp, 'snapshot')) as snapshot:
+            for title, spec in questions:
+                timings = {}
+                for _ in range(args.repeat):
+                    db.reset_stats()
+                    started = time.perf_counter()
+                    expected = scan_aggregate(spec['group_by'], spec.get('terms'), spec.get('cohort'))
+                    timings.setdefault('scan', []).append((time.perf_counter() - started) * 1000)
+                    reads = db.stats()['Grades']['reads']
+
+                    started = time.perf_counter()
+                    actual = GradeAnalytics.query(snapshot, spec['group_by'], metrics, terms=spec.get('terms'),
+                                                  student_prefix=spec.get('cohort'))
+                    timings.setdefault('snapshot', []).append((time.perf_counter() - started) * 1000)
+                    assert same_results(actual, expected), (title, actual[:2], expected[:2])
+                print(f"{title:<14} {'scan':<9} {min(timings['scan']):>9.1f} {reads:>9}")
+                print(f"{'':<14} {'snapshot':<9} {min(timings['snapshot']):>9.1f} {0:>9}")
+
+
+if __name__ == '__main__':
+    main()
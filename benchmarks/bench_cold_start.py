@@ -0,0 +1,112 @@
+"""冷启动基准：每个处理函数在全新解释器中测量 模块导入 / 运行时初始化 / 首次调用 的耗时
+
+import     导入处理函数模块（改造后不再在导入时创建boto3资源）
+init       AwsRuntime.warm_up()：导入boto3并创建共享session与DynamoDB客户端
+invoke     首次调用lambda_handler（需加--invoke，会真实访问DynamoDB，
+           可用DYNAMODB_ENDPOINT_URL指向DynamoDB Local）
+
+另测一行legacy-eager作为对照：改造前每个模块导入时执行的
+`import boto3; boto3.resource('dynamodb')`。
+
+用法：python benchmarks/bench_cold_start.py [--repeat N] [--invoke] [处理函数模块...]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CLAIMS = {'requestContext': {'authorizer': {'claims': {'cognito:username': '20230000001'}}}}
+
+# 处理函数模块及首次调用使用的示例事件（只读请求，不写入数据）
+HANDLERS = {
+    'GradeQuery': CLAIMS,
+    'StudentInfo': CLAIMS,
+    'GradeInsert': {'httpMethod': 'OPTIONS', 'body': '{}'},
+    'GradeFileParser': {'headers': {'content-type': 'text/plain'}, 'body': ''},
+    'PeriodManage': {'httpMethod': 'GET', 'queryStringParameters': {'gradeId': 'PHY101_2023年秋'}},
+    'TeacherDeleteGrade': {'queryStringParameters': {}},
+    'TeacherGetGrades': {'queryStringParameters': {'limit': '10'}},
+    'GetTeacherCourses': {},
+    # 单一入口：导入Router本身不加载任何处理函数，首次调用时才导入命中的模块
+    'Router': dict(CLAIMS, httpMethod='GET', path='/info'),
+}
+
+PROBE = r'''
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+module = __import__({module!r})
+t1 = time.perf_counter()
+import AwsRuntime
+AwsRuntime.warm_up()
+t2 = time.perf_counter()
+result = {{'import': t1 - t0, 'init': t2 - t1}}
+if {invoke!r}:
+    response = module.lambda_handler({event!r}, None)
+    result['invoke'] = time.perf_counter() - t2
+    result['status'] = response.get('statusCode') if isinstance(response, dict) else None
+print(json.dumps(result))
+'''
+
+LEGACY_PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import boto3
+boto3.resource('dynamodb', region_name='ap-northeast-2')
+print(json.dumps({'import': time.perf_counter() - t0, 'init': 0.0}))
+'''
+
+
+def run_probe(code):
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else '子进程失败')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(code, repeat):
+    samples = [run_probe(code) for _ in range(repeat)]
+    result = {}
+    for field in ('import', 'init', 'invoke'):
+        values = [sample[field] for sample in samples if field in sample]
+        if values:
+            result[field] = statistics.median(values)
+    result['status'] = samples[-1].get('status')
+    return result
+
+
+def main(argv):
+    repeat = 5
+    invoke = False
+    modules = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--repeat':
+            repeat = int(next(args))
+        elif arg == '--invoke':
+            invoke = True
+        else:
+            modules.append(arg)
+    modules = modules or list(HANDLERS)
+
+    print(f'{"handler":<20}{"import ms":>11}{"init ms":>10}{"invoke ms":>11}{"total ms":>10}  status')
+    rows = [('legacy-eager', LEGACY_PROBE)]
+    rows += [(name, PROBE.format(root=ROOT, module=name, invoke=invoke, event=HANDLERS.get(name, {})))
+             for name in modules]
+    for name, code in rows:
+        try:
+            result = measure(code, repeat)
+        except RuntimeError as e:
+            print(f'{name:<20}失败：{e}')
+            continue
+        total = sum(result.get(field, 0.0) for field in ('import', 'init', 'invoke'))
+        invoke_ms = f'{result["invoke"] * 1000:.1f}' if 'invoke' in result else '-'
+        print(f'{name:<20}{result["import"] * 1000:>11.1f}{result["init"] * 1000:>10.1f}'
+              f'{invoke_ms:>11}{total * 1000:>10.1f}  {result.get("status") or "-"}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,433 @@
+"""处理函数离线基准：在进程内DynamoDB替身（LocalDynamoDB）上运行每个lambda_handler
+
+按规模生成合成数据（见synthetic_data.py），逐个场景调用处理函数，报告：
+  p50/p90/p99   单次调用耗时（毫秒，处理函数CPU + 替身开销，不含网络往返）
+  reads/writes  每次调用平均读取/写入的条目数（替身统计，Query/Scan按实际评估的条目计）
+  rcu/wcu       每次调用平均消耗的容量单位（按DynamoDB规则近似计算）
+  peak KB       单次调用的内存峰值（tracemalloc，另行测量，避免拖慢计时）
+
+--save把结果写入benchmarks/baselines/handlers-<规模>.json；--check与同规模基线比较，
+TeacherGetGrades、GradeQuery、GradeFileParser的场景变慢或读取变多时以非零状态退出。
+读取条数是确定的，可严格比较；耗时受机器影响：每个场景前测量一次校准负载（固定的纯Python计算），
+按与基线的校准耗时之比换算机器速度，超过容差且差值超过噪声下限时先重新计时，仍超标才判为退化。
+
+用法：
+  python benchmarks/bench_handlers.py [--scale 1k|100k|1M|<成绩条数>] [--iterations N]
+                                      [--only 场景前缀 ...] [--save] [--check]
+                                      [--baseline 文件] [--latency-tolerance 0.5] [--read-tolerance 0]
+
+--only只运行部分场景时，前序写入场景不执行，后续场景的读取条数可能与完整运行略有差异。
+100k规模约需0.5GB内存、1分钟；1M规模约需5GB内存（替身按Python对象保存全部条目及索引）。
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from decimal import Decimal
+
+# 在导入处理函数之前设置：关闭EMF指标输出与调试日志采样，对象存储与队列使用本地替身
+os.environ.setdefault('METRICS_ENABLED', '0')
+os.environ.setdefault('DEBUG_LOG_SAMPLE_RATE', '0')
+os.environ.setdefault('TASK_QUEUE_URL', 'local://')
+# 同步令牌不回退：之前场景写入的成绩不会出现在增量同步场景的结果中，读取条数保持确定
+os.environ.setdefault('CHANGE_SYNC_LAG_SECONDS', '0')
+os.environ.setdefault('OBJECT_STORE_LOCATION', 'file://' + tempfile.mkdtemp(prefix='bench-objects-'))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+import AwsRuntime  # noqa: E402
+import LocalDynamoDB  # noqa: E402
+import PeriodWindow  # noqa: E402
+import RefCache  # noqa: E402
+from synthetic_data import SCALES, TERMS, Dataset, parse_scale  # noqa: E402
+
+BASELINE_DIR = os.path.join(HERE, 'baselines')
+# 回归检查覆盖的处理函数（场景名以这些前缀开头）
+GUARDED = ('TeacherGetGrades', 'GradeQuery', 'GradeFileParser')
+# 耗时差值低于此值（毫秒）视为噪声，不判为退化
+LATENCY_FLOOR_MS = 1.0
+MEMORY_RUNS = 3
+LATENCY_RETRIES = 2
+UPLOAD_ROWS = 500
+BOUNDARY = '----BenchBoundary7MA4YWxkTrZu0gW'
+# 批量删除场景使用的学期（合成数据中没有这个学期）
+BULK_TERM = '2024秋'
+
+
+def claims(user):
+    return {'requestContext': {'authorizer': {'claims': {'cognito:username': user}}}}
+
+
+def multipart_event(csv_text, query):
+    body = (f'--{BOUNDARY}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="grades.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode('utf-8') + csv_text.encode('utf-8') \
+        + f'\r\n--{BOUNDARY}--\r\n'.encode('utf-8')
+    return {
+        'httpMethod': 'POST',
+        'headers': {'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'},
+        'queryStringParameters': query,
+        'body': base64.b64encode(body).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+
+class Scenario:
+    """一个基准场景：event(i)生成第i次调用的事件；run为实际调用（默认直接调用处理函数）；
+    setup(i)在每次调用前执行（不计时、不计入读写统计），用于准备该次调用要处理的数据"""
+
+    def __init__(self, name, handler, event, iterations=None, run=None, setup=None):
+        self.name = name
+        self.handler = handler
+        self.event = event
+        self.iterations = iterations
+        self.run = run or (lambda i: handler(event(i), None))
+        self.setup = setup
+
+
+def build_scenarios(ds, db):
+    import GetTeacherCourses
+    import GradeFileParser
+    import GradeInsert
+    import GradeQuery
+    import GradeStats
+    import ImportJobs
+    import PeriodManage
+    import StudentInfo
+    import TeacherDeleteGrade
+    import TeacherGetGrades
+    from TaskQueue import get_task_queue
+
+    students = ds.student_count
+    teachers = ds.teacher_count
+    # 调用间按质数步长轮换学生/教师，热容器缓存不会掩盖读取
+    student = lambda i: ds.student_id((i * 7919) % students)  # noqa: E731
+    teacher = lambda i: ds.teacher_id((i * 31) % teachers)  # noqa: E731
+    period_ids = [p['gradeId'] for p in ds.periods()]
+    upload_rows = min(UPLOAD_ROWS, students)
+
+    def import_job(i):
+        event = dict(multipart_event(ds.csv_rows(upload_rows, offset=i * upload_rows, course_index=1),
+                                     {'filename': f'job-{i}.csv', 'mode': 'upsert'}), **claims(ds.teacher_id(0)))
+        response = ImportJobs.lambda_handler(event, None)
+        get_task_queue().drain(ImportJobs.worker_handler)
+        return response
+
+    # 增量同步场景：令牌在准备步骤中按该学生当前的成绩视图生成（直接读替身的存储，不计入读取），
+    # 轮询时没有新的变化，衡量的是"什么都没变"时一次同步的开销
+    import ChangeLog
+    import GradeViews
+    sync_tokens = {}
+
+    def make_student_token(i):
+        view = db.tables[GradeViews.VIEWS_TABLE_NAME].items.get((student(i),))
+        document = GradeViews.select_document(view, time.time_ns() // 1_000_000)
+        sync_tokens[i] = ChangeLog.encode_sync_token(d=document[1] if document else None)
+
+    # 删除场景：按固定顺序选取已有成绩（每次调用删除不同的一条）
+    grade_keys = sorted(db.tables['Grades'].items)[::max(1, ds.grade_count // 1000)]
+
+    # 批量删除场景：每次调用前装入一批"错误上传"的成绩（独立的学期，不影响其他场景），再整体删除
+    bulk_course = ds.teacher_courses(0)[0]
+
+    def load_bad_upload(i):
+        db.load('Grades', ({
+            'studentId': ds.student_id(n), 'gradeId': f'{bulk_course}+{BULK_TERM}+{ds.student_id(n)}',
+            'course': bulk_course, 'term': BULK_TERM, 'score': Decimal(n % 101)
+        } for n in range(upload_rows)))
+
+    return [
+        Scenario('GradeQuery', GradeQuery.lambda_handler, lambda i: claims(student(i))),
+        Scenario('GradeQuery.since', GradeQuery.lambda_handler,
+                 lambda i: dict(claims(student(i)), queryStringParameters={'since': sync_tokens[i]}),
+                 setup=make_student_token),
+        Scenario('StudentInfo', StudentInfo.lambda_handler, lambda i: claims(student(i))),
+        Scenario('GetTeacherCourses', GetTeacherCourses.lambda_handler, lambda i: claims(teacher(i))),
+        Scenario('TeacherGetGrades.page', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={'limit': '50'})),
+        Scenario('TeacherGetGrades.enriched', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={'limit': '500', 'enrich': '1'})),
+        Scenario('TeacherGetGrades.columns', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={
+                     'limit': '500', 'format': 'columns',
+                     'fields': 'studentId,gradeId,studentName,className,course,term,score'})),
+        Scenario('TeacherGetGrades.since', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={'since': sync_tokens[i]}),
+                 setup=lambda i: sync_tokens.__setitem__(i, ChangeLog.encode_sync_token(c=None, t=None))),
+        Scenario('TeacherGetGrades.course_term', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={
+                     'course': ds.teacher_courses((i * 31) % teachers)[0],
+                     'term': TERMS[i % len(TERMS)], 'limit': '200'})),
+        Scenario('PeriodManage.get', PeriodManage.lambda_handler,
+                 lambda i: {'httpMethod': 'GET', 'queryStringParameters': {
+                     'gradeId': period_ids[(i * 13) % len(period_ids)]}}),
+        Scenario('PeriodManage.batch', PeriodManage.lambda_handler,
+                 lambda i: {'httpMethod': 'GET', 'queryStringParameters': {
+                     'gradeIds': ','.join(period_ids[(i * 40 + j) % len(period_ids)] for j in range(40))}}),
+        Scenario('PeriodManage.post', PeriodManage.lambda_handler,
+                 lambda i: {'httpMethod': 'POST', 'body': json.dumps({
+                     'gradeID': period_ids[i % len(period_ids)],
+                     'startTime': '2024-01-01T09:00', 'endTime': '2030-01-01T09:00'})}),
+        Scenario('GradeStats.course_term', GradeStats.lambda_handler,
+                 lambda i: {'httpMethod': 'GET', 'queryStringParameters': {
+                     'course': ds.courses[i % len(ds.courses)][0], 'term': TERMS[i % len(TERMS)]}}),
+        Scenario('GradeStats.course', GradeStats.lambda_handler,
+                 lambda i: {'httpMethod': 'GET', 'queryStringParameters': {
+                     'course': ds.courses[i % len(ds.courses)][0]}}),
+        Scenario('GradeInsert', GradeInsert.lambda_handler,
+                 lambda i: {'httpMethod': 'POST', 'body': json.dumps({
+                     'studentId': student(i), 'courseName': ds.courses[i % len(ds.courses)][0],
+                     'semester': TERMS[i % len(TERMS)], 'score': str(i % 101)})}),
+        Scenario('GradeInsert.batch', GradeInsert.lambda_handler,
+                 lambda i: {'httpMethod': 'POST', 'body': json.dumps({'grades': [
+                     {'studentId': ds.student_id((i * upload_rows + j) % students),
+                      'course': ds.courses[2 + i % (len(ds.courses) - 2)][0],
+                      'term': TERMS[-1], 'score': str((i + j) % 101)} for j in range(upload_rows)]})},
+                 iterations=10),
+        Scenario('GradeFileParser.replace', GradeFileParser.lambda_handler,
+                 lambda i: multipart_event(ds.csv_rows(upload_rows, offset=i * upload_rows),
+                                           {'filename': 'grades.csv', 'mode': 'replace'}), iterations=10),
+        Scenario('GradeFileParser.upsert', GradeFileParser.lambda_handler,
+                 lambda i: multipart_event(ds.csv_rows(upload_rows, offset=i * upload_rows, term=TERMS[0]),
+                                           {'filename': 'grades.csv', 'mode': 'upsert', 'force': '1'}),
+                 iterations=10),
+        Scenario('ImportJobs.upsert', ImportJobs.lambda_handler, None, iterations=5, run=import_job),
+        Scenario('TeacherDeleteGrade', TeacherDeleteGrade.lambda_handler,
+                 lambda i: {'httpMethod': 'DELETE', 'queryStringParameters': dict(zip(
+                     ('studentId', 'gradeId'), grade_keys[i % len(grade_keys)]))}),
+        Scenario('TeacherDeleteGrade.bulk_course_term', TeacherDeleteGrade.lambda_handler,
+                 lambda i: dict(claims(ds.teacher_id(0)), httpMethod='DELETE',
+                                body=json.dumps({'course': bulk_course, 'term': BULK_TERM})),
+                 iterations=10, setup=load_bad_upload),
+        Scenario('GradeExport', TeacherGetGrades.lambda_handler,
+                 lambda i: dict(claims(teacher(i)), queryStringParameters={'export': 'csv'}), iterations=3),
+    ]
+
+
+def install(ds):
+    """创建替身、装载数据并替换AwsRuntime中的DynamoDB；统计表按成绩数据重算一次，学生成绩视图全量发布一次"""
+    db = LocalDynamoDB.LocalDynamoDB()
+    AwsRuntime.install_dynamodb(db, conditions=LocalDynamoDB, types=LocalDynamoDB)
+    ds.seed_into(db)
+    ds.register_courses(PeriodWindow.COURSE_ID_MAP)
+    import GradeStats
+    GradeStats.rebuild_stats()
+    import GradeViews
+    GradeViews.publish_all()
+    return db
+
+
+def calibrate(rounds=7):
+    """固定的纯Python负载（排序、字典、JSON），用于换算不同机器/不同时刻的速度差异"""
+    rows = [{'studentId': f'2023{i:07d}', 'score': (i * 7919) % 1000, 'term': TERMS[i % 4]} for i in range(5000)]
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        ordered = sorted(rows, key=lambda row: (row['term'], row['score']))
+        grouped = {}
+        for row in ordered:
+            grouped.setdefault(row['term'], []).append(row['studentId'])
+        json.dumps(ordered)
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _totals(db):
+    stats = db.stats()
+    keys = ('reads', 'writes', 'rcu', 'wcu')
+    return {key: sum(table[key] for table in stats.values()) for key in keys}, stats
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def prepare(scenario, i):
+    """执行场景的准备步骤；替身的读写统计不受影响（装载数据不计数）"""
+    if scenario.setup is not None:
+        scenario.setup(i)
+
+
+def time_scenario(scenario, iterations):
+    """计时运行iterations次，返回(各次耗时毫秒, 状态码计数)"""
+    samples = []
+    statuses = {}
+    for i in range(iterations):
+        prepare(scenario, i)
+        started = time.perf_counter()
+        response = scenario.run(i)
+        samples.append((time.perf_counter() - started) * 1000)
+        status = response.get('statusCode') if isinstance(response, dict) else None
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return samples, statuses
+
+
+def run_scenario(scenario, db, iterations):
+    # 每个场景从冷缓存开始（模拟新容器），场景内的后续调用复用热容器缓存
+    RefCache.invalidate_all()
+    db.reset_stats()
+    # 紧挨着场景测量校准负载，比较基线时按两次运行的机器速度之比换算
+    calibration = calibrate()
+    samples, statuses = time_scenario(scenario, iterations)
+    totals, per_table = _totals(db)
+
+    # 内存峰值单独测量（tracemalloc会明显拖慢分配密集的代码）
+    peak = 0
+    for i in range(iterations, iterations + min(MEMORY_RUNS, iterations)):
+        prepare(scenario, i)
+        tracemalloc.start()
+        scenario.run(i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'calibration_ms': calibration,
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p90_ms': round(_percentile(samples, 90), 3),
+        'p99_ms': round(_percentile(samples, 99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'reads': round(totals['reads'] / iterations, 2),
+        'writes': round(totals['writes'] / iterations, 2),
+        'rcu': round(totals['rcu'] / iterations, 2),
+        'wcu': round(totals['wcu'] / iterations, 2),
+        'peak_kb': round(peak / 1024, 1),
+        'status': statuses,
+        'tables': {name: {'reads': round(table['reads'] / iterations, 2),
+                          'writes': round(table['writes'] / iterations, 2),
+                          'calls': {op: round(n / iterations, 2) for op, n in table['calls'].items()}}
+                   for name, table in per_table.items() if table['reads'] or table['writes'] or table['calls']}
+    }
+
+
+def expected_latency(result, base):
+    """基线p50换算到本次运行的机器速度"""
+    if result.get('calibration_ms') and base.get('calibration_ms'):
+        return base['p50_ms'] * result['calibration_ms'] / base['calibration_ms']
+    return base['p50_ms']
+
+
+def check(results, baseline, latency_tolerance, read_tolerance):
+    """与基线比较受保护的场景，返回{场景名: [退化说明]}（为空表示通过）"""
+    failures = {}
+    for name, result in results.items():
+        if not name.startswith(GUARDED):
+            continue
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        problems = []
+        expected = expected_latency(result, base)
+        if result['p50_ms'] > expected * (1 + latency_tolerance) and result['p50_ms'] - expected > LATENCY_FLOOR_MS:
+            problems.append(f'p50 {result["p50_ms"]}ms > 基线{expected:.3f}ms（已按机器速度换算）'
+                            f' × {1 + latency_tolerance:g}')
+        for field in ('reads', 'rcu'):
+            allowed = base[field] * (1 + read_tolerance) + 1e-9
+            if result[field] > allowed:
+                problems.append(f'{field} {result[field]}/次 > 允许{allowed:.2f}/次（基线{base[field]}/次）')
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+def recheck_latency(scenarios, results, failures):
+    """耗时超标的场景重新计时（最多LATENCY_RETRIES次）并保留最快的一次：
+    真实的退化每次都会复现，瞬时的机器抖动则不会。读取条数以首次运行为准。"""
+    for name in failures:
+        scenario = scenarios[name]
+        result = results[name]
+        for _ in range(LATENCY_RETRIES):
+            calibration = calibrate()
+            samples, _ = time_scenario(scenario, result['iterations'])
+            p50 = _percentile(samples, 50)
+            if p50 / calibration < result['p50_ms'] / result['calibration_ms']:
+                result.update(p50_ms=round(p50, 3), calibration_ms=calibration)
+
+
+def baseline_path(scale_name):
+    return os.path.join(BASELINE_DIR, f'handlers-{scale_name}.json')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='处理函数离线基准（LocalDynamoDB替身）')
+    parser.add_argument('--scale', default='1k', help=f'成绩条数：{"/".join(SCALES)}或整数')
+    parser.add_argument('--iterations', type=int, default=50, help='每个场景的调用次数（写入类场景另有上限）')
+    parser.add_argument('--only', nargs='*', default=None, help='只运行名称以这些前缀开头的场景')
+    parser.add_argument('--save', action='store_true', help='把结果保存为该规模的基线')
+    parser.add_argument('--check', action='store_true', help='与基线比较，受保护场景退化时返回1')
+    parser.add_argument('--baseline', help='基线文件（默认benchmarks/baselines/handlers-<规模>.json）')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='允许的耗时增幅（换算机器速度后），共享或虚拟化的机器上波动较大')
+    parser.add_argument('--read-tolerance', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    grades = parse_scale(args.scale)
+    scale_name = args.scale if args.scale in SCALES else str(grades)
+    ds = Dataset(grades)
+    started = time.perf_counter()
+    db = install(ds)
+    print(f'规模{scale_name}：{grades}条成绩，{ds.student_count}名学生，{len(ds.courses)}门课程，'
+          f'{len(ds.courses) * len(TERMS)}个时段（装载{time.perf_counter() - started:.1f}秒）')
+
+    results = {}
+    scenarios = {}
+    print(f'{"scenario":<36}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"reads":>9}{"writes":>9}'
+          f'{"rcu":>8}{"wcu":>8}{"peak KB":>10}  status')
+    for scenario in build_scenarios(ds, db):
+        if args.only and not scenario.name.startswith(tuple(args.only)):
+            continue
+        iterations = min(args.iterations, scenario.iterations or args.iterations)
+        scenarios[scenario.name] = scenario
+        result = results[scenario.name] = run_scenario(scenario, db, iterations)
+        print(f'{scenario.name:<36}{result["p50_ms"]:>9.2f}{result["p90_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+              f'{result["reads"]:>9.1f}{result["writes"]:>9.1f}{result["rcu"]:>8.1f}{result["wcu"]:>8.1f}'
+              f'{result["peak_kb"]:>10.1f}  {result["status"]}')
+
+    path = args.baseline or baseline_path(scale_name)
+    if args.check:
+        if not os.path.exists(path):
+            print(f'未找到基线：{path}（先用--save生成）')
+            return 2
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        failures = check(results, baseline, args.latency_tolerance, args.read_tolerance)
+        if failures:
+            recheck_latency(scenarios, results, failures)
+            failures = check(results, baseline, args.latency_tolerance, args.read_tolerance)
+        if failures:
+            print('性能退化：')
+            for name, problems in failures.items():
+                for problem in problems:
+                    print(f'  {name}: {problem}')
+            return 1
+        print(f'与基线一致：{path}')
+
+    if args.save:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'scale': scale_name,
+                'grades': grades,
+                'createdAt': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results
+            }, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'基线已保存：{path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""multipart上传解析基准：旧版（split + decode + StringIO）对比流式解析（MultipartStream）
+
+用法：python benchmarks/bench_multipart.py [行数...]
+"""
+import base64
+import csv
+import os
+import re
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from MultipartStream import decode_body, find_file_part, iter_csv_rows  # noqa: E402
+
+BOUNDARY = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
+
+
+def legacy_parse(event, boundary):
+    """改造前GradeFileParser的解析流程（用于对比）"""
+    body = base64.b64decode(event['body'])
+    full_boundary = b'--' + boundary.encode('utf-8')
+    parts = re.split(full_boundary, body, flags=re.MULTILINE, maxsplit=10)
+    for part in parts:
+        if not part.strip():
+            continue
+        if re.search(b'name="file"; filename="(.*?)"', part, re.IGNORECASE):
+            content = part.split(b'\r\n\r\n', 1)[1].rstrip(b'\r\n--')
+            return csv.DictReader(StringIO(content.decode('utf-8')))
+    return None
+
+
+def streaming_parse(event, boundary):
+    body = decode_body(event)
+    return iter_csv_rows(find_file_part(body, boundary))
+
+
+def make_event(rows):
+    lines = ['studentId,course,term,score']
+    lines += [f'2023{i:06d},高等数学,2023秋,{i % 101}' for i in range(rows)]
+    csv_bytes = ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+    body = (f'--{BOUNDARY}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="grades.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode('utf-8') + csv_bytes + f'\r\n--{BOUNDARY}--\r\n'.encode('utf-8')
+    return {'body': base64.b64encode(body).decode('ascii'), 'isBase64Encoded': True}, len(csv_bytes)
+
+
+def measure(parse, event):
+    # 耗时与内存分两次测量：tracemalloc本身会显著拖慢逐对象分配的代码
+    started = time.perf_counter()
+    count = sum(1 for _ in parse(event, BOUNDARY))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    sum(1 for _ in parse(event, BOUNDARY))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main(sizes):
+    print(f"{'行数':>8} {'文件MB':>7} {'解析器':<10} {'耗时ms':>9} {'峰值内存MB':>11}")
+    for rows in sizes:
+        event, size = make_event(rows)
+        for name, parse in (('legacy', legacy_parse), ('streaming', streaming_parse)):
+            count, elapsed, peak = measure(parse, event)
+            assert count == rows, (name, count, rows)
+            print(f'{rows:>8} {size / 1e6:>7.2f} {name:<10} {elapsed * 1000:>9.1f} {peak / 1e6:>11.2f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 300_000])
@@ -0,0 +1,400 @@
+"""放榜压测：模拟查询时段开放的瞬间，选课学生同时打开student.html（/info + /grades），用asyncio并发回放
+
+每个虚拟学生在--ramp秒内依次开始（均匀爬坡），每次打开页面与student.html相同：先GET /info，
+再GET /grades?since=<本地同步令牌>（首次为空令牌全量同步，之后增量）；然后按--think秒
+（指数分布的均值）停留后刷新，共--visits次。GradeQuery读取预先发布的学生成绩视图（StudentGradeViews，
+每次一次GetItem）；放榜设置时段后先等待视图发布完成（队列排空，不计入压测统计）再开始。
+--period-lookups另让每次打开页面按学生的课程批量查询一次时段
+（GET /teacher/set-period?gradeIds=...，旧版页面的访问方式）。
+
+两种运行方式：
+  直接调用（默认）  进程内装载合成数据，经Router.lambda_handler调用处理函数；处理函数在线程池中执行，
+                    --concurrency模拟函数并发上限（超出的请求排队，排队时间计入延迟）
+  --url             对运行中的LocalServer（或其他部署）发HTTP请求，--connections为连接池大小；
+                    LocalServer需以相同的--scale启动，分表统计取自其/_local/stats
+
+--rcu/--wcu按表模拟预置容量（令牌桶限流），被限流的调用由SdkRetries按botocore的方式退避重试。
+报告：吞吐（请求/秒）、各接口延迟分位数与状态码、限流/重试/重试耗尽次数、各表读取条目与RCU。
+
+用法：
+  python benchmarks/bench_release.py [--scale 100k] [--students 2000] [--ramp 5] [--think 2] [--visits 2]
+                                     [--course 高等数学] [--concurrency 64] [--period-lookups]
+                                     [--rcu 1000 | --rcu Grades=2000,QueryPeriods=200] [--burst 1]
+                                     [--url http://127.0.0.1:8080 --connections 100] [--json]
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlencode, urlsplit
+
+# 在导入处理函数之前设置：关闭EMF指标输出与调试日志采样
+os.environ.setdefault('METRICS_ENABLED', '0')
+os.environ.setdefault('DEBUG_LOG_SAMPLE_RATE', '0')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, HERE)
+
+from synthetic_data import SCALES, TERMS, Dataset, parse_scale  # noqa: E402
+
+ENDPOINTS = ('info', 'grades', 'periods')
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def period_id(course_id, term):
+    return f'{course_id}_{term.replace("秋", "年秋").replace("春", "年春")}'
+
+
+def pick_students(ds, course, count):
+    """选了该课程的学生优先（放榜时打开页面的就是他们），不足count时用其他学生补足"""
+    enrolled = {}
+    for grade in ds.grades():
+        enrolled.setdefault(grade['studentId'], []).append((grade['course'], grade['term']))
+    in_course = [sid for sid, courses in enrolled.items() if any(c == course for c, _ in courses)]
+    taken = set(in_course)
+    others = [sid for sid in enrolled if sid not in taken]
+    chosen = (in_course + others)[:count]
+    return chosen, len(in_course), {sid: enrolled[sid] for sid in chosen}
+
+
+def decode_body(data, encoding):
+    """与浏览器一样解压响应体（请求都带Accept-Encoding: gzip）"""
+    if encoding == 'gzip':
+        data = gzip.decompress(data)
+    return data.decode('utf-8', 'replace')
+
+
+class DirectTransport:
+    """在本进程内经Router调用处理函数（线程池模拟函数并发）"""
+
+    def __init__(self, concurrency):
+        import Router
+        self.handler = Router.lambda_handler
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='invoke')
+
+    async def request(self, method, path, user, query=None, body=None):
+        event = {
+            'httpMethod': method,
+            'path': path,
+            'headers': {'accept-encoding': 'gzip'},
+            'queryStringParameters': query or None,
+            'requestContext': {'authorizer': {'claims': {'cognito:username': user}}},
+            'body': body
+        }
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, self.handler, event, None)
+        body = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            body = decode_body(base64.b64decode(body), (response.get('headers') or {}).get('Content-Encoding'))
+        return response.get('statusCode'), body
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class HttpTransport:
+    """最小的HTTP/1.1客户端：固定大小的keep-alive连接池（不依赖第三方库）"""
+
+    def __init__(self, base_url, connections):
+        parsed = urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip('/')
+        self.pool = asyncio.Queue()
+        for _ in range(connections):
+            self.pool.put_nowait(None)  # 连接在首次使用时建立
+
+    async def _send(self, connection, raw):
+        if connection is None:
+            connection = await asyncio.open_connection(self.host, self.port, limit=16 * 1024 * 1024)
+        reader, writer = connection
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('连接已关闭')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length') or 0))
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+            connection = None
+        return connection, status, decode_body(body, headers.get('content-encoding'))
+
+    async def request(self, method, path, user, query=None, body=None):
+        target = quote(self.prefix + path) + (f'?{urlencode(query)}' if query else '')
+        data = body.encode('utf-8') if body else b''
+        raw = (f'{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nX-Dev-User: {user}\r\n'
+               f'Accept-Encoding: gzip\r\n'
+               f'Content-Length: {len(data)}\r\n'
+               + ('Content-Type: application/json\r\n' if data else '') + '\r\n').encode('utf-8') + data
+        connection = await self.pool.get()
+        try:
+            try:
+                connection, status, payload = await self._send(connection, raw)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 服务端关闭了空闲连接：重连后重发一次
+                if connection is not None:
+                    connection[1].close()
+                connection, status, payload = await self._send(None, raw)
+        except BaseException:
+            connection = None
+            raise
+        finally:
+            self.pool.put_nowait(connection)
+        return status, payload
+
+    async def close(self):
+        while not self.pool.empty():
+            connection = self.pool.get_nowait()
+            if connection is not None:
+                connection[1].close()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.statuses = {name: {} for name in ENDPOINTS}
+        self.errors = 0
+        self.first = None
+        self.last = None
+
+    def record(self, endpoint, started, status):
+        finished = time.perf_counter()
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = finished if self.last is None else max(self.last, finished)
+        self.latencies[endpoint].append((finished - started) * 1000)
+        key = str(status)
+        self.statuses[endpoint][key] = self.statuses[endpoint].get(key, 0) + 1
+
+
+async def timed_get(transport, recorder, endpoint, student_id, path, query=None):
+    started = time.perf_counter()
+    try:
+        status, body = await transport.request('GET', path, student_id, query)
+    except Exception:
+        recorder.errors += 1
+        recorder.record(endpoint, started, 'error')
+        return None, None
+    recorder.record(endpoint, started, status)
+    return status, body
+
+
+async def student_session(transport, recorder, student_id, courses, course_ids, start_delay, args, rng):
+    """一名学生：等待爬坡到达时间后打开页面，思考后刷新，共visits次"""
+    await asyncio.sleep(start_delay)
+    token = None
+    period_ids = ','.join(sorted({period_id(course_ids[c], t) for c, t in courses if c in course_ids}))
+    for visit in range(args.visits):
+        if visit and args.think > 0:
+            await asyncio.sleep(rng.expovariate(1 / args.think))
+        await timed_get(transport, recorder, 'info', student_id, '/info')
+        status, body = await timed_get(transport, recorder, 'grades', student_id, '/grades', {'since': token or ''})
+        if status == 200 and body:
+            token = json.loads(body).get('syncToken', token)
+        elif status == 410:
+            token = None
+        if args.period_lookups and period_ids:
+            await timed_get(transport, recorder, 'periods', student_id, '/teacher/set-period', {'gradeIds': period_ids})
+
+
+async def open_release(transport, ds, course, now):
+    """放榜：把该课程各学期的查询时段设为从现在开始（经PeriodManage写入，与教师端操作一致）"""
+    fmt = '%Y-%m-%dT%H:%M'
+    for term in TERMS:
+        body = json.dumps({'gradeID': period_id(ds.course_ids[course], term),
+                           'startTime': (now - timedelta(minutes=1)).strftime(fmt),
+                           'endTime': (now + timedelta(days=7)).strftime(fmt)})
+        status, text = await transport.request('POST', '/teacher/set-period', ds.teacher_id(0), body=body)
+        if status != 200:
+            raise RuntimeError(f'设置时段失败：{status} {text[:200]}')
+
+
+async def run_storm(transport, ds, students, enrolled, args):
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    count = len(students)
+    sessions = [student_session(transport, recorder, sid, enrolled[sid], ds.course_ids,
+                                args.ramp * i / count, args, random.Random(rng.random()))
+                for i, sid in enumerate(students)]
+    await asyncio.gather(*sessions)
+    return recorder
+
+
+def install_direct(ds, args):
+    import LocalServer
+    import PeriodWindow
+    db, resource = LocalServer.install_local_backend(None, LocalServer.parse_capacity(args.rcu),
+                                                     LocalServer.parse_capacity(args.wcu), args.burst)
+    limiter, db.limiter = db.limiter, None  # 装载数据与全量发布视图不受限流
+    ds.seed_into(db)
+    ds.register_courses(PeriodWindow.COURSE_ID_MAP)
+    import GradeViews
+    GradeViews.publish_all()
+    db.limiter = limiter
+    return db, resource
+
+
+async def wait_published(transport, db):
+    """等待放榜触发的视图发布处理完（直接调用时在本进程排空队列，否则请求LocalServer排空）"""
+    if db is None:
+        status, _ = await transport.request('POST', '/_local/drain', 'bench')
+        if status != 204:
+            print(f'（服务端不支持/_local/drain，视图可能尚未发布完：{status}）')
+        return
+    import LocalServer
+    drain = LocalServer.local_queue_drainer()
+    if drain is not None:
+        await asyncio.get_running_loop().run_in_executor(None, drain)
+
+
+async def fetch_server_stats(transport, method='GET', path='/_local/stats'):
+    try:
+        status, body = await transport.request(method, path, 'bench')
+    except Exception:
+        return None
+    return json.loads(body) if status == 200 and body else None
+
+
+def report(recorder, tables, sdk, args, elapsed):
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    wall = (recorder.last - recorder.first) if recorder.first is not None else elapsed
+    result = {
+        'students': args.students,
+        'visits': args.visits,
+        'requests': total,
+        'seconds': round(wall, 3),
+        'throughput': round(total / wall, 1) if wall > 0 else None,
+        'errors': recorder.errors,
+        'endpoints': {},
+        'tables': {},
+        'sdk': sdk
+    }
+    for endpoint in ENDPOINTS:
+        samples = recorder.latencies[endpoint]
+        if not samples:
+            continue
+        result['endpoints'][endpoint] = {
+            'requests': len(samples),
+            'p50_ms': round(_percentile(samples, 50), 2),
+            'p90_ms': round(_percentile(samples, 90), 2),
+            'p99_ms': round(_percentile(samples, 99), 2),
+            'max_ms': round(max(samples), 2),
+            'status': recorder.statuses[endpoint]
+        }
+    for name, stats in sorted((tables or {}).items()):
+        if stats['reads'] or stats['writes'] or stats.get('throttles'):
+            result['tables'][name] = {key: stats[key] for key in ('reads', 'writes', 'rcu', 'wcu', 'throttles')}
+            result['tables'][name]['calls'] = sum(stats['calls'].values())
+    return result
+
+
+def print_report(result):
+    print(f"{result['requests']}个请求，{result['seconds']:.2f}秒，吞吐{result['throughput']}请求/秒，"
+          f"传输错误{result['errors']}")
+    print(f'{"endpoint":<10}{"requests":>10}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"max ms":>10}  status')
+    for name, stats in result['endpoints'].items():
+        print(f'{name:<10}{stats["requests"]:>10}{stats["p50_ms"]:>10.2f}{stats["p90_ms"]:>10.2f}'
+              f'{stats["p99_ms"]:>10.2f}{stats["max_ms"]:>10.2f}  {stats["status"]}')
+    if result['tables']:
+        throttles = sum(stats['throttles'] for stats in result['tables'].values())
+        sdk = result['sdk'] or {}
+        print(f"限流{throttles}次，客户端重试{sdk.get('retries', '-')}次，重试耗尽{sdk.get('exhausted', '-')}次")
+        print(f'{"table":<16}{"calls":>9}{"reads":>10}{"rcu":>10}{"writes":>8}{"wcu":>8}{"throttles":>11}')
+        for name, stats in result['tables'].items():
+            print(f'{name:<16}{stats["calls"]:>9}{stats["reads"]:>10}{stats["rcu"]:>10.1f}'
+                  f'{stats["writes"]:>8}{stats["wcu"]:>8.1f}{stats["throttles"]:>11}')
+    else:
+        print('（未取得分表统计：服务端不是LocalServer）')
+
+
+async def main_async(args):
+    ds = Dataset(parse_scale(args.scale))
+    if args.course not in ds.course_ids:
+        raise SystemExit(f'未知的课程：{args.course}')
+    students, in_course, enrolled = pick_students(ds, args.course, args.students)
+    args.students = len(students)
+
+    db = resource = None
+    started = time.perf_counter()
+    if args.url:
+        transport = HttpTransport(args.url, args.connections)
+    else:
+        db, resource = install_direct(ds, args)
+        transport = DirectTransport(args.concurrency)
+    print(f'规模{args.scale}：{ds.student_count}名学生；放榜课程{args.course}，'
+          f'{args.students}名虚拟学生（{min(in_course, args.students)}名选了该课程），'
+          f'爬坡{args.ramp}秒，思考{args.think}秒，每人打开{args.visits}次'
+          f'（准备{time.perf_counter() - started:.1f}秒）')
+
+    try:
+        await open_release(transport, ds, args.course, datetime.now(timezone.utc))
+        await wait_published(transport, db)
+        if db is not None:
+            db.reset_stats()
+            resource.reset_retry_stats()
+        else:
+            await fetch_server_stats(transport, 'POST', '/_local/reset')
+        started = time.perf_counter()
+        recorder = await run_storm(transport, ds, students, enrolled, args)
+        elapsed = time.perf_counter() - started
+        if db is not None:
+            tables, sdk = db.stats(), resource.retry_stats()
+        else:
+            stats = await fetch_server_stats(transport) or {}
+            tables, sdk = stats.get('tables'), stats.get('sdk')
+    finally:
+        await transport.close()
+    return report(recorder, tables, sdk, args, elapsed)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='100k', help=f'成绩条数：{"/".join(SCALES)}或整数（--url时须与服务端一致）')
+    parser.add_argument('--students', type=int, default=2000, help='虚拟学生数')
+    parser.add_argument('--ramp', type=float, default=5.0, help='所有学生在多少秒内陆续打开页面')
+    parser.add_argument('--think', type=float, default=2.0, help='两次刷新之间的平均停留秒数（指数分布）')
+    parser.add_argument('--visits', type=int, default=2, help='每名学生打开页面的次数（首次全量，之后增量同步）')
+    parser.add_argument('--course', default='高等数学', help='放榜的课程名称')
+    parser.add_argument('--period-lookups', action='store_true', help='每次打开页面另外批量查询一次时段')
+    parser.add_argument('--concurrency', type=int, default=64, help='直接调用时的函数并发上限')
+    parser.add_argument('--rcu', default=None, help='模拟预置读取容量（每秒，如1000或Grades=2000,QueryPeriods=200）')
+    parser.add_argument('--wcu', default=None, help='模拟预置写入容量（格式同--rcu）')
+    parser.add_argument('--burst', type=float, default=1.0, help='令牌桶最多积累的秒数')
+    parser.add_argument('--url', default=None, help='压测运行中的服务（如LocalServer的http://127.0.0.1:8080）')
+    parser.add_argument('--connections', type=int, default=100, help='--url时的连接池大小')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+    args = parser.parse_args(argv)
+    if args.url and (args.rcu or args.wcu):
+        parser.error('--rcu/--wcu只用于直接调用；压测LocalServer时请在启动服务时指定')
+
+    result = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=1))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""成绩读接口响应基准：逐字段Decimal→float + json.dumps（旧版）对比 JsonResponse
+
+对比序列化耗时、响应体字节数（未压缩/gzip），以及If-None-Match命中时的304耗时。
+
+用法：python benchmarks/bench_response.py [每页条数...]
+"""
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from JsonResponse import json_response  # noqa: E402
+
+REPEAT = 20
+
+
+def make_items(count):
+    terms = ['2023秋', '2024春']
+    courses = ['高等数学', '大学物理', '计算机基础']
+    return [{
+        'studentId': f'2023{i:07d}',
+        'gradeId': f'{courses[i % 3]}+{terms[i % 2]}+2023{i:07d}',
+        'course': courses[i % 3],
+        'term': terms[i % 2],
+        'score': Decimal(f'{(i * 7) % 100}.5')
+    } for i in range(count)]
+
+
+def legacy_response(items):
+    """改造前TeacherGetGrades：原地逐字段转换后json.dumps（ensure_ascii转义中文）"""
+    for item in items:
+        for key, value in item.items():
+            if isinstance(value, Decimal):
+                item[key] = float(value)
+    return {'statusCode': 200, 'body': json.dumps({'items': items, 'count': len(items), 'nextToken': None})}
+
+
+def timed(fn):
+    best = float('inf')
+    result = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(sizes):
+    plain = {'headers': {}}
+    gzipped = {'headers': {'Accept-Encoding': 'gzip'}}
+    print(f'{"items":>8}  {"variant":<18}{"ms":>9}{"bytes":>11}')
+    for size in sizes:
+        items = make_items(size)
+        # 旧版会原地修改记录，每轮都使用浅拷贝（拷贝开销计入各行，便于相互比较）
+        payload = lambda: {'items': [dict(item) for item in items], 'count': size, 'nextToken': None}  # noqa: E731
+        legacy, legacy_s = timed(lambda: legacy_response([dict(item) for item in items]))
+        fresh, fresh_s = timed(lambda: json_response(plain, payload()))
+        compressed, compressed_s = timed(lambda: json_response(gzipped, payload()))
+        revalidate = {'headers': {'If-None-Match': fresh['headers']['ETag']}}
+        _, not_modified_s = timed(lambda: json_response(revalidate, payload()))
+        for name, seconds, body in (('legacy', legacy_s, legacy['body']),
+                                    ('encoder', fresh_s, fresh['body']),
+                                    ('encoder+gzip', compressed_s, compressed['body']),
+                                    ('304', not_modified_s, '')):
+            size_bytes = len(body) * 3 // 4 if name == 'encoder+gzip' else len(body.encode('utf-8'))
+            print(f'{size:>8}  {name:<18}{seconds * 1000:>9.2f}{size_bytes:>11}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [50, 500, 5000])
@@ -0,0 +1,58 @@
+"""成绩CSV校验基准：逐行Decimal校验（旧版）对比按列批量校验（GradeValidation）
+
+用法：python benchmarks/bench_validation.py [行数...]
+"""
+import csv
+import io
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from GradeValidation import validate  # noqa: E402
+
+
+def legacy_validate(csv_reader):
+    """改造前GradeFileParser的逐行校验（遇到第一处错误即停止，不检查重复）"""
+    rows = []
+    for row_num, row in enumerate(csv_reader, start=2):
+        student_id = str(row['studentId']).strip()
+        course_name = str(row['course']).strip()
+        term = str(row['term']).strip()
+        score_str = str(row['score']).strip()
+        if not (student_id and course_name and term):
+            return rows, [{'row': row_num}]
+        try:
+            score = Decimal(score_str)
+            if not (Decimal('0') <= score <= Decimal('100')):
+                raise ValueError
+        except ValueError:
+            return rows, [{'row': row_num}]
+        rows.append((row_num, {'studentId': student_id, 'gradeId': f'{course_name}+{term}+{student_id}',
+                               'course': course_name, 'term': term, 'score': score}))
+    return rows, []
+
+
+def make_csv(rows):
+    lines = ['studentId,course,term,score']
+    lines += [f'2023{i:07d},高等数学,2023秋,{(i * 7) % 100}.5' for i in range(rows)]
+    return '\n'.join(lines) + '\n'
+
+
+def main(sizes):
+    print(f"{'行数':>9} {'校验器':<9} {'耗时ms':>9}")
+    for rows in sizes:
+        text = make_csv(rows)
+        for name, check in (('legacy', legacy_validate), ('columnar', validate)):
+            started = time.perf_counter()
+            reader = csv.DictReader(io.StringIO(text))
+            valid, errors = check(reader)
+            elapsed = time.perf_counter() - started
+            assert len(valid) == rows and not errors, (name, len(valid), errors[:1])
+            print(f'{rows:>9} {name:<9} {elapsed * 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
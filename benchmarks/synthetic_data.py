@@ -0,0 +1,127 @@
+"""基准测试用的合成数据集：按成绩条数生成学生、课程、教师、时段与成绩
+
+规模（成绩条数）       学生      课程    时段（课程×学期）
+1k                      100        10         40
+100k                 10,000       100        400
+1M                  100,000     1,000      4,000
+
+每个学生选10门课（分布在4个学期），每名教师任教3门课；前3门课使用真实课程名
+（PeriodWindow.COURSE_ID_MAP中的映射），其余课程的名称→ID映射由register_courses登记。
+数据由种子决定，同一规模每次生成的内容完全相同，基线之间可直接比较。
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1M': 1_000_000}
+
+TERMS = ['2022秋', '2023春', '2023秋', '2024春']
+REAL_COURSES = [('高等数学', 'MATH101'), ('大学物理', 'PHY101'), ('计算机基础', 'CS101')]
+COURSES_PER_STUDENT = 10
+COURSES_PER_TEACHER = 3
+CLASS_NAMES = ['计算机1班', '计算机2班', '软件1班', '软件2班', '物理1班', '数学1班']
+
+
+def parse_scale(value):
+    """'1k' / '100k' / '1M' 或直接给出成绩条数"""
+    if value in SCALES:
+        return SCALES[value]
+    return int(value)
+
+
+class Dataset:
+    """一套合成数据；各表的条目按需生成（百万级成绩不会同时保存两份）"""
+
+    def __init__(self, grades, seed=2024):
+        self.grade_count = grades
+        self.seed = seed
+        self.student_count = max(10, grades // COURSES_PER_STUDENT)
+        course_count = max(COURSES_PER_STUDENT, grades // 1000)
+        self.courses = REAL_COURSES + [(f'课程{i:04d}', f'C{i:04d}')
+                                       for i in range(len(REAL_COURSES), course_count)]
+        self.course_ids = dict(self.courses)
+
+    def student_id(self, index):
+        return f'2023{index:07d}'
+
+    def teacher_id(self, index):
+        return f'T{index:05d}'
+
+    @property
+    def teacher_count(self):
+        return -(-len(self.courses) // COURSES_PER_TEACHER)
+
+    def teacher_courses(self, index):
+        return [name for name, _ in self.courses[index * COURSES_PER_TEACHER:(index + 1) * COURSES_PER_TEACHER]]
+
+    def register_courses(self, course_id_map):
+        """把合成课程登记到课程名→课程ID映射（GradeQuery据此关联时段）"""
+        course_id_map.update(self.course_ids)
+
+    def grades(self):
+        rng = random.Random(self.seed)
+        names = [name for name, _ in self.courses]
+        emitted = 0
+        for index in range(self.student_count):
+            student_id = self.student_id(index)
+            per_student = min(COURSES_PER_STUDENT, self.grade_count - emitted)
+            if per_student <= 0:
+                return
+            for course in rng.sample(names, per_student):
+                term = TERMS[rng.randrange(len(TERMS))]
+                yield {
+                    'studentId': student_id,
+                    'gradeId': f'{course}+{term}+{student_id}',
+                    'course': course,
+                    'term': term,
+                    'score': Decimal(rng.randrange(0, 1001)) / 10
+                }
+            emitted += per_student
+
+    def students(self):
+        rng = random.Random(self.seed + 1)
+        for index in range(self.student_count):
+            yield {
+                'studentId': self.student_id(index),
+                'name': f'学生{index:06d}',
+                'className': CLASS_NAMES[rng.randrange(len(CLASS_NAMES))],
+                'gender': '男' if rng.random() < 0.5 else '女'
+            }
+
+    def teachers(self):
+        for index in range(self.teacher_count):
+            for name in self.teacher_courses(index):
+                yield {'teacherId': self.teacher_id(index), 'courseId': self.course_ids[name], 'courseName': name}
+
+    def periods(self, now=None):
+        """每门课每个学期一个时段：一半正在开放，一半已结束"""
+        now = now or datetime.now(timezone.utc)
+        fmt = '%Y-%m-%dT%H:%M'
+        for i, (name, course_id) in enumerate(self.courses):
+            for j, term in enumerate(TERMS):
+                open_now = (i + j) % 2 == 0
+                start = now - timedelta(days=7)
+                end = now + timedelta(days=7) if open_now else now - timedelta(days=1)
+                yield {
+                    'gradeId': f'{course_id}_{term.replace("秋", "年秋").replace("春", "年春")}',
+                    'startTime': start.strftime(fmt),
+                    'endTime': end.strftime(fmt),
+                    'updatedAt': now.isoformat()
+                }
+
+    def seed_into(self, db):
+        """装载到LocalDynamoDB（直接写入存储，不计入读写统计）"""
+        db.load('Grades', self.grades())
+        db.load('StudentInfo', self.students())
+        db.load('TeacherCourses', self.teachers())
+        db.load('QueryPeriods', self.periods())
+
+    def csv_rows(self, count, offset=0, course_index=0, term=TERMS[-1]):
+        """上传文件的内容：某门课某学期的count名学生（从offset号学生开始）"""
+        rng = random.Random(self.seed + 2 + offset)
+        course = self.courses[course_index][0]
+        lines = ['studentId,course,term,score']
+        for index in range(offset, offset + count):
+            lines.append(f'{self.student_id(index % self.student_count)},{course},{term},'
+                         f'{Decimal(rng.randrange(0, 1001)) / 10}')
+        return '\r\n'.join(lines) + '\r\n'